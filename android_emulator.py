@@ -10,7 +10,11 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import json
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from data_snapshot import read_snapshot_header, read_snapshot_rows, write_snapshot
+from integrity import DataFileError, load_library
 
 class BookmarkType:
     FREE = "FREE"
@@ -29,7 +33,8 @@ class Subcategory:
         self.category_id = category_id
 
 class Bookmark:
-    def __init__(self, id, name, url, description, category_id, subcategory_id, bookmark_type):
+    def __init__(self, id, name, url, description, category_id, subcategory_id, bookmark_type, tags=None,
+                 created_at=None, updated_at=None):
         self.id = id
         self.name = name
         self.url = url
@@ -37,8 +42,10 @@ class Bookmark:
         self.category_id = category_id
         self.subcategory_id = subcategory_id
         self.type = bookmark_type
-        self.created_at = datetime.now().timestamp()
-        self.updated_at = self.created_at
+        self.tags = tags or []
+        # Loaded bookmarks keep their timestamps; new ones start now
+        self.created_at = created_at if created_at is not None else datetime.now().timestamp()
+        self.updated_at = updated_at if updated_at is not None else self.created_at
 
 class BookmarkManager:
     def __init__(self):
@@ -54,29 +61,51 @@ class BookmarkManager:
         # Create default data if not exists
         if not os.path.exists("bookmark_data.json"):
             self.create_default_data()
+        elif self.load_snapshot():
+            return
         else:
-            try:
-                with open("bookmark_data.json", "r") as f:
-                    data = json.load(f)
-                    
-                    self.categories = [Category(c["id"], c["name"]) for c in data.get("categories", [])]
-                    self.subcategories = [Subcategory(s["id"], s["name"], s["category_id"]) 
-                                         for s in data.get("subcategories", [])]
-                    self.bookmarks = [Bookmark(
-                        b["id"], b["name"], b.get("url"), b.get("description"),
-                        b["category_id"], b["subcategory_id"], b["type"]
-                    ) for b in data.get("bookmarks", [])]
-                    
-                    # Set next IDs
-                    if self.categories:
-                        self.next_category_id = max(c.id for c in self.categories) + 1
-                    if self.subcategories:
-                        self.next_subcategory_id = max(s.id for s in self.subcategories) + 1
-                    if self.bookmarks:
-                        self.next_bookmark_id = max(b.id for b in self.bookmarks) + 1
-            except Exception as e:
-                print(f"Error loading data: {e}")
-                self.create_default_data()
+            # Raises DataFileError rather than replace a file that
+            # doesn't parse with the default data (see integrity.py)
+            data = load_library("bookmark_data.json")
+            
+            self.categories = [Category(c["id"], c["name"]) for c in data["categories"]]
+            self.subcategories = [Subcategory(s["id"], s["name"], s["category_id"]) 
+                                 for s in data["subcategories"]]
+            self.bookmarks = [Bookmark(
+                b["id"], b["name"], b.get("url"), b.get("description"),
+                b["category_id"], b["subcategory_id"], b["type"], b.get("tags", []),
+                b.get("created_at"), b.get("updated_at")
+            ) for b in data["bookmarks"]]
+            
+            # Set next IDs
+            if self.categories:
+                self.next_category_id = max(c.id for c in self.categories) + 1
+            if self.subcategories:
+                self.next_subcategory_id = max(s.id for s in self.subcategories) + 1
+            if self.bookmarks:
+                self.next_bookmark_id = max(b.id for b in self.bookmarks) + 1
+            self.save_snapshot()
+
+    def load_snapshot(self):
+        # The compiled snapshot skips JSON parsing; it is ignored when stale
+        header = read_snapshot_header("bookmark_data.json")
+        if not header:
+            return False
+        try:
+            self.bookmarks = [Bookmark(*row) for row in read_snapshot_rows("bookmark_data.json")]
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        self.categories = [Category(*c) for c in header["categories"]]
+        self.subcategories = [Subcategory(*s) for s in header["subcategories"]]
+        self.next_category_id, self.next_subcategory_id, self.next_bookmark_id = header["next_ids"]
+        return True
+
+    def save_snapshot(self):
+        try:
+            write_snapshot("bookmark_data.json", self.categories, self.subcategories, self.bookmarks,
+                           (self.next_category_id, self.next_subcategory_id, self.next_bookmark_id))
+        except OSError as e:
+            print(f"Error saving snapshot: {e}")
 
     def save_data(self):
         data = {
@@ -85,13 +114,14 @@ class BookmarkManager:
                              for s in self.subcategories],
             "bookmarks": [{"id": b.id, "name": b.name, "url": b.url, 
                           "description": b.description, "category_id": b.category_id, 
-                          "subcategory_id": b.subcategory_id, "type": b.type,
+                          "subcategory_id": b.subcategory_id, "type": b.type, "tags": b.tags,
                           "created_at": b.created_at, "updated_at": b.updated_at} 
                          for b in self.bookmarks]
         }
         
         with open("bookmark_data.json", "w") as f:
             json.dump(data, f, indent=2)
+        self.save_snapshot()
 
     def create_default_data(self):
         # Create default categories
@@ -246,6 +276,153 @@ class BookmarkManager:
             return self.bookmarks
         return [b for b in self.bookmarks if b.subcategory_id == subcategory_id]
 
+def filter_and_sort_bookmarks(bookmarks, category_names, subcategory_names, query="",
+                              bookmark_type=None, category_id=None, sort_option="name_asc"):
+    # Pure function over plain data so it can run on a worker thread
+    if query:
+        query = query.lower()
+        bookmarks = [
+            b for b in bookmarks
+            if (query in b.name.lower() or
+                (b.description and query in b.description.lower()) or
+                query in category_names.get(b.category_id, "").lower() or
+                query in subcategory_names.get(b.subcategory_id, "").lower())
+        ]
+    if bookmark_type:
+        bookmarks = [b for b in bookmarks if b.type == bookmark_type]
+    if category_id:
+        bookmarks = [b for b in bookmarks if b.category_id == category_id]
+
+    if sort_option == "name_asc":
+        bookmarks = sorted(bookmarks, key=lambda b: b.name.lower())
+    elif sort_option == "name_desc":
+        bookmarks = sorted(bookmarks, key=lambda b: b.name.lower(), reverse=True)
+    elif sort_option == "category":
+        bookmarks = sorted(bookmarks, key=lambda b: (
+            category_names.get(b.category_id, "").lower(),
+            subcategory_names.get(b.subcategory_id, "").lower(),
+            b.name.lower()
+        ))
+    elif sort_option == "subcategory":
+        bookmarks = sorted(bookmarks, key=lambda b: (
+            subcategory_names.get(b.subcategory_id, "").lower(),
+            b.name.lower()
+        ))
+    elif sort_option == "type":
+        bookmarks = sorted(bookmarks, key=lambda b: (b.type, b.name.lower()))
+    return bookmarks
+
+class VirtualTreeview:
+    # A ttk.Treeview that shows a long list of rows while only keeping the
+    # visible window of them as tree items. Items are keyed by row id, so
+    # scrolling or refreshing inserts, moves or updates just the items that
+    # changed instead of rebuilding the tree.
+    def __init__(self, parent, columns, row_values):
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings")
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        # row_values(row) -> (row_id, values)
+        self.row_values = row_values
+        self.rows = []
+        self.offset = 0
+        self.visible = 20
+        self.rendered = {}
+        
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self.on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self.on_arrow(1))
+        
+    def set_rows(self, rows, keep_offset=True):
+        # A refresh after an edit keeps the scroll position, clamped to the
+        # new rows
+        self.rows = rows
+        self.offset = max(0, min(self.offset, len(rows) - self.visible)) if keep_offset else 0
+        self.render()
+        
+    def render(self):
+        wanted = []
+        for row in self.rows[self.offset:self.offset + self.visible]:
+            row_id, values = self.row_values(row)
+            wanted.append((str(row_id), values))
+            
+        wanted_ids = {iid for iid, _ in wanted}
+        stale = [iid for iid in self.rendered if iid not in wanted_ids]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.rendered[iid]
+                
+        for index, (iid, values) in enumerate(wanted):
+            if iid not in self.rendered:
+                self.tree.insert("", index, iid=iid, values=values, tags=(iid,))
+            else:
+                if self.rendered[iid] != values:
+                    self.tree.item(iid, values=values)
+                if self.tree.index(iid) != index:
+                    self.tree.move(iid, "", index)
+            self.rendered[iid] = values
+            
+        self.update_scrollbar()
+        
+    def update_scrollbar(self):
+        total = len(self.rows)
+        if not total:
+            self.scrollbar.set(0, 1)
+            return
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.rows) - self.visible))
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        self.render()
+        return True
+        
+    def scroll(self, amount):
+        self.scroll_to(self.offset + amount)
+        return "break"
+        
+    def yview(self, *args):
+        # Scrollbar callback: ("moveto", fraction) or ("scroll", n, "units"|"pages")
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible
+            self.scroll_to(self.offset + amount)
+            
+    def on_configure(self, event):
+        try:
+            row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except ValueError:
+            row_height = 20
+        # One row's worth of height goes to the headings
+        visible = max(1, event.height // row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = max(0, min(self.offset, len(self.rows) - self.visible))
+            self.render()
+            
+    def on_arrow(self, step):
+        # Moving the selection past the first or last visible item scrolls
+        selection = self.tree.selection()
+        children = self.tree.get_children()
+        if not selection or not children:
+            return None
+        index = self.tree.index(selection[0])
+        if 0 <= index + step < len(children):
+            return None
+        if self.scroll_to(self.offset + step):
+            children = self.tree.get_children()
+            edge = children[0] if step < 0 else children[-1]
+            self.tree.selection_set(edge)
+            self.tree.focus(edge)
+        return "break"
+
 class BookmarkManagerApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -256,6 +433,19 @@ class BookmarkManagerApp(tk.Tk):
         
         self.manager = BookmarkManager()
         
+        # Filtering and sorting run on a worker thread; results come back
+        # through a queue polled with after(), tagged with a generation so
+        # results for an outdated search are dropped
+        self.list_executor = ThreadPoolExecutor(max_workers=1)
+        self.list_results = queue.Queue()
+        self.list_generation = 0
+        self.list_polling = False
+        self.search_after_id = None
+        # (query, filters, bookmarks) of the list currently shown
+        self.list_state = None
+        self.category_names = {}
+        self.subcategory_names = {}
+        
         self.setup_ui()
         
     def setup_ui(self):
@@ -289,7 +479,7 @@ class BookmarkManagerApp(tk.Tk):
         self.search_var = tk.StringVar()
         self.search_entry = ttk.Entry(search_frame, width=40, textvariable=self.search_var)
         self.search_entry.pack(side=tk.LEFT, padx=(0, 10))
-        self.search_entry.bind("<KeyRelease>", lambda e: self.update_bookmark_list())
+        self.search_entry.bind("<KeyRelease>", lambda e: self.schedule_search())
         
         # Filter frame
         filter_frame = ttk.Frame(self.home_frame)
@@ -343,9 +533,10 @@ class BookmarkManagerApp(tk.Tk):
         list_frame = ttk.Frame(self.home_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Set up the bookmark list with columns
+        # Set up the bookmark list with columns; only visible rows become tree items
         columns = ("name", "category", "subcategory", "type")
-        self.bookmark_tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+        self.bookmark_list = VirtualTreeview(list_frame, columns, self.bookmark_row_values)
+        self.bookmark_tree = self.bookmark_list.tree
         
         # Define headings
         self.bookmark_tree.heading("name", text="Name")
@@ -359,13 +550,9 @@ class BookmarkManagerApp(tk.Tk):
         self.bookmark_tree.column("subcategory", width=150)
         self.bookmark_tree.column("type", width=100)
         
-        # Add a scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.bookmark_tree.yview)
-        self.bookmark_tree.configure(yscroll=scrollbar.set)
-        
-        # Pack them
+        # Pack the list and its scrollbar
         self.bookmark_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.bookmark_list.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Bind double-click to view bookmark details
         self.bookmark_tree.bind("<Double-1>", self.view_bookmark_details)
@@ -496,62 +683,98 @@ class BookmarkManagerApp(tk.Tk):
         about_text = "Bookmark Manager 1.0\n\nA modern Android app for managing bookmarks."
         ttk.Label(about_frame, text=about_text, justify=tk.LEFT).pack(padx=10, pady=10)
         
-    def update_bookmark_list(self):
-        # Clear the current items
-        for item in self.bookmark_tree.get_children():
-            self.bookmark_tree.delete(item)
-            
-        # Get the filtered and sorted bookmarks
-        bookmarks = self.manager.bookmarks
+    def schedule_search(self):
+        # Debounce typing so only the last keystroke in a burst runs a search
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(150, self.run_search)
+        
+    def run_search(self):
+        self.search_after_id = None
+        self.update_bookmark_list(refine=True)
+        
+    def update_bookmark_list(self, refine=False):
+        self.list_generation += 1
+        
+        # Snapshot everything the worker needs; it never touches Tk or the manager
+        self.category_names = {c.id: c.name for c in self.manager.categories}
+        self.subcategory_names = {s.id: s.name for s in self.manager.subcategories}
         
-        # Apply search filter
-        search_query = self.search_var.get()
-        if search_query:
-            bookmarks = self.manager.search_bookmarks(search_query)
-            
-        # Apply type filter
         type_filter = self.filter_type_var.get()
-        if type_filter != "ALL":
-            bookmarks = [b for b in bookmarks if b.type == type_filter]
-            
-        # Apply category filter
         category_filter = self.filter_category_var.get()
+        category_id = None
         if category_filter != "ALL":
             category_id = next((c.id for c in self.manager.categories if c.name == category_filter), None)
-            if category_id:
-                bookmarks = [b for b in bookmarks if b.category_id == category_id]
+            
+        query = self.search_var.get()
+        filters = (type_filter if type_filter != "ALL" else None, category_id, self.sort_var.get())
+        bookmarks = self.manager.bookmarks
+        sort_option = filters[2]
+        
+        # A query that contains the previous one can only narrow its results,
+        # so filter the list already shown; it is already sorted
+        if refine and self.list_state:
+            last_query, last_filters, last_bookmarks = self.list_state
+            if last_query and last_filters == filters and last_query.lower() in query.lower():
+                bookmarks = last_bookmarks
+                sort_option = None
                 
-        # Apply sorting
-        sort_option = self.sort_var.get()
-        if sort_option == "name_asc":
-            bookmarks = sorted(bookmarks, key=lambda b: b.name.lower())
-        elif sort_option == "name_desc":
-            bookmarks = sorted(bookmarks, key=lambda b: b.name.lower(), reverse=True)
-        elif sort_option == "category":
-            bookmarks = sorted(bookmarks, key=lambda b: (
-                self.manager.get_category_name(b.category_id).lower(),
-                self.manager.get_subcategory_name(b.subcategory_id).lower(),
-                b.name.lower()
-            ))
-        elif sort_option == "subcategory":
-            bookmarks = sorted(bookmarks, key=lambda b: (
-                self.manager.get_subcategory_name(b.subcategory_id).lower(),
-                b.name.lower()
-            ))
-        elif sort_option == "type":
-            bookmarks = sorted(bookmarks, key=lambda b: (b.type, b.name.lower()))
+        self.list_executor.submit(
+            self.filter_bookmarks_job,
+            self.list_generation,
+            (query, filters),
+            list(bookmarks),
+            self.category_names,
+            self.subcategory_names,
+            query,
+            filters[0],
+            filters[1],
+            sort_option
+        )
+        
+        if not self.list_polling:
+            self.list_polling = True
+            self.after(10, self.poll_bookmark_list)
             
-        # Add the bookmarks to the tree
-        for bookmark in bookmarks:
-            category_name = self.manager.get_category_name(bookmark.category_id)
-            subcategory_name = self.manager.get_subcategory_name(bookmark.subcategory_id)
+    def filter_bookmarks_job(self, generation, state, *args):
+        # Runs on the worker thread; work superseded by a newer generation is
+        # skipped before it starts and its results are never shown
+        if generation != self.list_generation:
+            return
+        try:
+            bookmarks = filter_and_sort_bookmarks(*args)
+        except Exception as e:
+            print(f"Error filtering bookmarks: {e}")
+            bookmarks = []
+        if generation == self.list_generation:
+            self.list_results.put((generation, state, bookmarks))
+        
+    def poll_bookmark_list(self):
+        latest = None
+        while True:
+            try:
+                generation, state, bookmarks = self.list_results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self.list_generation:
+                latest = state + (bookmarks,)
+                
+        if latest is not None:
+            self.list_polling = False
+            # A new search or filter starts at the top
+            same_view = self.list_state is not None and self.list_state[:2] == latest[:2]
+            self.list_state = latest
+            self.bookmark_list.set_rows(latest[2], keep_offset=same_view)
+        else:
+            self.after(10, self.poll_bookmark_list)
             
-            self.bookmark_tree.insert("", tk.END, values=(
-                bookmark.name,
-                category_name,
-                subcategory_name,
-                bookmark.type
-            ), tags=(str(bookmark.id),))
+    def bookmark_row_values(self, bookmark):
+        return bookmark.id, (
+            bookmark.name,
+            self.category_names.get(bookmark.category_id, ""),
+            self.subcategory_names.get(bookmark.subcategory_id, ""),
+            bookmark.type
+        )
             
     def update_categories_list(self):
         # Clear the current items
@@ -1028,5 +1251,9 @@ class BookmarkManagerApp(tk.Tk):
         messagebox.showinfo("Import", f"Data imported successfully from {format_type.upper()} file")
 
 if __name__ == "__main__":
-    app = BookmarkManagerApp()
-    app.mainloop()
\ No newline at end of file
+    try:
+        app = BookmarkManagerApp()
+    except DataFileError as e:
+        messagebox.showerror("Bookmark Manager", str(e))
+    else:
+        app.mainloop()
\ No newline at end of file
@@ -1,11 +1,40 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, g
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
+import atexit
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+from background_tasks import DeferredWriter, PeriodicTask, TaskRunner
+from backup import BackupError, BackupStore
+from change_log import ChangeLog
+from compression import Compressor
+from history import History, HistoryError
+from integrity import check_library, load_library
+from link_checker import LinkCheckJob, LinkStatusStore
+from metadata_fetcher import ContentCache, MetadataFetcher, MetadataStore
+from rate_limit import WRITE_METHODS, AdmissionControl, SqliteBuckets
+from query_index import BookmarkIndex
+from ranking import BookmarkRankings
+from search_index import FuzzySearchIndex
+from shared_state import SharedState
+from static_assets import StaticAssets
+from suggest_index import SuggestIndex
+from tag_index import TagIndex, TagQueryError, normalize_tags
+from tenants import TenantPrefixMiddleware, TenantRegistry, TenantStores, request_token
+from url_index import DuplicateIndex
+from visit_counter import VisitCounter
+
 app = Flask(__name__)
 CORS(app)
+StaticAssets(app)
+Compressor(min_size=1024).init_app(app)
+# Per-client read/write budgets and a bounded write queue; off until
+# create_app turns them on
+admission = AdmissionControl(app, light_writes={"record_visit"})
 
 class BookmarkType:
     FREE = "FREE"
@@ -37,7 +66,8 @@ class Subcategory:
         }
 
 class Bookmark:
-    def __init__(self, id, name, url, description, category_id, subcategory_id, bookmark_type):
+    def __init__(self, id, name, url, description, category_id, subcategory_id, bookmark_type, tags=None,
+                 created_at=None, updated_at=None):
         self.id = id
         self.name = name
         self.url = url
@@ -45,8 +75,10 @@ class Bookmark:
         self.category_id = category_id
         self.subcategory_id = subcategory_id
         self.type = bookmark_type
-        self.created_at = datetime.now().timestamp()
-        self.updated_at = self.created_at
+        self.tags = tags or []
+        # Loaded bookmarks keep their timestamps; new ones start now
+        self.created_at = created_at if created_at is not None else datetime.now().timestamp()
+        self.updated_at = updated_at if updated_at is not None else self.created_at
 
     def to_dict(self):
         return {
@@ -57,62 +89,361 @@ class Bookmark:
             "category_id": self.category_id,
             "subcategory_id": self.subcategory_id,
             "type": self.type,
+            "tags": self.tags,
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
 
 class BookmarkManager:
-    def __init__(self):
+    def __init__(self, data_path="bookmark_data.json", data=None):
+        self.data_path = data_path
         self.categories = []
         self.subcategories = []
         self.bookmarks = []
         self.next_category_id = 1
         self.next_subcategory_id = 1
         self.next_bookmark_id = 1
-        self.load_data()
+        self.index = BookmarkIndex()
+        self.search_index = FuzzySearchIndex(self.get_search_fields)
+        self.suggest_index = SuggestIndex()
+        # id -> name of each category and subcategory (see add_name)
+        self.names = {"category": {}, "subcategory": {}}
+        self.url_index = DuplicateIndex()
+        self.tag_index = TagIndex()
+        self.rankings = BookmarkRankings()
+        self.changes = ChangeLog()
+        # Held by every mutating request; saves go through `writer` and
+        # changes are shared with other worker processes through `shared`
+        # when those are set (see create_app)
+        self.lock = threading.RLock()
+        self.writer = None
+        self.shared = None
+        # Visit counts for the popular/recent sorts, when set (see Tenant)
+        self.visit_counter = None
+        # Undo and point-in-time history, when set. `history_state` is
+        # every record as the history last saw it, which gives each change
+        # its "before" value.
+        self.history = None
+        self.history_state = None
+        self.history_note = {}
+        self.batch_depth = 0
+        self.dirty = False
+        self.load_data(data)
 
-    def load_data(self):
-        # Create default data if not exists
-        if not os.path.exists("bookmark_data.json"):
+    def load_data(self, data=None):
+        # `data` (shaped like export_data) is loaded instead of the file
+        # when given, e.g. for a past state of the library
+        if data is None and not os.path.exists(self.data_path):
+            # Create default data if not exists
             self.create_default_data()
         else:
+            # A file that doesn't parse raises DataFileError instead of
+            # being replaced with the default data; one that parses is
+            # repaired in memory (see integrity.py)
+            if data is None:
+                data = load_library(self.data_path)
+            
+            self.categories = [Category(c["id"], c["name"]) for c in data["categories"]]
+            self.subcategories = [Subcategory(s["id"], s["name"], s["category_id"]) 
+                                 for s in data["subcategories"]]
+            self.bookmarks = [Bookmark(
+                b["id"], b["name"], b.get("url"), b.get("description"),
+                b["category_id"], b["subcategory_id"], b["type"], b.get("tags", []),
+                b.get("created_at"), b.get("updated_at")
+            ) for b in data["bookmarks"]]
+            
+            # Set next IDs
+            if self.categories:
+                self.next_category_id = max(c.id for c in self.categories) + 1
+            if self.subcategories:
+                self.next_subcategory_id = max(s.id for s in self.subcategories) + 1
+            if self.bookmarks:
+                self.next_bookmark_id = max(b.id for b in self.bookmarks) + 1
+
+        self.index.rebuild(self.bookmarks)
+        self.search_index.rebuild(self.bookmarks)
+        self.url_index.rebuild(self.bookmarks)
+        self.tag_index.rebuild(self.bookmarks)
+        self.rankings.rebuild(self.bookmarks)
+        self.suggest_index.rebuild(
+            [("category", c.id, c.name) for c in self.categories] +
+            [("subcategory", s.id, s.name) for s in self.subcategories] +
+            [("bookmark", b.id, b.name) for b in self.bookmarks]
+        )
+        self.names = {
+            "category": {c.id: c.name for c in self.categories},
+            "subcategory": {s.id: s.name for s in self.subcategories}
+        }
+        if self.history is not None:
+            self.history_state = self.current_state()
+
+    @contextmanager
+    def batch(self):
+        # Defer saving until the outermost batch finishes, so many
+        # operations cost a single write of the data file. With shared
+        # state, the batch also holds the cross-process lock and publishes
+        # its changes to the other workers when it ends.
+        with self.lock:
+            if not self.batch_depth:
+                if self.shared is not None:
+                    self.shared.acquire()
+                    self.sync_shared()
+                start_version = self.changes.version
+            self.batch_depth += 1
             try:
-                with open("bookmark_data.json", "r") as f:
-                    data = json.load(f)
-                    
-                    self.categories = [Category(c["id"], c["name"]) for c in data.get("categories", [])]
-                    self.subcategories = [Subcategory(s["id"], s["name"], s["category_id"]) 
-                                         for s in data.get("subcategories", [])]
-                    self.bookmarks = [Bookmark(
-                        b["id"], b["name"], b.get("url"), b.get("description"),
-                        b["category_id"], b["subcategory_id"], b["type"]
-                    ) for b in data.get("bookmarks", [])]
-                    
-                    # Set next IDs
-                    if self.categories:
-                        self.next_category_id = max(c.id for c in self.categories) + 1
-                    if self.subcategories:
-                        self.next_subcategory_id = max(s.id for s in self.subcategories) + 1
-                    if self.bookmarks:
-                        self.next_bookmark_id = max(b.id for b in self.bookmarks) + 1
-            except Exception as e:
-                print(f"Error loading data: {e}")
-                self.create_default_data()
+                yield
+            finally:
+                self.batch_depth -= 1
+                if not self.batch_depth:
+                    try:
+                        if self.dirty:
+                            self.save_data()
+                        self.record_history(start_version)
+                        if self.shared is not None:
+                            self.publish_changes(start_version)
+                    finally:
+                        if self.shared is not None:
+                            self.shared.release()
+
+    def record_change(self, kind, item_id):
+        # For changes made outside the mutators, e.g. fetched page metadata
+        with self.batch():
+            self.changes.record(kind, item_id)
 
     def save_data(self):
-        data = {
-            "categories": [{"id": c.id, "name": c.name} for c in self.categories],
-            "subcategories": [{"id": s.id, "name": s.name, "category_id": s.category_id} 
-                             for s in self.subcategories],
-            "bookmarks": [{"id": b.id, "name": b.name, "url": b.url, 
-                          "description": b.description, "category_id": b.category_id, 
-                          "subcategory_id": b.subcategory_id, "type": b.type,
-                          "created_at": b.created_at, "updated_at": b.updated_at} 
-                         for b in self.bookmarks]
-        }
+        if self.batch_depth:
+            self.dirty = True
+            return
+        self.dirty = False
+        
+        if self.writer is not None:
+            self.writer.request()
+        else:
+            self.write_data()
+
+    def write_data(self):
+        # Copy under the lock, write outside it; the rename keeps readers
+        # from ever seeing a half-written file
+        with self.lock:
+            self.sync_shared()
+            version = self.changes.version
+            data = {
+                "categories": [{"id": c.id, "name": c.name} for c in self.categories],
+                "subcategories": [{"id": s.id, "name": s.name, "category_id": s.category_id} 
+                                 for s in self.subcategories],
+                "bookmarks": [{"id": b.id, "name": b.name, "url": b.url, 
+                              "description": b.description, "category_id": b.category_id, 
+                              "subcategory_id": b.subcategory_id, "type": b.type, "tags": b.tags,
+                              "created_at": b.created_at, "updated_at": b.updated_at} 
+                             for b in self.bookmarks]
+            }
         
-        with open("bookmark_data.json", "w") as f:
+        tmp_path = f"{self.data_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(data, f, indent=2)
+        
+        if self.shared is None:
+            os.replace(tmp_path, self.data_path)
+            return
+        
+        # Several workers may be writing; only ever replace the file with
+        # a newer version
+        with self.lock:
+            self.shared.acquire()
+            try:
+                if version > self.shared.written():
+                    os.replace(tmp_path, self.data_path)
+                    self.shared.mark_written(version)
+                else:
+                    os.remove(tmp_path)
+            finally:
+                self.shared.release()
+
+    def attach_shared(self, shared, reset=False):
+        # Call with `shared` locked and the data file loaded under that
+        # lock. Joins the journal other workers are writing, or starts one.
+        epoch = None if reset else shared.join()
+        if epoch is None:
+            shared.reset(self.changes.version, self.changes.epoch)
+        else:
+            self.changes.reset(epoch, shared.seen)
+        self.shared = shared
+        self.sync_shared()
+
+    def sync_shared(self):
+        # Replays changes other workers made since this one last looked
+        if self.shared is None or not self.shared.is_stale():
+            return
+        
+        with self.lock:
+            self.shared.acquire(exclusive=False)
+            try:
+                entries = self.shared.read_new()
+                if entries is None:
+                    # Too far behind the journal: start over from the file
+                    self.load_data()
+                    version = self.shared.written()
+                    self.changes.reset(self.changes.epoch, version)
+                    self.shared.seen = version
+                    entries = self.shared.read_new()
+                for version, kind, item_id, record in entries:
+                    self.apply_change(kind, item_id, record)
+                    self.changes.record(kind, item_id, version)
+                    self.track_history(kind, item_id, record)
+            finally:
+                self.shared.release()
+
+    def publish_changes(self, start_version):
+        changes = self.changes.entries_since(start_version)
+        if len(changes) < self.changes.version - start_version:
+            # More changes than the log keeps: write the file now and have
+            # the other workers reload it
+            self.write_data()
+            self.shared.reset(self.changes.version, self.changes.epoch)
+            return
+        
+        self.shared.append([(version, kind, item_id, self.get_record(kind, item_id))
+                            for version, kind, item_id in changes])
+
+    def current_state(self):
+        return {
+            "category": {c.id: c.to_dict() for c in self.categories},
+            "subcategory": {s.id: s.to_dict() for s in self.subcategories},
+            "bookmark": {b.id: b.to_dict() for b in self.bookmarks}
+        }
+
+    def attach_history(self, history):
+        # Call with the data loaded (and any shared lock held)
+        self.history = history
+        self.history_state = self.current_state()
+        history.start(self.history_state)
+
+    def track_history(self, kind, item_id, record):
+        # For changes another worker has already logged
+        if self.history_state is None:
+            return
+        if record is None:
+            self.history_state[kind].pop(item_id, None)
+        else:
+            self.history_state[kind][item_id] = record
+
+    def record_history(self, start_version):
+        # Logs what a batch changed as one operation
+        note, self.history_note = self.history_note, {}
+        if self.history is None or self.changes.version == start_version:
+            return
+        
+        try:
+            changes = self.changes.entries_since(start_version)
+            if len(changes) < self.changes.version - start_version:
+                # More changes than the change log keeps; the history gets
+                # a checkpoint instead, and can't undo past it
+                self.history_state = self.current_state()
+                self.history.append([], self.history_state, full=True)
+                return
+            
+            records = []
+            for kind, item_id in dict.fromkeys((kind, item_id) for _, kind, item_id in changes):
+                before = self.history_state[kind].get(item_id)
+                after = self.get_record(kind, item_id)
+                if before != after:
+                    records.append((kind, item_id, before, after))
+                    self.track_history(kind, item_id, after)
+            if records:
+                self.history.append(records, self.history_state, **note)
+        except OSError as e:
+            print(f"Error saving history: {e}")
+
+    def reverse_operation(self, undo=True):
+        # Undoes the most recent operation, or redoes the most recently
+        # undone one. Returns that operation, or None when there is none.
+        with self.batch():
+            undo_ops, redo_ops = self.history.undo_stacks()
+            ops = undo_ops if undo else redo_ops
+            if not ops:
+                return None
+            op = ops[-1]
+            
+            # Removals first, children before parents; then restores,
+            # parents before children
+            depth = {"category": 0, "subcategory": 1, "bookmark": 2}
+            records = [(kind, item_id, before if undo else after)
+                       for kind, item_id, before, after in op["changes"]]
+            records.sort(key=lambda r: (1, depth[r[0]]) if r[2] is not None else (0, -depth[r[0]]))
+            for kind, item_id, record in records:
+                self.apply_change(kind, item_id, record)
+                self.changes.record(kind, item_id)
+            
+            self.history_note = {"undo_of" if undo else "redo_of": op["op"]}
+            self.save_data()
+            return op
+
+    def get_record(self, kind, item_id):
+        if kind == "category":
+            item = next((c for c in self.categories if c.id == item_id), None)
+        elif kind == "subcategory":
+            item = next((s for s in self.subcategories if s.id == item_id), None)
+        else:
+            item = self.index.get(item_id)
+        return item.to_dict() if item else None
+
+    def apply_change(self, kind, item_id, record):
+        # Brings one item in line with a journal record; deletes don't
+        # cascade here because the journal lists every item they removed
+        if kind == "category":
+            category = next((c for c in self.categories if c.id == item_id), None)
+            if category:
+                self.remove_name("category", category.id, category.name)
+            if record is None:
+                self.categories = [c for c in self.categories if c.id != item_id]
+                return
+            # The name goes in first; reindexing the bookmarks looks it up
+            self.add_name("category", item_id, record["name"])
+            if category:
+                category.name = record["name"]
+                self.reindex_bookmarks(self.index.query(category_id=item_id))
+            else:
+                category = Category(item_id, record["name"])
+                self.categories.append(category)
+                self.next_category_id = max(self.next_category_id, item_id + 1)
+        elif kind == "subcategory":
+            subcategory = next((s for s in self.subcategories if s.id == item_id), None)
+            if subcategory:
+                self.remove_name("subcategory", subcategory.id, subcategory.name)
+            if record is None:
+                self.subcategories = [s for s in self.subcategories if s.id != item_id]
+                return
+            self.add_name("subcategory", item_id, record["name"])
+            if subcategory:
+                subcategory.name = record["name"]
+                subcategory.category_id = record["category_id"]
+                self.reindex_bookmarks(self.index.query(subcategory_id=item_id))
+            else:
+                subcategory = Subcategory(item_id, record["name"], record["category_id"])
+                self.subcategories.append(subcategory)
+                self.next_subcategory_id = max(self.next_subcategory_id, item_id + 1)
+        elif kind == "bookmark":
+            bookmark = self.index.get(item_id)
+            if bookmark:
+                self.unindex_bookmark(bookmark)
+            if record is None:
+                self.bookmarks = [b for b in self.bookmarks if b.id != item_id]
+                return
+            if not bookmark:
+                bookmark = Bookmark(item_id, record["name"], record["url"], record["description"],
+                                    record["category_id"], record["subcategory_id"], record["type"])
+                self.bookmarks.append(bookmark)
+                self.next_bookmark_id = max(self.next_bookmark_id, item_id + 1)
+            bookmark.name = record["name"]
+            bookmark.url = record["url"]
+            bookmark.description = record["description"]
+            bookmark.category_id = record["category_id"]
+            bookmark.subcategory_id = record["subcategory_id"]
+            bookmark.type = record["type"]
+            bookmark.tags = record.get("tags", [])
+            bookmark.created_at = record["created_at"]
+            bookmark.updated_at = record["updated_at"]
+            self.index_bookmark(bookmark)
 
     def create_default_data(self):
         # Create default categories
@@ -151,20 +482,36 @@ class BookmarkManager:
     def add_category(self, name):
         category = Category(self.next_category_id, name)
         self.categories.append(category)
+        self.add_name("category", category.id, name)
         self.next_category_id += 1
+        self.changes.record("category", category.id)
         self.save_data()
         return category
         
     def update_category(self, category_id, name):
         for category in self.categories:
             if category.id == category_id:
+                self.remove_name("category", category.id, category.name)
+                self.add_name("category", category.id, name)
                 category.name = name
+                self.reindex_bookmarks(self.index.query(category_id=category_id))
+                self.changes.record("category", category_id)
                 self.save_data()
                 return True
         return False
         
     def delete_category(self, category_id):
         # Delete associated subcategories and bookmarks
+        for bookmark in self.index.query(category_id=category_id):
+            self.unindex_bookmark(bookmark)
+            self.changes.record("bookmark", bookmark.id)
+        for subcategory in self.get_subcategories_for_category(category_id):
+            self.remove_name("subcategory", subcategory.id, subcategory.name)
+            self.changes.record("subcategory", subcategory.id)
+        for category in self.categories:
+            if category.id == category_id:
+                self.remove_name("category", category.id, category.name)
+        self.changes.record("category", category_id)
         self.subcategories = [s for s in self.subcategories if s.category_id != category_id]
         self.bookmarks = [b for b in self.bookmarks if b.category_id != category_id]
         
@@ -175,75 +522,256 @@ class BookmarkManager:
     def add_subcategory(self, name, category_id):
         subcategory = Subcategory(self.next_subcategory_id, name, category_id)
         self.subcategories.append(subcategory)
+        self.add_name("subcategory", subcategory.id, name)
         self.next_subcategory_id += 1
+        self.changes.record("subcategory", subcategory.id)
         self.save_data()
         return subcategory
         
     def update_subcategory(self, subcategory_id, name):
         for subcategory in self.subcategories:
             if subcategory.id == subcategory_id:
+                self.remove_name("subcategory", subcategory.id, subcategory.name)
+                self.add_name("subcategory", subcategory.id, name)
                 subcategory.name = name
+                self.reindex_bookmarks(self.index.query(subcategory_id=subcategory_id))
+                self.changes.record("subcategory", subcategory_id)
                 self.save_data()
                 return True
         return False
         
     def delete_subcategory(self, subcategory_id):
         # Delete associated bookmarks
+        for bookmark in self.index.query(subcategory_id=subcategory_id):
+            self.unindex_bookmark(bookmark)
+            self.changes.record("bookmark", bookmark.id)
+        for subcategory in self.subcategories:
+            if subcategory.id == subcategory_id:
+                self.remove_name("subcategory", subcategory.id, subcategory.name)
+        self.changes.record("subcategory", subcategory_id)
         self.bookmarks = [b for b in self.bookmarks if b.subcategory_id != subcategory_id]
         
         # Delete the subcategory
         self.subcategories = [s for s in self.subcategories if s.id != subcategory_id]
         self.save_data()
         
-    def add_bookmark(self, name, url, description, category_id, subcategory_id, bookmark_type):
+    def add_bookmark(self, name, url, description, category_id, subcategory_id, bookmark_type, tags=None):
         bookmark = Bookmark(self.next_bookmark_id, name, url, description, 
-                           category_id, subcategory_id, bookmark_type)
+                           category_id, subcategory_id, bookmark_type, tags)
         self.bookmarks.append(bookmark)
+        self.index_bookmark(bookmark)
         self.next_bookmark_id += 1
+        self.changes.record("bookmark", bookmark.id)
         self.save_data()
         return bookmark
         
-    def update_bookmark(self, bookmark_id, name, url, description, category_id, subcategory_id, bookmark_type):
-        for bookmark in self.bookmarks:
-            if bookmark.id == bookmark_id:
-                bookmark.name = name
-                bookmark.url = url
-                bookmark.description = description
-                bookmark.category_id = category_id
-                bookmark.subcategory_id = subcategory_id
-                bookmark.type = bookmark_type
-                bookmark.updated_at = datetime.now().timestamp()
-                self.save_data()
-                return True
-        return False
+    def update_bookmark(self, bookmark_id, name, url, description, category_id, subcategory_id, bookmark_type,
+                        tags=None):
+        bookmark = self.index.get(bookmark_id)
+        if not bookmark:
+            return False
+
+        self.unindex_bookmark(bookmark)
+        bookmark.name = name
+        bookmark.url = url
+        bookmark.description = description
+        bookmark.category_id = category_id
+        bookmark.subcategory_id = subcategory_id
+        bookmark.type = bookmark_type
+        if tags is not None:
+            bookmark.tags = tags
+        bookmark.updated_at = datetime.now().timestamp()
+        self.index_bookmark(bookmark)
+        self.changes.record("bookmark", bookmark_id)
+        self.save_data()
+        return True
         
     def delete_bookmark(self, bookmark_id):
+        bookmark = self.index.get(bookmark_id)
+        if bookmark:
+            self.unindex_bookmark(bookmark)
+            self.changes.record("bookmark", bookmark_id)
         self.bookmarks = [b for b in self.bookmarks if b.id != bookmark_id]
         self.save_data()
         
+    def index_bookmark(self, bookmark):
+        self.index.add(bookmark)
+        self.search_index.add(bookmark)
+        self.suggest_index.add("bookmark", bookmark.id, bookmark.name)
+        self.url_index.add(bookmark)
+        self.tag_index.add(bookmark)
+        self.rankings.add(bookmark)
+        
+    def unindex_bookmark(self, bookmark):
+        self.index.remove(bookmark)
+        self.search_index.remove(bookmark)
+        self.suggest_index.remove("bookmark", bookmark.id, bookmark.name)
+        self.url_index.remove(bookmark)
+        self.tag_index.remove(bookmark)
+        self.rankings.remove(bookmark)
+        
+    def reindex_bookmarks(self, bookmarks):
+        # Category and subcategory names are part of the search document
+        for bookmark in bookmarks:
+            self.search_index.add(bookmark)
+        
+    def get_search_fields(self, bookmark):
+        return {
+            "name": bookmark.name,
+            "description": bookmark.description,
+            "category": self.get_category_name(bookmark.category_id),
+            "subcategory": self.get_subcategory_name(bookmark.subcategory_id)
+        }
+        
+    def get_bookmark(self, bookmark_id):
+        return self.index.get(bookmark_id)
+        
+    def find_duplicate(self, url, exclude_id=None):
+        duplicate_id = self.url_index.find(url, exclude_id)
+        return self.index.get(duplicate_id) if duplicate_id is not None else None
+        
+    def get_duplicate_groups(self):
+        return {
+            url: [self.index.get(bookmark_id) for bookmark_id in ids]
+            for url, ids in self.url_index.groups().items()
+        }
+        
+    def merge_duplicates(self):
+        # Keep the oldest bookmark of each group, fill in whatever it is
+        # missing from the others, take all of their tags, and drop the
+        # rest in a single save
+        removed = set()
+        for bookmarks in self.get_duplicate_groups().values():
+            keeper, others = bookmarks[0], bookmarks[1:]
+            self.unindex_bookmark(keeper)
+            tags = set(keeper.tags)
+            for other in others:
+                if not keeper.description and other.description:
+                    keeper.description = other.description
+                tags.update(other.tags)
+                keeper.updated_at = max(keeper.updated_at, other.updated_at)
+                self.unindex_bookmark(other)
+                self.changes.record("bookmark", other.id)
+                removed.add(other.id)
+            keeper.tags = sorted(tags)
+            self.index_bookmark(keeper)
+            self.changes.record("bookmark", keeper.id)
+            
+        if removed:
+            self.bookmarks = [b for b in self.bookmarks if b.id not in removed]
+            self.save_data()
+        return removed
+    
+    def import_data(self, data):
+        # Categories and subcategories are matched by name, so importing an
+        # export from another library merges into this one
+        with self.batch():
+            category_ids = {}
+            for c in data.get("categories", []):
+                existing = next((x for x in self.categories if x.name.lower() == c["name"].lower()), None)
+                category_ids[c["id"]] = (existing or self.add_category(c["name"])).id
+            
+            subcategory_ids = {}
+            for s in data.get("subcategories", []):
+                category_id = category_ids.get(s["category_id"])
+                if category_id is None:
+                    continue
+                existing = next((x for x in self.get_subcategories_for_category(category_id)
+                                 if x.name.lower() == s["name"].lower()), None)
+                subcategory_ids[s["id"]] = (existing or self.add_subcategory(s["name"], category_id)).id
+            
+            imported = 0
+            for b in data.get("bookmarks", []):
+                category_id = category_ids.get(b["category_id"])
+                subcategory_id = subcategory_ids.get(b["subcategory_id"])
+                if category_id is None or subcategory_id is None:
+                    continue
+                self.add_bookmark(b["name"], b.get("url"), b.get("description"),
+                                  category_id, subcategory_id, b.get("type", BookmarkType.FREE),
+                                  normalize_tags(b.get("tags")))
+                imported += 1
+        
+        return {"imported": imported}
+    
+    def export_data(self):
+        with self.lock:
+            return {
+                "categories": [c.to_dict() for c in self.categories],
+                "subcategories": [s.to_dict() for s in self.subcategories],
+                "bookmarks": [b.to_dict() for b in self.bookmarks]
+            }
+
+    def restore_snapshot(self, segments):
+        # Brings the library back to a backup (see backup.py) in one batch,
+        # so it is saved, published and undone as a single change. Records
+        # that already match are left alone; whatever the backup doesn't
+        # have is removed. Check every segment before calling: one that
+        # fails partway would leave the library half restored.
+        seen = {"category": set(), "subcategory": set(), "bookmark": set()}
+        counts = {"restored": 0, "unchanged": 0, "removed": 0}
+
+        with self.batch():
+            for segment in segments:
+                for key, kind in (("categories", "category"), ("subcategories", "subcategory"),
+                                  ("bookmarks", "bookmark")):
+                    for record in segment.get(key, []):
+                        seen[kind].add(record["id"])
+                        if self.get_record(kind, record["id"]) == record:
+                            counts["unchanged"] += 1
+                            continue
+                        self.apply_change(kind, record["id"], record)
+                        self.changes.record(kind, record["id"])
+                        counts["restored"] += 1
+
+            stale = [b for b in self.bookmarks if b.id not in seen["bookmark"]]
+            for bookmark in stale:
+                self.unindex_bookmark(bookmark)
+                self.changes.record("bookmark", bookmark.id)
+            if stale:
+                self.bookmarks = [b for b in self.bookmarks if b.id in seen["bookmark"]]
+                if self.visit_counter is not None:
+                    self.visit_counter.forget([b.id for b in stale])
+            removed = len(stale)
+            for kind, items in (("subcategory", self.subcategories), ("category", self.categories)):
+                for item_id in [x.id for x in items if x.id not in seen[kind]]:
+                    self.apply_change(kind, item_id, None)
+                    self.changes.record(kind, item_id)
+                    removed += 1
+            counts["removed"] = removed
+            if counts["restored"] or removed:
+                self.save_data()
+        return counts
+
+    def add_name(self, kind, item_id, name):
+        # Category and subcategory names are kept by id for the listings
+        # and in the suggest index for autocomplete
+        self.names[kind][item_id] = name
+        self.suggest_index.add(kind, item_id, name)
+        
+    def remove_name(self, kind, item_id, name):
+        self.names[kind].pop(item_id, None)
+        self.suggest_index.remove(kind, item_id, name)
+        
     def get_category_name(self, category_id):
-        for category in self.categories:
-            if category.id == category_id:
-                return category.name
-        return ""
+        return self.names["category"].get(category_id, "")
         
     def get_subcategory_name(self, subcategory_id):
-        for subcategory in self.subcategories:
-            if subcategory.id == subcategory_id:
-                return subcategory.name
-        return ""
+        return self.names["subcategory"].get(subcategory_id, "")
         
     def get_subcategories_for_category(self, category_id):
         return [s for s in self.subcategories if s.category_id == category_id]
         
-    def search_bookmarks(self, query):
+    def search_bookmarks(self, query, bookmarks=None):
+        if bookmarks is None:
+            bookmarks = self.bookmarks
+            
         if not query:
-            return self.bookmarks
+            return bookmarks
             
         query = query.lower()
         results = []
         
-        for bookmark in self.bookmarks:
+        for bookmark in bookmarks:
             if (query in bookmark.name.lower() or 
                 (bookmark.description and query in bookmark.description.lower()) or
                 query in self.get_category_name(bookmark.category_id).lower() or
@@ -255,20 +783,60 @@ class BookmarkManager:
     def filter_bookmarks_by_type(self, bookmark_type):
         if not bookmark_type or bookmark_type == "ALL":
             return self.bookmarks
-        return [b for b in self.bookmarks if b.type == bookmark_type]
+        return self.index.query(bookmark_type=bookmark_type)
         
     def filter_bookmarks_by_category(self, category_id):
         if not category_id:
             return self.bookmarks
-        return [b for b in self.bookmarks if b.category_id == category_id]
+        return self.index.query(category_id=category_id)
         
     def filter_bookmarks_by_subcategory(self, subcategory_id):
         if not subcategory_id:
             return self.bookmarks
-        return [b for b in self.bookmarks if b.subcategory_id == subcategory_id]
+        return self.index.query(subcategory_id=subcategory_id)
+        
+    def fuzzy_search_bookmarks(self, query, limit=50, candidates=None):
+        # Returns (the top `limit` bookmarks, how many matched in all)
+        if not query:
+            return [], 0
+        matches, total = self.search_index.search_counted(query, limit, candidates)
+        return [self.index.get(bookmark_id) for bookmark_id, score in matches], total
+        
+    def query_bookmarks(self, search_query=None, category_id=None, subcategory_id=None, bookmark_type=None,
+                        mode="substring", limit=50, tag_query=None):
+        # Narrow down by the indexed filters first, then only run the
+        # search over the surviving candidates. Returns (bookmarks, number
+        # of matches); fuzzy mode only returns the top `limit` of them.
+        candidates = self.index.query_ids(category_id, subcategory_id, bookmark_type)
+        if tag_query:
+            tagged = self.tag_index.query(tag_query, self.index.by_id.keys())
+            candidates = tagged if candidates is None else candidates & tagged
+        
+        if search_query and mode == "fuzzy":
+            return self.fuzzy_search_bookmarks(search_query, limit, candidates)
+            
+        if candidates is None:
+            bookmarks = self.bookmarks
+        else:
+            bookmarks = [self.index.get(bookmark_id) for bookmark_id in sorted(candidates)]
+            
+        if search_query:
+            bookmarks = self.search_bookmarks(search_query, bookmarks)
+            
+        bookmarks = list(bookmarks)
+        return bookmarks, len(bookmarks)
+        
+    def rank_bookmarks(self, bookmarks, ranking):
+        # Orders bookmarks by the "popular" or "recent" ranking, first
+        # catching up with visits counted since the last call
+        with self.lock:
+            if self.visit_counter is not None:
+                self.visit_counter.refresh()
+                self.rankings.apply_visits(*self.visit_counter.drain())
+            return self.rankings.order(ranking, bookmarks)
         
     def get_bookmark_with_details(self, bookmark_id):
-        bookmark = next((b for b in self.bookmarks if b.id == bookmark_id), None)
+        bookmark = self.index.get(bookmark_id)
         if not bookmark:
             return None
             
@@ -295,8 +863,221 @@ class BookmarkManager:
             
         return result
 
-# Create a global instance of the BookmarkManager
-bookmark_manager = BookmarkManager()
+class Tenant:
+    # One bookmark library, with the link and metadata state keyed by its
+    # bookmark ids. `root` is the tenant's directory; the default tenant
+    # uses the top-level files.
+    def __init__(self, tenant_id, root="", deferred_writes=False, shared_state=False, backup_interval=0,
+                 history_checkpoints=8):
+        self.id = tenant_id
+        # Resolved now: files are flushed later from background threads and
+        # atexit, when the working directory may have changed
+        root = os.path.abspath(root)
+        data_path = os.path.join(root, "bookmark_data.json")
+        
+        # With shared state the file is loaded under the cross-process
+        # lock, so this worker joins the journal at the right version
+        shared = SharedState(data_path) if shared_state else None
+        if shared is not None:
+            shared.acquire()
+        try:
+            self.manager = BookmarkManager(data_path)
+            if shared is not None:
+                self.manager.attach_shared(shared)
+            self.manager.attach_history(History(data_path + ".history", keep_checkpoints=history_checkpoints))
+        finally:
+            if shared is not None:
+                shared.release()
+        if deferred_writes:
+            self.manager.writer = DeferredWriter(self.manager.write_data)
+        
+        # Link health results and the background job that refreshes them
+        self.link_status_store = LinkStatusStore(os.path.join(root, "link_status.json"))
+        self.link_check_job = LinkCheckJob(self.link_status_store)
+        
+        # Page metadata, fetched in the background. It is part of the
+        # bookmark records clients cache.
+        self.metadata_store = MetadataStore(os.path.join(root, "cache", "metadata.json"))
+        self.metadata_fetcher = MetadataFetcher(
+            self.metadata_store, content_cache,
+            on_update=lambda bookmark_id: self.manager.record_change("bookmark", bookmark_id)
+        )
+        
+        # Click counts, flushed to their own file in batches
+        self.visit_counter = VisitCounter(os.path.join(root, "visits.json"))
+        self.manager.visit_counter = self.visit_counter
+        
+        # Deduplicated snapshots of the library, taken every
+        # `backup_interval` seconds when that is set
+        self.backup_store = BackupStore(os.path.join(root, "backups"))
+        self.backup_task = None
+        if backup_interval:
+            self.schedule_backups(backup_interval)
+
+    def schedule_backups(self, interval):
+        # Every worker runs the schedule; min_interval lets only the first
+        # one due take the snapshot
+        def take_snapshot():
+            self.backup_store.snapshot(self.manager.export_data(), min_interval=interval * 0.9,
+                                       skip_unchanged=True)
+        
+        self.backup_task = PeriodicTask(take_snapshot, interval)
+
+    def is_busy(self):
+        return self.link_check_job.running or bool(self.metadata_fetcher.pending)
+
+    def close(self):
+        self.metadata_fetcher.shutdown()
+        self.visit_counter.close()
+        if self.backup_task is not None:
+            self.backup_task.stop()
+        if self.manager.history is not None:
+            self.manager.history.close()
+        if self.manager.writer is not None:
+            self.manager.writer.close()
+        if self.manager.shared is not None:
+            self.manager.shared.close()
+
+# Favicons and other fetched content, shared by all tenants (stored by hash)
+content_cache = ContentCache(os.path.abspath("cache"))
+
+# The original library, used by requests that name no tenant
+DEFAULT_TENANT = "default"
+default_tenant = Tenant(DEFAULT_TENANT)
+atexit.register(default_tenant.visit_counter.close)
+atexit.register(default_tenant.manager.history.close)
+
+# Other tenants are loaded on demand; see create_app for the production
+# settings they are opened with
+tenant_settings = {"deferred_writes": False, "shared_state": False, "backup_interval": 0,
+                   "history_checkpoints": 8}
+tenant_registry = TenantRegistry()
+
+def open_tenant(tenant_id):
+    root = tenant_registry.tenant_dir(tenant_id)
+    os.makedirs(root, exist_ok=True)
+    return Tenant(tenant_id, root, **tenant_settings)
+
+tenant_stores = TenantStores(open_tenant, max_open=32, idle_seconds=600)
+app.wsgi_app = TenantPrefixMiddleware(app.wsgi_app)
+
+def checkout_tenant(tenant_id):
+    if tenant_id == DEFAULT_TENANT:
+        return default_tenant
+    return tenant_stores.checkout(tenant_id)
+
+def checkin_tenant(tenant_id):
+    if tenant_id != DEFAULT_TENANT:
+        tenant_stores.checkin(tenant_id)
+
+# The routes use these as before; they resolve to the request's tenant
+bookmark_manager = LocalProxy(lambda: g.tenant.manager)
+link_status_store = LocalProxy(lambda: g.tenant.link_status_store)
+link_check_job = LocalProxy(lambda: g.tenant.link_check_job)
+metadata_store = LocalProxy(lambda: g.tenant.metadata_store)
+metadata_fetcher = LocalProxy(lambda: g.tenant.metadata_fetcher)
+visit_counter = LocalProxy(lambda: g.tenant.visit_counter)
+backup_store = LocalProxy(lambda: g.tenant.backup_store)
+
+# Imports and exports run here instead of on a request thread
+task_runner = TaskRunner(max_workers=2)
+
+def submit_tenant_job(kind, fn, *args):
+    # Keeps the tenant loaded until its job finishes
+    tenant_id = checkout_tenant(g.tenant.id).id
+    
+    def run():
+        try:
+            return fn(*args)
+        finally:
+            checkin_tenant(tenant_id)
+    
+    return task_runner.submit(kind, run, owner=tenant_id)
+
+@app.before_request
+def select_tenant():
+    # A path prefix (/t/<tenant id>) or an API token picks the tenant.
+    # Tenants that have tokens can only be reached with one of them.
+    tenant_id = request.environ.get("bookmarks.tenant")
+    token = request_token(request)
+    
+    if token:
+        token_tenant = tenant_registry.tenant_for_token(token)
+        if token_tenant is None:
+            return jsonify({"error": "Invalid API token"}), 401
+        if tenant_id is not None and tenant_id != token_tenant:
+            return jsonify({"error": "Token does not belong to this tenant"}), 403
+        tenant_id = token_tenant
+    elif tenant_id is not None and tenant_id in tenant_registry.tokens.values():
+        return jsonify({"error": "API token required"}), 401
+    
+    if tenant_id is None:
+        g.tenant = default_tenant
+        return
+    if not tenant_registry.exists(tenant_id):
+        return jsonify({"error": "Tenant not found"}), 404
+    
+    g.tenant = checkout_tenant(tenant_id)
+    g.checked_out_tenant = tenant_id
+
+@app.before_request
+def start_scheduled_backups():
+    # Backup threads start in the worker processes, not before a fork
+    if g.get("tenant") is not None and g.tenant.backup_task is not None:
+        g.tenant.backup_task.ensure_running()
+
+@app.teardown_request
+def release_tenant(exc=None):
+    tenant_id = g.pop("checked_out_tenant", None)
+    if tenant_id is not None:
+        checkin_tenant(tenant_id)
+
+# Writes that leave the bookmark data alone and don't need the write lock
+UNLOCKED_WRITES = {"record_visit"}
+
+@app.before_request
+def lock_for_writes():
+    # Mutating requests run one at a time (across workers too), so
+    # validation and the change it validates can't interleave with another
+    # writer. Reads first pick up what other workers changed.
+    if request.method in WRITE_METHODS and request.endpoint not in UNLOCKED_WRITES:
+        g.write_batch = bookmark_manager.batch()
+        g.write_batch.__enter__()
+    else:
+        bookmark_manager.sync_shared()
+
+@app.teardown_request
+def release_write_lock(exc=None):
+    write_batch = g.pop("write_batch", None)
+    if write_batch is not None:
+        write_batch.__exit__(None, None, None)
+
+def add_page_metadata(bookmark_dict):
+    record = metadata_store.get(bookmark_dict['id'])
+    if record and record.get('url') == bookmark_dict['url']:
+        bookmark_dict['page_title'] = record.get('title')
+        bookmark_dict['page_description'] = record.get('description')
+        if record.get('favicon'):
+            bookmark_dict['favicon_url'] = url_for('get_favicon', bookmark_id=bookmark_dict['id'], v=record['favicon'][:12])
+    return bookmark_dict
+
+def to_columns(records):
+    # {"count": n, "columns": {field: [values...]}}; sends each key once
+    # instead of once per record. Fields missing from a record are null.
+    fields = []
+    for record in records:
+        for field in record:
+            if field not in fields:
+                fields.append(field)
+    return {
+        "count": len(records),
+        "columns": {field: [record.get(field) for record in records] for field in fields}
+    }
+
+def bookmark_sync_dict(bookmark):
+    # Names are resolved on the client from the cached categories, so a
+    # rename only changes the category record
+    return add_page_metadata(bookmark.to_dict())
 
 @app.route('/')
 def home():
@@ -304,28 +1085,71 @@ def home():
 
 @app.route('/api/bookmarks', methods=['GET'])
 def get_bookmarks():
-    sort_by = request.args.get('sort', 'name_asc')
+    search_mode = request.args.get('mode', 'substring')
+    sort_by = request.args.get('sort', 'relevance' if search_mode == 'fuzzy' else 'name_asc')
     category_id = request.args.get('category')
+    subcategory_id = request.args.get('subcategory')
     type_filter = request.args.get('type')
     search_query = request.args.get('search')
+    # Boolean tag query, e.g. "writing AND (coding OR research) NOT paid"
+    tag_query = request.args.get('tags')
     
-    bookmarks = bookmark_manager.bookmarks.copy()
-    
-    # Apply search filter
-    if search_query:
-        bookmarks = bookmark_manager.search_bookmarks(search_query)
-    
-    # Apply category filter
+    # Parse the indexed filters
     if category_id and category_id != "ALL":
         try:
             category_id = int(category_id)
-            bookmarks = [b for b in bookmarks if b.category_id == category_id]
         except ValueError:
-            pass
+            category_id = None
+    else:
+        category_id = None
+    
+    if subcategory_id and subcategory_id != "ALL":
+        try:
+            subcategory_id = int(subcategory_id)
+        except ValueError:
+            subcategory_id = None
+    else:
+        subcategory_id = None
+    
+    if not type_filter or type_filter == "ALL":
+        type_filter = None
+    
+    # A past state of the library, rebuilt from the history, goes through
+    # the same filters, sorts and paging as the live one
+    manager = bookmark_manager
+    if request.args.get('as_of'):
+        manager, error = library_as_of(request.args['as_of'])
+        if error:
+            return error
     
-    # Apply type filter
-    if type_filter and type_filter != "ALL":
-        bookmarks = [b for b in bookmarks if b.type == type_filter]
+    try:
+        limit = max(1, int(request.args.get('limit', 50)))
+    except ValueError:
+        limit = 50
+    
+    # With an offset, only one page of the sorted results is returned and
+    # the full count goes in the X-Total-Count header
+    offset = request.args.get('offset')
+    if offset is not None:
+        try:
+            offset = max(0, int(offset))
+        except ValueError:
+            offset = 0
+    
+    # Intersect the filters through the index, then apply search.
+    # Fuzzy mode returns the top `limit` matches ranked by relevance.
+    try:
+        bookmarks, total = manager.query_bookmarks(
+            search_query,
+            category_id=category_id,
+            subcategory_id=subcategory_id,
+            bookmark_type=type_filter,
+            mode=search_mode,
+            limit=limit if offset is None else offset + limit,
+            tag_query=tag_query
+        )
+    except TagQueryError as e:
+        return jsonify({"error": f"Invalid tag query: {e}"}), 400
     
     # Apply sorting
     if sort_by == 'name_asc':
@@ -333,27 +1157,175 @@ def get_bookmarks():
     elif sort_by == 'name_desc':
         bookmarks.sort(key=lambda b: b.name.lower(), reverse=True)
     elif sort_by == 'category':
-        bookmarks.sort(key=lambda b: (bookmark_manager.get_category_name(b.category_id).lower(), b.name.lower()))
+        bookmarks.sort(key=lambda b: (manager.get_category_name(b.category_id).lower(), b.name.lower()))
     elif sort_by == 'type':
         bookmarks.sort(key=lambda b: (b.type, b.name.lower()))
+    elif sort_by in ('popular', 'recent'):
+        # Kept in order as bookmarks and visit counts change
+        bookmarks = manager.rank_bookmarks(bookmarks, sort_by)
+    
+    # X-Total-Count is every match, also in fuzzy mode where only the
+    # top offset + limit are ranked
+    if offset is not None:
+        bookmarks = bookmarks[offset:offset + limit]
     
     # Convert to dictionaries with category and subcategory names
     result = []
     for bookmark in bookmarks:
         bookmark_dict = bookmark.to_dict()
-        bookmark_dict['category_name'] = bookmark_manager.get_category_name(bookmark.category_id)
-        bookmark_dict['subcategory_name'] = bookmark_manager.get_subcategory_name(bookmark.subcategory_id)
-        result.append(bookmark_dict)
+        bookmark_dict['category_name'] = manager.get_category_name(bookmark.category_id)
+        bookmark_dict['subcategory_name'] = manager.get_subcategory_name(bookmark.subcategory_id)
+        result.append(add_page_metadata(bookmark_dict))
     
-    return jsonify(result)
+    if request.args.get('format') == 'columns':
+        response = jsonify(to_columns(result))
+    else:
+        response = jsonify(result)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+def parse_timestamp(value):
+    # Seconds since the epoch, or an ISO 8601 date/time
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def library_as_of(value):
+    # (a read-only BookmarkManager holding the library as it was at time
+    # `value`, None) or (None, error response)
+    when = parse_timestamp(value)
+    if when is None:
+        return None, (jsonify({"error": "Invalid as_of time"}), 400)
+    if bookmark_manager.history is None:
+        return None, (jsonify({"error": "History is not enabled"}), 404)
+    try:
+        state = bookmark_manager.history.state_at(when)
+    except HistoryError as e:
+        return None, (jsonify({"error": str(e), "oldest": bookmark_manager.history.oldest()}), 404)
+    
+    past = BookmarkManager(bookmark_manager.data_path, data={
+        "categories": list(state["category"].values()),
+        "subcategories": list(state["subcategory"].values()),
+        "bookmarks": list(state["bookmark"].values())
+    })
+    # Visit counts aren't part of the history; popular/recent use today's
+    past.rankings.apply_visits(True, visit_counter.all_totals())
+    return past, None
+
+@app.route('/api/sync', methods=['GET'])
+def sync():
+    # Clients send the epoch and version of their cached copy and get back
+    # either the records changed since then or, when that is not possible,
+    # a full copy. Records that were changed and no longer exist are deleted.
+    epoch = request.args.get('epoch')
+    try:
+        since = int(request.args.get('since', ''))
+    except ValueError:
+        since = None
+    
+    changes = None
+    if epoch and since is not None:
+        changes = bookmark_manager.changes.changes_since(epoch, since)
+    
+    if changes is None:
+        # Read the version first; anything changed meanwhile is re-sent next time
+        version = bookmark_manager.changes.version
+        return jsonify({
+            "epoch": bookmark_manager.changes.epoch,
+            "version": version,
+            "full": True,
+            "categories": [c.to_dict() for c in bookmark_manager.categories],
+            "subcategories": [s.to_dict() for s in bookmark_manager.subcategories],
+            "bookmarks": [bookmark_sync_dict(b) for b in bookmark_manager.bookmarks],
+            "deleted": {"categories": [], "subcategories": [], "bookmarks": []}
+        })
+    
+    version, changed = changes
+    categories = {c.id: c for c in bookmark_manager.categories if c.id in changed.get("category", ())}
+    subcategories = {s.id: s for s in bookmark_manager.subcategories if s.id in changed.get("subcategory", ())}
+    bookmarks = {}
+    for bookmark_id in changed.get("bookmark", ()):
+        bookmark = bookmark_manager.get_bookmark(bookmark_id)
+        if bookmark:
+            bookmarks[bookmark_id] = bookmark
+    
+    return jsonify({
+        "epoch": bookmark_manager.changes.epoch,
+        "version": version,
+        "full": False,
+        "categories": [c.to_dict() for c in categories.values()],
+        "subcategories": [s.to_dict() for s in subcategories.values()],
+        "bookmarks": [bookmark_sync_dict(b) for b in bookmarks.values()],
+        "deleted": {
+            "categories": sorted(changed.get("category", set()) - set(categories)),
+            "subcategories": sorted(changed.get("subcategory", set()) - set(subcategories)),
+            "bookmarks": sorted(changed.get("bookmark", set()) - set(bookmarks))
+        }
+    })
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    query = request.args.get('q', '')
+    
+    try:
+        limit = min(max(1, int(request.args.get('limit', 10))), 50)
+    except ValueError:
+        limit = 10
+    
+    kinds = request.args.get('types')
+    kinds = set(kinds.split(',')) if kinds else None
+    
+    return jsonify(bookmark_manager.suggest_index.suggest(query, limit, kinds))
 
 @app.route('/api/bookmarks/<int:bookmark_id>', methods=['GET'])
 def get_bookmark(bookmark_id):
     bookmark = bookmark_manager.get_bookmark_with_details(bookmark_id)
     if bookmark:
-        return jsonify(bookmark)
+        bookmark['link_status'] = link_status_store.get(bookmark_id)
+        return jsonify(add_page_metadata(bookmark))
     return jsonify({"error": "Bookmark not found"}), 404
 
+@app.route('/api/bookmarks/<int:bookmark_id>/favicon', methods=['GET'])
+def get_favicon(bookmark_id):
+    bookmark = bookmark_manager.get_bookmark(bookmark_id)
+    if not bookmark:
+        return jsonify({"error": "Bookmark not found"}), 404
+    
+    record = metadata_store.get(bookmark_id)
+    cached = content_cache.get(record['favicon']) if record and record.get('favicon') else None
+    if not cached:
+        # Never block on the remote site; fetch it for next time instead
+        metadata_fetcher.enqueue(bookmark_id, bookmark.url)
+        return jsonify({"error": "Favicon not cached"}), 404
+    
+    data, content_type = cached
+    etag = record['favicon']
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(data, mimetype=content_type)
+    
+    # Listing URLs carry a ?v=<hash> so the browser can keep this for a year
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable' if request.args.get('v') else 'public, max-age=86400'
+    return response
+
+@app.route('/api/metadata/refresh', methods=['POST'])
+def refresh_metadata():
+    force = request.args.get('force') in ('1', 'true')
+    
+    queued = 0
+    for bookmark in bookmark_manager.bookmarks:
+        if metadata_fetcher.enqueue(bookmark.id, bookmark.url, force=force):
+            queued += 1
+    
+    return jsonify({"queued": queued}), 202
+
 @app.route('/api/bookmarks', methods=['POST'])
 def add_bookmark():
     data = request.json
@@ -373,6 +1345,11 @@ def add_bookmark():
     if not name:
         return jsonify({"error": "Name is required"}), 400
     
+    try:
+        tags = normalize_tags(data.get('tags'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Validate category and subcategory
     category = next((c for c in bookmark_manager.categories if c.id == category_id), None)
     if not category:
@@ -382,15 +1359,23 @@ def add_bookmark():
     if not subcategory:
         return jsonify({"error": "Subcategory not found or doesn't belong to the selected category"}), 400
     
+    duplicate = bookmark_manager.find_duplicate(url) if url else None
+    if duplicate and not data.get('allow_duplicate'):
+        return jsonify({"error": f"A bookmark with this URL already exists: {duplicate.name}",
+                        "duplicate_of": duplicate.id}), 409
+    
     bookmark = bookmark_manager.add_bookmark(
         name, 
         url if url else None, 
         description if description else None, 
         category_id, 
         subcategory_id, 
-        bookmark_type
+        bookmark_type,
+        tags
     )
     
+    metadata_fetcher.enqueue(bookmark.id, bookmark.url)
+    
     result = bookmark.to_dict()
     result['category_name'] = bookmark_manager.get_category_name(bookmark.category_id)
     result['subcategory_name'] = bookmark_manager.get_subcategory_name(bookmark.subcategory_id)
@@ -416,6 +1401,12 @@ def update_bookmark(bookmark_id):
     if not name:
         return jsonify({"error": "Name is required"}), 400
     
+    # Leaving tags out keeps the bookmark's current ones
+    try:
+        tags = normalize_tags(data['tags']) if 'tags' in data else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Validate category and subcategory
     category = next((c for c in bookmark_manager.categories if c.id == category_id), None)
     if not category:
@@ -425,6 +1416,11 @@ def update_bookmark(bookmark_id):
     if not subcategory:
         return jsonify({"error": "Subcategory not found or doesn't belong to the selected category"}), 400
     
+    duplicate = bookmark_manager.find_duplicate(url, exclude_id=bookmark_id) if url else None
+    if duplicate and not data.get('allow_duplicate'):
+        return jsonify({"error": f"A bookmark with this URL already exists: {duplicate.name}",
+                        "duplicate_of": duplicate.id}), 409
+    
     success = bookmark_manager.update_bookmark(
         bookmark_id,
         name, 
@@ -432,24 +1428,107 @@ def update_bookmark(bookmark_id):
         description if description else None, 
         category_id, 
         subcategory_id, 
-        bookmark_type
+        bookmark_type,
+        tags
     )
     
     if success:
         bookmark = bookmark_manager.get_bookmark_with_details(bookmark_id)
-        return jsonify(bookmark)
+        metadata_fetcher.enqueue(bookmark_id, bookmark['url'])
+        return jsonify(add_page_metadata(bookmark))
     
     return jsonify({"error": "Bookmark not found"}), 404
 
 @app.route('/api/bookmarks/<int:bookmark_id>', methods=['DELETE'])
 def delete_bookmark(bookmark_id):
-    bookmark = next((b for b in bookmark_manager.bookmarks if b.id == bookmark_id), None)
+    bookmark = bookmark_manager.get_bookmark(bookmark_id)
     if not bookmark:
         return jsonify({"error": "Bookmark not found"}), 404
     
     bookmark_manager.delete_bookmark(bookmark_id)
+    visit_counter.forget([bookmark_id])
     return jsonify({"success": True})
 
+@app.route('/api/bookmarks/<int:bookmark_id>/visit', methods=['POST'])
+def record_visit(bookmark_id):
+    # Called on every click, so it only bumps an in-memory counter
+    if not bookmark_manager.get_bookmark(bookmark_id):
+        return jsonify({"error": "Bookmark not found"}), 404
+    visit_counter.hit(bookmark_id)
+    return '', 204
+
+def visit_views(pairs, field):
+    result = []
+    for bookmark_id, value in pairs:
+        bookmark = bookmark_manager.get_bookmark_with_details(bookmark_id)
+        if bookmark:
+            bookmark[field] = value
+            result.append(add_page_metadata(bookmark))
+    return result
+
+def visit_limit():
+    try:
+        return min(100, max(1, int(request.args.get('limit', 10))))
+    except ValueError:
+        return 10
+
+@app.route('/api/visits/top', methods=['GET'])
+def most_visited():
+    # Deleted bookmarks may linger until the next flush, so ask for a few
+    # extra and skip them
+    limit = visit_limit()
+    return jsonify(visit_views(visit_counter.top(limit + 10), 'visit_count')[:limit])
+
+@app.route('/api/visits/recent', methods=['GET'])
+def recently_visited():
+    limit = visit_limit()
+    return jsonify(visit_views(visit_counter.recent(limit + 10), 'last_visited')[:limit])
+
+@app.route('/api/undo', methods=['POST'])
+def undo():
+    # Reverses the last operation, e.g. a category delete together with
+    # everything it took with it
+    return reverse_operation(undo=True)
+
+@app.route('/api/redo', methods=['POST'])
+def redo():
+    return reverse_operation(undo=False)
+
+def reverse_operation(undo):
+    if bookmark_manager.history is None:
+        return jsonify({"error": "History is not enabled"}), 404
+    op = bookmark_manager.reverse_operation(undo)
+    if op is None:
+        return jsonify({"error": "Nothing to undo" if undo else "Nothing to redo"}), 409
+    return jsonify({
+        "undone" if undo else "redone": op["op"],
+        "time": op["t"],
+        "changes": [{"kind": kind, "id": item_id} for kind, item_id, before, after in op["changes"]]
+    })
+
+@app.route('/api/tags', methods=['GET'])
+def get_tags():
+    return jsonify([{"tag": tag, "count": count}
+                    for tag, count in bookmark_manager.tag_index.counts()])
+
+@app.route('/api/duplicates', methods=['GET'])
+def get_duplicates():
+    result = []
+    for url, bookmarks in bookmark_manager.get_duplicate_groups().items():
+        result.append({
+            "canonical_url": url,
+            "bookmarks": [bookmark_manager.get_bookmark_with_details(b.id) for b in bookmarks]
+        })
+    
+    result.sort(key=lambda group: group["canonical_url"])
+    return jsonify(result)
+
+@app.route('/api/duplicates/merge', methods=['POST'])
+def merge_duplicates():
+    removed = bookmark_manager.merge_duplicates()
+    visit_counter.forget(removed)
+    return jsonify({"success": True, "removed": sorted(removed)})
+
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     categories = [c.to_dict() for c in bookmark_manager.categories]
@@ -487,7 +1566,9 @@ def delete_category(category_id):
     if not category:
         return jsonify({"error": "Category not found"}), 404
     
+    removed = [b.id for b in bookmark_manager.index.query(category_id=category_id)]
     bookmark_manager.delete_category(category_id)
+    visit_counter.forget(removed)
     return jsonify({"success": True})
 
 @app.route('/api/subcategories', methods=['GET'])
@@ -559,17 +1640,177 @@ def delete_subcategory(subcategory_id):
     if not subcategory:
         return jsonify({"error": "Subcategory not found"}), 404
     
+    removed = [b.id for b in bookmark_manager.index.query(subcategory_id=subcategory_id)]
     bookmark_manager.delete_subcategory(subcategory_id)
+    visit_counter.forget(removed)
     return jsonify({"success": True})
 
+@app.route('/api/link-check', methods=['POST'])
+def start_link_check():
+    targets = [(b.id, b.url) for b in bookmark_manager.bookmarks]
+    
+    if not link_check_job.start(targets):
+        return jsonify({"error": "A link check is already running"}), 409
+    
+    return jsonify(link_check_job.to_dict()), 202
+
+@app.route('/api/link-check', methods=['GET'])
+def get_link_check():
+    broken_only = request.args.get('broken') in ('1', 'true')
+    
+    results = []
+    for bookmark in bookmark_manager.bookmarks:
+        status = link_status_store.get(bookmark.id)
+        if not status or (broken_only and status["ok"]):
+            continue
+        result = dict(status)
+        result['bookmark_id'] = bookmark.id
+        result['name'] = bookmark.name
+        results.append(result)
+    
+    job = link_check_job.to_dict()
+    job['results'] = results
+    return jsonify(job)
+
 @app.route('/api/export', methods=['GET'])
 def export_data():
-    data = {
-        "categories": [c.to_dict() for c in bookmark_manager.categories],
-        "subcategories": [s.to_dict() for s in bookmark_manager.subcategories],
-        "bookmarks": [b.to_dict() for b in bookmark_manager.bookmarks]
-    }
-    return jsonify(data)
+    return jsonify(bookmark_manager.export_data())
+
+@app.route('/api/export/jobs', methods=['POST'])
+def start_export():
+    job = submit_tenant_job("export", bookmark_manager.export_data)
+    return jsonify(job), 202
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected an exported JSON object"}), 400
+    
+    job = submit_tenant_job("import", bookmark_manager.import_data, data)
+    return jsonify(job), 202
+
+@app.route('/api/backups', methods=['GET'])
+def list_backups():
+    return jsonify([{
+        "id": s["id"],
+        "time": s["time"],
+        "counts": s["counts"],
+        "chunks": len(s["chunks"]),
+        "new_chunks": s["new_chunks"],
+        "bytes_written": s["bytes_written"]
+    } for s in backup_store.list()])
+
+@app.route('/api/backups', methods=['POST'])
+def create_backup():
+    store = g.tenant.backup_store
+    manager = g.tenant.manager
+    
+    def snapshot():
+        manifest = store.snapshot(manager.export_data())
+        return {"id": manifest["id"], "chunks": len(manifest["chunks"]),
+                "new_chunks": manifest["new_chunks"], "bytes_written": manifest["bytes_written"]}
+    
+    job = submit_tenant_job("backup", snapshot)
+    return jsonify(job), 202
+
+@app.route('/api/backups/<snapshot_id>/verify', methods=['POST'])
+def verify_backup(snapshot_id):
+    if backup_store.get(snapshot_id) is None:
+        return jsonify({"error": "Backup not found"}), 404
+    
+    job = submit_tenant_job("verify-backup", backup_store.verify, snapshot_id)
+    return jsonify(job), 202
+
+@app.route('/api/backups/<snapshot_id>/restore', methods=['POST'])
+def restore_backup(snapshot_id):
+    store = g.tenant.backup_store
+    manager = g.tenant.manager
+    if store.get(snapshot_id) is None:
+        return jsonify({"error": "Backup not found"}), 404
+    
+    def restore():
+        # Every chunk is read and its hash checked before the library is
+        # touched, so a damaged backup changes nothing
+        try:
+            segments = list(store.read_snapshot(snapshot_id))
+        except BackupError as e:
+            return {"error": str(e)}
+        return manager.restore_snapshot(segments)
+    
+    job = submit_tenant_job("restore-backup", restore)
+    return jsonify(job), 202
+
+@app.route('/api/integrity', methods=['GET'])
+def check_integrity():
+    issues = list(check_library(bookmark_manager.export_data()))
+    return jsonify({"ok": not issues, "issues": issues})
+
+@app.route('/api/integrity/repair', methods=['POST'])
+def repair_integrity():
+    # The repaired copy is applied like a restore, so only the records
+    # that change are written; one batch, so no write lands in between
+    # and the repair is undone as one operation
+    manager = g.tenant.manager
+    
+    def repair():
+        with manager.batch():
+            data = manager.export_data()
+            issues = list(check_library(data, repair=True))
+            if issues:
+                manager.restore_snapshot([data])
+        return {"repaired": issues}
+    
+    job = submit_tenant_job("repair", repair)
+    return jsonify(job), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = task_runner.get(job_id)
+    if not job or job["owner"] != g.tenant.id:
+        return jsonify({"error": "Job not found"}), 404
+    
+    if job["status"] == "done":
+        job["result"] = task_runner.result(job_id)
+    return jsonify(job)
+
+def create_app(deferred_writes=True, shared_state=True, rate_limits=True, backup_interval=3600,
+               history_checkpoints=8):
+    # Entry point for production servers (see wsgi.py). The default
+    # tenant is loaded when this module is imported, so a pre-forking
+    # server that preloads the app shares one loaded copy between its
+    # workers; its shared state must be started there, once, before they
+    # fork. Other tenants are opened with the same settings on demand.
+    # Rate limits are kept in a file when workers must share them.
+    # Libraries are backed up every `backup_interval` seconds (0: never).
+    # `history_checkpoints` sets how far back undo and as_of reach (see
+    # history.py).
+    manager = default_tenant.manager
+    if deferred_writes and manager.writer is None:
+        manager.writer = DeferredWriter(manager.write_data)
+        atexit.register(flush_pending_writes)
+    if shared_state and manager.shared is None:
+        shared = SharedState(manager.data_path)
+        shared.acquire()
+        try:
+            manager.attach_shared(shared, reset=True)
+        finally:
+            shared.release()
+    tenant_settings.update(deferred_writes=deferred_writes, shared_state=shared_state,
+                           backup_interval=backup_interval, history_checkpoints=history_checkpoints)
+    default_tenant.manager.history.keep_checkpoints = max(2, history_checkpoints)
+    if backup_interval and default_tenant.backup_task is None:
+        default_tenant.schedule_backups(backup_interval)
+    if rate_limits and not admission.enabled:
+        admission.enable(SqliteBuckets(os.path.abspath("rate_limits.db")) if shared_state else None)
+    return app
+
+def flush_pending_writes():
+    # Loaded tenants are closed, which writes anything still pending
+    tenant_stores.close_all()
+    if default_tenant.manager.writer is not None:
+        default_tenant.manager.writer.flush_now()
+    default_tenant.visit_counter.writer.flush_now()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Background Tasks
+
+Keeps slow work off the request threads:
+
+- DeferredWriter coalesces persistence requests and runs the flush on its
+  own thread, so a burst of writes costs one save and no request waits on
+  the disk.
+- TaskRunner runs long jobs (imports, exports) on a small thread pool and
+  keeps their status and result so clients can poll for them.
+- PeriodicTask runs something on a schedule, e.g. backups.
+
+Threads are started lazily and restarted after a fork, so both are safe
+to create before a pre-forking server (gunicorn --preload) forks workers.
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class DeferredWriter:
+    def __init__(self, flush, delay=0.2):
+        self.flush = flush
+        self.delay = delay
+        self.condition = threading.Condition()
+        self.pending = False
+        self.closed = False
+        self.thread = None
+        self.pid = None
+
+    def _ensure_thread(self):
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name="deferred-writer", daemon=True)
+            self.thread.start()
+
+    def request(self):
+        with self.condition:
+            self.pending = True
+            if not self.closed:
+                self._ensure_thread()
+                self.condition.notify()
+                return
+        self.flush_now()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            # Let the rest of a burst arrive before writing
+            threading.Event().wait(self.delay)
+            self.flush_now()
+
+    def close(self):
+        # Writes anything pending and stops the thread
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.flush_now()
+
+    def flush_now(self):
+        with self.condition:
+            if not self.pending:
+                return
+            self.pending = False
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            with self.condition:
+                self.pending = True
+
+
+class PeriodicTask:
+    def __init__(self, fn, interval):
+        self.fn = fn
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def ensure_running(self):
+        # Cheap enough to call on every request
+        if self.stopped.is_set():
+            return
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name="periodic-task", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.fn()
+            except Exception as e:
+                print(f"Error in periodic task: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+class TaskRunner:
+    def __init__(self, max_workers=2, keep=100):
+        self.max_workers = max_workers
+        self.keep = keep
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+    def _ensure_executor(self):
+        if self.executor is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task")
+
+    def submit(self, kind, fn, *args, owner=None):
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "owner": owner,
+            "status": "queued",
+            "created_at": datetime.now().timestamp(),
+            "finished_at": None,
+            "error": None
+        }
+        with self.lock:
+            self.jobs[job["id"]] = {"job": job, "result": None}
+            # Forget the oldest finished jobs
+            finished = [k for k, v in self.jobs.items() if v["job"]["finished_at"]]
+            for job_id in finished[:max(0, len(self.jobs) - self.keep)]:
+                del self.jobs[job_id]
+            self._ensure_executor()
+        self.executor.submit(self._run, job["id"], fn, args)
+        return dict(job)
+
+    def _run(self, job_id, fn, args):
+        entry = self.jobs[job_id]
+        entry["job"]["status"] = "running"
+        try:
+            entry["result"] = fn(*args)
+            entry["job"]["status"] = "done"
+        except Exception as e:
+            entry["job"]["status"] = "failed"
+            entry["job"]["error"] = str(e)
+        finally:
+            entry["job"]["finished_at"] = datetime.now().timestamp()
+
+    def get(self, job_id):
+        entry = self.jobs.get(job_id)
+        return dict(entry["job"]) if entry else None
+
+    def result(self, job_id):
+        entry = self.jobs.get(job_id)
+        return entry["result"] if entry else None
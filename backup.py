@@ -0,0 +1,366 @@
+"""
+Incremental Backups
+
+A snapshot splits the library into segments - each category with its
+subcategories, and its bookmarks in blocks of consecutive ids - and stores
+every segment as a gzipped chunk named by the SHA-256 of its contents.
+Segments that haven't changed since an earlier snapshot hash the same, so
+their chunks are already on disk and aren't written again; a snapshot of a
+mostly unchanged library writes a handful of chunks and a small manifest.
+
+    backups/
+        chunks/ab/ab12...ef.json.gz
+        snapshots/<snapshot id>.json     (manifest: time, counts, chunk list)
+
+Retention keeps the most recent snapshots plus the newest one of each of
+the last few days and weeks; chunks no kept snapshot refers to are then
+deleted. Verification re-reads every chunk of a snapshot and checks its
+hash. A restore reads and checks every chunk first, then applies them in
+one batch (see BookmarkManager.restore_snapshot), so a damaged snapshot
+leaves the library as it was.
+
+Command line (works on a copy of the data file, never the live server):
+
+    python backup.py snapshot bookmark_data.json
+    python backup.py list
+    python backup.py verify [snapshot id]
+    python backup.py bench --sizes 1000,10000,50000
+"""
+
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# Bookmarks per segment, by id, so adding or deleting a bookmark only
+# changes the segment its id falls in
+SEGMENT_SIZE = 256
+
+
+class BackupError(Exception):
+    pass
+
+
+def segment_library(data):
+    # Yields the segments of an export (see BookmarkManager.export_data),
+    # parents before children
+    subcategories = {}
+    for s in data["subcategories"]:
+        subcategories.setdefault(s["category_id"], []).append(s)
+    bookmarks = {}
+    for b in sorted(data["bookmarks"], key=lambda b: b["id"]):
+        bookmarks.setdefault(b["category_id"], {}).setdefault(b["id"] // SEGMENT_SIZE, []).append(b)
+
+    for c in sorted(data["categories"], key=lambda c: c["id"]):
+        yield {"categories": [c], "subcategories": sorted(subcategories.get(c["id"], []), key=lambda s: s["id"])}
+        for block in sorted(bookmarks.pop(c["id"], {}).items()):
+            yield {"bookmarks": block[1]}
+    # Bookmarks whose category is gone still get backed up
+    for blocks in bookmarks.values():
+        for block in sorted(blocks.items()):
+            yield {"bookmarks": block[1]}
+
+
+class RetentionPolicy:
+    def __init__(self, keep_last=10, keep_daily=7, keep_weekly=4):
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+
+    def select(self, snapshots):
+        # Ids of the snapshots to keep; `snapshots` is newest first
+        keep = {s["id"] for s in snapshots[:self.keep_last]}
+        for period, count in ((lambda t: t.date(), self.keep_daily),
+                              (lambda t: t.isocalendar()[:2], self.keep_weekly)):
+            seen = []
+            for s in snapshots:
+                key = period(datetime.fromtimestamp(s["time"]))
+                if key in seen:
+                    continue
+                if len(seen) == count:
+                    break
+                seen.append(key)
+                keep.add(s["id"])
+        return keep
+
+
+class BackupStore:
+    def __init__(self, path="backups", retention=None):
+        self.path = path
+        self.chunk_dir = os.path.join(path, "chunks")
+        self.snapshot_dir = os.path.join(path, "snapshots")
+        self.retention = retention or RetentionPolicy()
+        self.lock = threading.Lock()
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def _file_lock(self, exclusive):
+        fd = os.open(os.path.join(self.path, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return fd
+
+    def chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest + ".json.gz")
+
+    def _write_chunk(self, segment):
+        # Returns (digest, bytes written - 0 when the chunk already existed)
+        raw = json.dumps(segment, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = gzip.compress(raw, compresslevel=6)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        return digest, len(compressed)
+
+    def _read_chunk(self, digest):
+        try:
+            with open(self.chunk_path(digest), "rb") as f:
+                raw = gzip.decompress(f.read())
+        except (OSError, EOFError) as e:
+            raise BackupError(f"Chunk {digest[:12]} is unreadable: {e}")
+        if hashlib.sha256(raw).hexdigest() != digest:
+            raise BackupError(f"Chunk {digest[:12]} is corrupt")
+        return json.loads(raw)
+
+    def snapshot(self, data, min_interval=0, skip_unchanged=False):
+        # Backs up an export of the library and returns its manifest, or
+        # None when skipped. With `min_interval`, skips when a snapshot is
+        # younger than that (so several worker processes on one schedule
+        # take one snapshot between them); with `skip_unchanged`, skips
+        # when nothing changed since the latest one.
+        with self.lock:
+            fd = self._file_lock(exclusive=True)
+            try:
+                latest = self.list()
+                if min_interval and latest and time.time() - latest[0]["time"] < min_interval:
+                    return None
+
+                manifest = {
+                    "id": datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6],
+                    "time": time.time(),
+                    "counts": {kind: len(data[kind]) for kind in ("categories", "subcategories", "bookmarks")},
+                    "chunks": [],
+                    "new_chunks": 0,
+                    "bytes_written": 0
+                }
+                for segment in segment_library(data):
+                    digest, written = self._write_chunk(segment)
+                    manifest["chunks"].append(digest)
+                    if written:
+                        manifest["new_chunks"] += 1
+                        manifest["bytes_written"] += written
+                if skip_unchanged and latest and latest[0]["chunks"] == manifest["chunks"]:
+                    return None
+
+                tmp_path = os.path.join(self.snapshot_dir, manifest["id"] + ".json.tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(manifest, f)
+                os.replace(tmp_path, os.path.join(self.snapshot_dir, manifest["id"] + ".json"))
+                self._apply_retention()
+                return manifest
+            finally:
+                os.close(fd)
+
+    def list(self):
+        # Manifests, newest first
+        snapshots = []
+        for name in os.listdir(self.snapshot_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.snapshot_dir, name), "r") as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        snapshots.sort(key=lambda s: s["time"], reverse=True)
+        return snapshots
+
+    def get(self, snapshot_id):
+        path = os.path.join(self.snapshot_dir, os.path.basename(snapshot_id) + ".json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _apply_retention(self):
+        # Hold the lock
+        snapshots = self.list()
+        keep = self.retention.select(snapshots)
+        for s in snapshots:
+            if s["id"] not in keep:
+                os.remove(os.path.join(self.snapshot_dir, s["id"] + ".json"))
+
+        # Drop chunks that no remaining snapshot uses
+        used = {digest for s in snapshots if s["id"] in keep for digest in s["chunks"]}
+        for prefix in os.listdir(self.chunk_dir):
+            directory = os.path.join(self.chunk_dir, prefix)
+            for name in os.listdir(directory):
+                if name.split(".")[0] not in used:
+                    os.remove(os.path.join(directory, name))
+
+    def read_snapshot(self, snapshot_id):
+        # Yields the segments of a snapshot in order, checking each one
+        manifest = self.get(snapshot_id)
+        if manifest is None:
+            raise BackupError(f"Snapshot not found: {snapshot_id}")
+        fd = self._file_lock(exclusive=False)
+        try:
+            for digest in manifest["chunks"]:
+                yield self._read_chunk(digest)
+        finally:
+            os.close(fd)
+
+    def verify(self, snapshot_id):
+        # Returns {"id", "ok", "chunks", "counts", "errors"}
+        manifest = self.get(snapshot_id)
+        if manifest is None:
+            raise BackupError(f"Snapshot not found: {snapshot_id}")
+        counts = {"categories": 0, "subcategories": 0, "bookmarks": 0}
+        errors = []
+        fd = self._file_lock(exclusive=False)
+        try:
+            for digest in manifest["chunks"]:
+                try:
+                    segment = self._read_chunk(digest)
+                except BackupError as e:
+                    errors.append(str(e))
+                    continue
+                for kind in counts:
+                    counts[kind] += len(segment.get(kind, []))
+        finally:
+            os.close(fd)
+        if not errors and counts != manifest["counts"]:
+            errors.append(f"Expected {manifest['counts']}, found {counts}")
+        return {"id": snapshot_id, "ok": not errors, "chunks": len(manifest["chunks"]),
+                "counts": counts, "errors": errors}
+
+
+def synthetic_library(size, seed=1):
+    import random
+
+    rng = random.Random(seed)
+    categories = [{"id": i, "name": f"Category {i}"} for i in range(1, 21)]
+    subcategories = [{"id": i, "name": f"Subcategory {i}", "category_id": (i - 1) // 5 + 1} for i in range(1, 101)]
+    now = time.time()
+    bookmarks = []
+    for i in range(1, size + 1):
+        subcategory = rng.choice(subcategories)
+        bookmarks.append({
+            "id": i, "name": f"Bookmark {i}", "url": f"https://example.com/{i}",
+            "description": "Benchmark bookmark", "category_id": subcategory["category_id"],
+            "subcategory_id": subcategory["id"], "type": rng.choice(["FREE", "PAID", "FREEMIUM"]),
+            "tags": [], "created_at": now, "updated_at": now
+        })
+    return {"categories": categories, "subcategories": subcategories, "bookmarks": bookmarks}
+
+
+def bench(sizes):
+    # Times a full snapshot, an incremental one after a small edit, and a
+    # restore into an empty library, for each library size
+    directory = tempfile.mkdtemp(prefix="bookmark-backup-bench-")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from app import BookmarkManager
+        from background_tasks import DeferredWriter
+
+        print(f"{'bookmarks':>10}{'snapshot s':>12}{'chunks':>8}{'MB':>8}{'incr s':>9}{'new':>6}"
+              f"{'verify s':>10}{'restore s':>11}{'per 1k ms':>11}")
+        for size in sizes:
+            data = synthetic_library(size)
+            store = BackupStore(f"backups-{size}")
+
+            started = time.perf_counter()
+            full = store.snapshot(data)
+            full_seconds = time.perf_counter() - started
+
+            data["bookmarks"][0]["name"] = "Edited"
+            started = time.perf_counter()
+            incremental = store.snapshot(data)
+            incremental_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            store.verify(incremental["id"])
+            verify_seconds = time.perf_counter() - started
+
+            with open(f"restore-{size}.json", "w") as f:
+                json.dump({"categories": [], "subcategories": [], "bookmarks": []}, f)
+            # Saved through a background writer, as the server does
+            manager = BookmarkManager(f"restore-{size}.json")
+            manager.writer = DeferredWriter(manager.write_data)
+            started = time.perf_counter()
+            manager.restore_snapshot(list(store.read_snapshot(incremental["id"])))
+            manager.writer.flush_now()
+            restore_seconds = time.perf_counter() - started
+            manager.writer.close()
+            assert len(manager.bookmarks) == size
+
+            print(f"{size:>10}{full_seconds:>12.3f}{len(full['chunks']):>8}{full['bytes_written'] / 1e6:>8.2f}"
+                  f"{incremental_seconds:>9.3f}{incremental['new_chunks']:>6}{verify_seconds:>10.3f}"
+                  f"{restore_seconds:>11.3f}{restore_seconds / size * 1e6:>11.2f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental backups of the bookmark library")
+    parser.add_argument("--store", default="backups", help="backup directory (default: backups)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot_parser = commands.add_parser("snapshot", help="back up a data file")
+    snapshot_parser.add_argument("data_file", nargs="?", default="bookmark_data.json")
+    commands.add_parser("list", help="list snapshots, newest first")
+    verify_parser = commands.add_parser("verify", help="check a snapshot's chunks (default: all)")
+    verify_parser.add_argument("snapshot_id", nargs="?")
+    bench_parser = commands.add_parser("bench", help="time snapshots and restores by library size")
+    bench_parser.add_argument("--sizes", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench([int(size) for size in args.sizes.split(",")])
+        return 0
+
+    store = BackupStore(args.store)
+    if args.command == "snapshot":
+        with open(args.data_file, "r") as f:
+            data = json.load(f)
+        for kind in ("categories", "subcategories", "bookmarks"):
+            data.setdefault(kind, [])
+        manifest = store.snapshot(data)
+        print(f"{manifest['id']}: {len(manifest['chunks'])} chunks, {manifest['new_chunks']} new "
+              f"({manifest['bytes_written']} bytes)")
+    elif args.command == "list":
+        for s in store.list():
+            print(f"{s['id']}  {datetime.fromtimestamp(s['time']):%Y-%m-%d %H:%M:%S}  "
+                  f"{s['counts']['bookmarks']} bookmarks  {len(s['chunks'])} chunks")
+    else:
+        ids = [args.snapshot_id] if args.snapshot_id else [s["id"] for s in store.list()]
+        failed = False
+        for snapshot_id in ids:
+            report = store.verify(snapshot_id)
+            print(f"{snapshot_id}: {'ok' if report['ok'] else 'FAILED'}")
+            for error in report["errors"]:
+                print(f"  {error}")
+            failed = failed or not report["ok"]
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
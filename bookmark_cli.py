@@ -3,12 +3,29 @@
 Bookmark Manager CLI
 
 This script provides a command-line interface for the Bookmark Manager application.
+
+Run it without arguments for the interactive menu, or with a subcommand to
+perform a single operation and exit, e.g.:
+
+    python bookmark_cli.py list --format ndjson
+    python bookmark_cli.py add "ChatGPT" --url https://chat.openai.com --category 16 --subcategory 31
+    python bookmark_cli.py batch < operations.ndjson
+
+For scripted use, `python -m bookmark_cli ...` starts faster: Python
+compiles a script file on every run but loads a module from __pycache__.
+`bench` measures both.
 """
 
+import argparse
 import os
-import json
 import sys
-from datetime import datetime
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+# Only what the snapshot fast path needs is imported up front; json, the
+# integrity checks and tag parsing load when a command first uses them
+from data_snapshot import read_snapshot_header, read_snapshot_rows, snapshot_path, write_snapshot
 
 class BookmarkType:
     FREE = "FREE"
@@ -27,7 +44,8 @@ class Subcategory:
         self.category_id = category_id
 
 class Bookmark:
-    def __init__(self, id, name, url, description, category_id, subcategory_id, bookmark_type):
+    def __init__(self, id, name, url, description, category_id, subcategory_id, bookmark_type, tags=None,
+                 created_at=None, updated_at=None):
         self.id = id
         self.name = name
         self.url = url
@@ -35,61 +53,149 @@ class Bookmark:
         self.category_id = category_id
         self.subcategory_id = subcategory_id
         self.type = bookmark_type
-        self.created_at = datetime.now().timestamp()
-        self.updated_at = self.created_at
+        self.tags = tags or []
+        # Loaded bookmarks keep their timestamps; new ones start now
+        self.created_at = created_at if created_at is not None else time.time()
+        self.updated_at = updated_at if updated_at is not None else self.created_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "url": self.url,
+            "description": self.description,
+            "category_id": self.category_id,
+            "subcategory_id": self.subcategory_id,
+            "type": self.type,
+            "tags": self.tags,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
 
 class BookmarkManager:
-    def __init__(self):
+    def __init__(self, data_file="bookmark_data.json"):
+        self.data_file = data_file
         self.categories = []
         self.subcategories = []
+        # id -> name lookups, rebuilt lazily after categories change
+        self._category_names = None
+        self._subcategory_names = None
         self.bookmarks = []
         self.next_category_id = 1
         self.next_subcategory_id = 1
         self.next_bookmark_id = 1
+        self.batch_depth = 0
+        self.dirty = False
         self.load_data()
 
+    @property
+    def bookmarks(self):
+        # Bookmarks from a snapshot are only materialized on first use, so
+        # commands that just need categories never pay for them
+        if self._bookmarks is None:
+            try:
+                self._bookmarks = [Bookmark(*row) for row in read_snapshot_rows(self.data_file)]
+            except (OSError, EOFError, ValueError, TypeError):
+                self._bookmarks = []
+                self.load_json()
+        return self._bookmarks
+
+    @bookmarks.setter
+    def bookmarks(self, bookmarks):
+        self._bookmarks = bookmarks
+
     def load_data(self):
         # Create default data if not exists
-        if not os.path.exists("bookmark_data.json"):
+        if not os.path.exists(self.data_file):
             self.create_default_data()
+            return
+
+        self.invalidate_names()
+        header = read_snapshot_header(self.data_file)
+        if header:
+            self.categories = [Category(*c) for c in header["categories"]]
+            self.subcategories = [Subcategory(*s) for s in header["subcategories"]]
+            self.next_category_id, self.next_subcategory_id, self.next_bookmark_id = header["next_ids"]
+            self.bookmarks = None
         else:
-            try:
-                with open("bookmark_data.json", "r") as f:
-                    data = json.load(f)
-                    
-                    self.categories = [Category(c["id"], c["name"]) for c in data.get("categories", [])]
-                    self.subcategories = [Subcategory(s["id"], s["name"], s["category_id"]) 
-                                         for s in data.get("subcategories", [])]
-                    self.bookmarks = [Bookmark(
-                        b["id"], b["name"], b.get("url"), b.get("description"),
-                        b["category_id"], b["subcategory_id"], b["type"]
-                    ) for b in data.get("bookmarks", [])]
-                    
-                    # Set next IDs
-                    if self.categories:
-                        self.next_category_id = max(c.id for c in self.categories) + 1
-                    if self.subcategories:
-                        self.next_subcategory_id = max(s.id for s in self.subcategories) + 1
-                    if self.bookmarks:
-                        self.next_bookmark_id = max(b.id for b in self.bookmarks) + 1
-            except Exception as e:
-                print(f"Error loading data: {e}")
-                self.create_default_data()
+            self.load_json()
+            self.save_snapshot()
+
+    def load_json(self):
+        # Raises DataFileError rather than replace a file that doesn't
+        # parse with the default data (see integrity.py)
+        from integrity import load_library
+
+        data = load_library(self.data_file)
+        
+        self.categories = [Category(c["id"], c["name"]) for c in data["categories"]]
+        self.subcategories = [Subcategory(s["id"], s["name"], s["category_id"]) 
+                             for s in data["subcategories"]]
+        self.bookmarks = [Bookmark(
+            b["id"], b["name"], b.get("url"), b.get("description"),
+            b["category_id"], b["subcategory_id"], b["type"], b.get("tags", []),
+            b.get("created_at"), b.get("updated_at")
+        ) for b in data["bookmarks"]]
+        
+        # Set next IDs
+        if self.categories:
+            self.next_category_id = max(c.id for c in self.categories) + 1
+        if self.subcategories:
+            self.next_subcategory_id = max(s.id for s in self.subcategories) + 1
+        if self.bookmarks:
+            self.next_bookmark_id = max(b.id for b in self.bookmarks) + 1
+
+    @contextmanager
+    def batch(self):
+        # Defer saving until the outermost batch finishes, so many
+        # operations cost a single write of the data file. An error that
+        # escapes the outermost batch rolls all of it back instead.
+        self.batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            if self.batch_depth == 1:
+                self.rollback()
+            raise
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth and self.dirty:
+                self.save_data()
+
+    def rollback(self):
+        # Drops every change made since the data file was last written
+        self.dirty = False
+        self.load_data()
 
     def save_data(self):
+        import json
+
+        if self.batch_depth:
+            self.dirty = True
+            return
+        self.dirty = False
+        
         data = {
             "categories": [{"id": c.id, "name": c.name} for c in self.categories],
             "subcategories": [{"id": s.id, "name": s.name, "category_id": s.category_id} 
                              for s in self.subcategories],
             "bookmarks": [{"id": b.id, "name": b.name, "url": b.url, 
                           "description": b.description, "category_id": b.category_id, 
-                          "subcategory_id": b.subcategory_id, "type": b.type,
+                          "subcategory_id": b.subcategory_id, "type": b.type, "tags": b.tags,
                           "created_at": b.created_at, "updated_at": b.updated_at} 
                          for b in self.bookmarks]
         }
         
-        with open("bookmark_data.json", "w") as f:
+        with open(self.data_file, "w") as f:
             json.dump(data, f, indent=2)
+        self.save_snapshot()
+
+    def save_snapshot(self):
+        try:
+            write_snapshot(self.data_file, self.categories, self.subcategories, self.bookmarks,
+                           (self.next_category_id, self.next_subcategory_id, self.next_bookmark_id))
+        except OSError as e:
+            print(f"Error saving snapshot: {e}")
 
     def create_default_data(self):
         # Create default categories
@@ -129,6 +235,7 @@ class BookmarkManager:
         category = Category(self.next_category_id, name)
         self.categories.append(category)
         self.next_category_id += 1
+        self.invalidate_names()
         self.save_data()
         return category
         
@@ -136,6 +243,7 @@ class BookmarkManager:
         for category in self.categories:
             if category.id == category_id:
                 category.name = name
+                self.invalidate_names()
                 self.save_data()
                 return True
         return False
@@ -147,12 +255,14 @@ class BookmarkManager:
         
         # Delete the category
         self.categories = [c for c in self.categories if c.id != category_id]
+        self.invalidate_names()
         self.save_data()
         
     def add_subcategory(self, name, category_id):
         subcategory = Subcategory(self.next_subcategory_id, name, category_id)
         self.subcategories.append(subcategory)
         self.next_subcategory_id += 1
+        self.invalidate_names()
         self.save_data()
         return subcategory
         
@@ -160,6 +270,7 @@ class BookmarkManager:
         for subcategory in self.subcategories:
             if subcategory.id == subcategory_id:
                 subcategory.name = name
+                self.invalidate_names()
                 self.save_data()
                 return True
         return False
@@ -170,11 +281,12 @@ class BookmarkManager:
         
         # Delete the subcategory
         self.subcategories = [s for s in self.subcategories if s.id != subcategory_id]
+        self.invalidate_names()
         self.save_data()
         
-    def add_bookmark(self, name, url, description, category_id, subcategory_id, bookmark_type):
+    def add_bookmark(self, name, url, description, category_id, subcategory_id, bookmark_type, tags=None):
         bookmark = Bookmark(self.next_bookmark_id, name, url, description, 
-                           category_id, subcategory_id, bookmark_type)
+                           category_id, subcategory_id, bookmark_type, tags)
         self.bookmarks.append(bookmark)
         self.next_bookmark_id += 1
         self.save_data()
@@ -189,7 +301,7 @@ class BookmarkManager:
                 bookmark.category_id = category_id
                 bookmark.subcategory_id = subcategory_id
                 bookmark.type = bookmark_type
-                bookmark.updated_at = datetime.now().timestamp()
+                bookmark.updated_at = time.time()
                 self.save_data()
                 return True
         return False
@@ -198,17 +310,25 @@ class BookmarkManager:
         self.bookmarks = [b for b in self.bookmarks if b.id != bookmark_id]
         self.save_data()
         
+    def invalidate_names(self):
+        self._category_names = None
+        self._subcategory_names = None
+
+    def category_names(self):
+        if self._category_names is None:
+            self._category_names = {c.id: c.name for c in self.categories}
+        return self._category_names
+
+    def subcategory_names(self):
+        if self._subcategory_names is None:
+            self._subcategory_names = {s.id: s.name for s in self.subcategories}
+        return self._subcategory_names
+
     def get_category_name(self, category_id):
-        for category in self.categories:
-            if category.id == category_id:
-                return category.name
-        return ""
+        return self.category_names().get(category_id, "")
         
     def get_subcategory_name(self, subcategory_id):
-        for subcategory in self.subcategories:
-            if subcategory.id == subcategory_id:
-                return subcategory.name
-        return ""
+        return self.subcategory_names().get(subcategory_id, "")
         
     def get_subcategories_for_category(self, category_id):
         return [s for s in self.subcategories if s.category_id == category_id]
@@ -216,18 +336,25 @@ class BookmarkManager:
     def search_bookmarks(self, query):
         if not query:
             return self.bookmarks
-            
+        return list(self.iter_search_bookmarks(query))
+
+    def iter_search_bookmarks(self, query):
+        # Yields matches as they are found, so a pager can show the first
+        # page without scanning the whole library
+        if not query:
+            yield from self.bookmarks
+            return
+
         query = query.lower()
-        results = []
-        
+        category_names = self.category_names()
+        subcategory_names = self.subcategory_names()
+
         for bookmark in self.bookmarks:
             if (query in bookmark.name.lower() or 
                 (bookmark.description and query in bookmark.description.lower()) or
-                query in self.get_category_name(bookmark.category_id).lower() or
-                query in self.get_subcategory_name(bookmark.subcategory_id).lower()):
-                results.append(bookmark)
-                
-        return results
+                query in category_names.get(bookmark.category_id, "").lower() or
+                query in subcategory_names.get(bookmark.subcategory_id, "").lower()):
+                yield bookmark
         
     def filter_bookmarks_by_type(self, bookmark_type):
         if not bookmark_type:
@@ -244,9 +371,69 @@ class BookmarkManager:
             return self.bookmarks
         return [b for b in self.bookmarks if b.subcategory_id == subcategory_id]
 
+class BookmarkPager:
+    # Pulls rows from a lazy iterator only as far as the pages that have been
+    # shown, and keeps them so paging back, jumping and searching never re-run
+    # the query or re-sort the results
+    def __init__(self, rows, page_size=20):
+        self.total = len(rows) if hasattr(rows, "__len__") else None
+        self.source = iter(rows)
+        self.rows = []
+        self.page_size = page_size
+        self.exhausted = False
+
+    def fill(self, count):
+        # Returns True when at least `count` rows are available
+        if len(self.rows) < count and not self.exhausted:
+            self.rows.extend(islice(self.source, count - len(self.rows)))
+            if len(self.rows) < count:
+                self.exhausted = True
+                self.total = len(self.rows)
+        return len(self.rows) >= count
+
+    def __iter__(self):
+        index = 0
+        while self.fill(index + 1):
+            yield self.rows[index]
+            index += 1
+
+    def page(self, number):
+        start = number * self.page_size
+        self.fill(start + self.page_size)
+        return self.rows[start:start + self.page_size]
+
+    def has_page(self, number):
+        return number >= 0 and self.fill(number * self.page_size + 1)
+
+    def page_count(self):
+        # None until the end of the results has been reached
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.page_size))
+
+    def find(self, term, start=0):
+        # Index of the next row matching term at or after start, wrapping
+        # around to the beginning once the results are exhausted
+        term = term.lower()
+
+        def matches(bookmark):
+            return (term in bookmark.name.lower() or
+                    (bookmark.description and term in bookmark.description.lower()) or
+                    (bookmark.url and term in bookmark.url.lower()))
+
+        index = start
+        while self.fill(index + 1):
+            if matches(self.rows[index]):
+                return index
+            index += 1
+        for index in range(min(start, len(self.rows))):
+            if matches(self.rows[index]):
+                return index
+        return None
+
 class BookmarkCLI:
-    def __init__(self):
-        self.manager = BookmarkManager()
+    def __init__(self, data_file="bookmark_data.json"):
+        self.manager = BookmarkManager(data_file)
         self.running = True
         self.current_menu = "main"
         
@@ -322,41 +509,94 @@ class BookmarkCLI:
             
         self.display_bookmarks(bookmarks)
         
+    def page_size(self):
+        import shutil
+
+        # Leave room for the header, footer and prompt
+        return max(5, shutil.get_terminal_size((80, 24)).lines - 14)
+
     def display_bookmarks(self, bookmarks):
-        self.print_header("BOOKMARK LIST")
+        # bookmarks may be any iterable, including a lazy generator; rows are
+        # only pulled from it as pages are shown
+        pager = BookmarkPager(bookmarks, self.page_size())
         
-        if not bookmarks:
+        if not pager.has_page(0):
+            self.print_header("BOOKMARK LIST")
             print("No bookmarks found.")
             self.wait_for_key()
             return
+
+        page = 0
+        highlight = None
+        while True:
+            self.print_header("BOOKMARK LIST")
+            rows = pager.page(page)
+            category_names = self.manager.category_names()
             
-        # Print table header
-        print(f"{'ID':<4} {'Name':<30} {'Category':<15} {'Type':<10}")
-        print("-" * 60)
-        
-        for bookmark in bookmarks:
-            category_name = self.manager.get_category_name(bookmark.category_id)
-            print(f"{bookmark.id:<4} {bookmark.name[:28]:<30} {category_name[:13]:<15} {bookmark.type:<10}")
+            # Print table header
+            print(f"{'ID':<4} {'Name':<30} {'Category':<15} {'Type':<10}")
+            print("-" * 60)
             
-        print("\nOptions:")
-        print("1. View Bookmark Details")
-        print("2. Edit Bookmark")
-        print("3. Delete Bookmark")
-        print("4. Back to Main Menu")
-        
-        choice = input("\nEnter choice (1-4): ")
-        
-        if choice == "1":
-            self.view_bookmark_details(bookmarks)
-        elif choice == "2":
-            self.edit_bookmark(bookmarks)
-        elif choice == "3":
-            self.delete_bookmark(bookmarks)
-        elif choice == "4":
-            return
-        else:
-            print("Invalid choice.")
-            self.wait_for_key()
+            first = page * pager.page_size
+            for index, bookmark in enumerate(rows, first):
+                category_name = category_names.get(bookmark.category_id, "")
+                marker = ">" if index == highlight else " "
+                print(f"{bookmark.id:<4}{marker}{bookmark.name[:28]:<30} {category_name[:13]:<15} {bookmark.type:<10}")
+
+            pages = pager.page_count()
+            total = pager.total if pager.total is not None else "?"
+            print(f"\nRows {first + 1}-{first + len(rows)} of {total}, "
+                  f"page {page + 1} of {pages or '?'}")
+                
+            print("\nOptions:")
+            print("n. Next Page          p. Previous Page")
+            print("g. Go to Page         /. Find in Results")
+            print("1. View Bookmark Details")
+            print("2. Edit Bookmark")
+            print("3. Delete Bookmark")
+            print("4. Back to Main Menu")
+            
+            choice = input("\nEnter choice: ").strip()
+            highlight = None
+            
+            if choice in ("", "n"):
+                if pager.has_page(page + 1):
+                    page += 1
+            elif choice == "p":
+                page = max(0, page - 1)
+            elif choice.startswith("g"):
+                number = choice[1:].strip() or input("Go to page: ")
+                try:
+                    number = int(number) - 1
+                except ValueError:
+                    number = -1
+                if pager.has_page(number):
+                    page = number
+                else:
+                    print("Page not found.")
+                    self.wait_for_key()
+            elif choice.startswith("/"):
+                term = choice[1:].strip() or input("Find: ").strip()
+                index = pager.find(term, first + len(rows)) if term else None
+                if index is None:
+                    print("No matches found.")
+                    self.wait_for_key()
+                else:
+                    page = index // pager.page_size
+                    highlight = index
+            elif choice == "1":
+                self.view_bookmark_details(pager)
+            elif choice == "2":
+                self.edit_bookmark(pager)
+                return
+            elif choice == "3":
+                self.delete_bookmark(pager)
+                return
+            elif choice == "4":
+                return
+            else:
+                print("Invalid choice.")
+                self.wait_for_key()
             
     def view_bookmark_details(self, bookmarks):
         bookmark_id = input("Enter the ID of the bookmark to view: ")
@@ -392,7 +632,7 @@ class BookmarkCLI:
         self.print_header("SEARCH BOOKMARKS")
         
         query = input("Enter search term: ")
-        results = self.manager.search_bookmarks(query)
+        results = self.manager.iter_search_bookmarks(query)
         
         self.display_bookmarks(results)
         
@@ -918,6 +1158,502 @@ class BookmarkCLI:
         
         print("\nThank you for using Bookmark Manager!")
 
+class CommandError(Exception):
+    pass
+
+class BookmarkCommands:
+    SORT_CHOICES = ("name_asc", "name_desc", "category", "type")
+    TYPE_CHOICES = (BookmarkType.FREE, BookmarkType.PAID, BookmarkType.FREEMIUM)
+    # Batch operation fields and the JSON types they accept
+    FIELD_TYPES = {"id": (int, str), "name": str, "url": str, "description": str,
+                   "category": (int, str), "subcategory": (int, str), "type": str}
+
+    def __init__(self, manager, output=None):
+        self.manager = manager
+        self.output = output or sys.stdout
+
+    # Lookups
+
+    def find_category(self, value):
+        for category in self.manager.categories:
+            if str(category.id) == str(value) or category.name.lower() == str(value).lower():
+                return category
+        raise CommandError(f"Category not found: {value}")
+
+    def find_subcategory(self, value, category_id):
+        for subcategory in self.manager.get_subcategories_for_category(category_id):
+            if str(subcategory.id) == str(value) or subcategory.name.lower() == str(value).lower():
+                return subcategory
+        raise CommandError(f"Subcategory not found in this category: {value}")
+
+    def bookmark_details(self, bookmark):
+        result = bookmark.to_dict()
+        result["category_name"] = self.manager.get_category_name(bookmark.category_id)
+        result["subcategory_name"] = self.manager.get_subcategory_name(bookmark.subcategory_id)
+        return result
+
+    def sort_bookmarks(self, bookmarks, sort_by):
+        if sort_by == "name_asc":
+            return sorted(bookmarks, key=lambda b: b.name.lower())
+        elif sort_by == "name_desc":
+            return sorted(bookmarks, key=lambda b: b.name.lower(), reverse=True)
+        elif sort_by == "category":
+            names = {c.id: c.name.lower() for c in self.manager.categories}
+            return sorted(bookmarks, key=lambda b: (names.get(b.category_id, ""), b.name.lower()))
+        elif sort_by == "type":
+            return sorted(bookmarks, key=lambda b: (b.type, b.name.lower()))
+        return list(bookmarks)
+
+    # Output
+
+    def write_json(self, items, output_format):
+        # One indented array, or one line per item for ndjson
+        import json
+
+        if output_format == "json":
+            json.dump(list(items), self.output, indent=2)
+            self.output.write("\n")
+        else:
+            for item in items:
+                self.output.write(json.dumps(item) + "\n")
+
+    def write_bookmarks(self, bookmarks, output_format):
+        if output_format in ("json", "ndjson"):
+            self.write_json((self.bookmark_details(b) for b in bookmarks), output_format)
+        else:
+            names = self.manager.category_names()
+            self.output.write(f"{'ID':<4} {'Name':<30} {'Category':<15} {'Type':<10}\n")
+            self.output.write("-" * 60 + "\n")
+            for bookmark in bookmarks:
+                category_name = names.get(bookmark.category_id, "")
+                self.output.write(f"{bookmark.id:<4} {bookmark.name[:28]:<30} {category_name[:13]:<15} {bookmark.type:<10}\n")
+
+    def write_categories(self, output_format):
+        subcategories = {}
+        for subcategory in self.manager.subcategories:
+            subcategories.setdefault(subcategory.category_id, []).append(subcategory)
+
+        result = [
+            {"id": c.id, "name": c.name,
+             "subcategories": [{"id": s.id, "name": s.name} for s in subcategories.get(c.id, [])]}
+            for c in self.manager.categories
+        ]
+
+        if output_format in ("json", "ndjson"):
+            self.write_json(result, output_format)
+        else:
+            for category in result:
+                self.output.write(f"{category['id']:<4} {category['name']}\n")
+                for subcategory in category["subcategories"]:
+                    self.output.write(f"     {subcategory['id']:<4} {subcategory['name']}\n")
+
+    def write_result(self, result, output_format):
+        if output_format in ("json", "ndjson"):
+            self.write_json([result], "ndjson")
+        elif "error" in result:
+            self.output.write(f"Error: {result['error']}\n")
+        else:
+            self.output.write(result.get("message", "OK") + "\n")
+
+    # Operations
+
+    def add(self, name, url=None, description=None, category=None, subcategory=None, type=BookmarkType.FREE):
+        if not name or not name.strip():
+            raise CommandError("Name cannot be empty.")
+        if type not in self.TYPE_CHOICES:
+            raise CommandError(f"Invalid type: {type}")
+
+        category = self.find_category(category)
+        subcategory = self.find_subcategory(subcategory, category.id)
+        bookmark = self.manager.add_bookmark(
+            name.strip(),
+            url if url and url.strip() else None,
+            description if description and description.strip() else None,
+            category.id,
+            subcategory.id,
+            type
+        )
+        return {"id": bookmark.id, "message": f"Bookmark '{bookmark.name}' added with ID {bookmark.id}."}
+
+    def update(self, id, **changes):
+        bookmark = next((b for b in self.manager.bookmarks if b.id == int(id)), None)
+        if not bookmark:
+            raise CommandError(f"Bookmark not found: {id}")
+
+        category_id = bookmark.category_id
+        subcategory_id = bookmark.subcategory_id
+        if changes.get("category") is not None:
+            category_id = self.find_category(changes["category"]).id
+        if changes.get("subcategory") is not None or category_id != bookmark.category_id:
+            subcategory_id = self.find_subcategory(changes.get("subcategory", subcategory_id), category_id).id
+
+        bookmark_type = changes.get("type") or bookmark.type
+        if bookmark_type not in self.TYPE_CHOICES:
+            raise CommandError(f"Invalid type: {bookmark_type}")
+
+        self.manager.update_bookmark(
+            bookmark.id,
+            changes.get("name") or bookmark.name,
+            changes.get("url", bookmark.url),
+            changes.get("description", bookmark.description),
+            category_id,
+            subcategory_id,
+            bookmark_type
+        )
+        return {"id": bookmark.id, "message": f"Bookmark {bookmark.id} updated."}
+
+    def delete(self, id):
+        if not any(b.id == int(id) for b in self.manager.bookmarks):
+            raise CommandError(f"Bookmark not found: {id}")
+        self.manager.delete_bookmark(int(id))
+        return {"id": int(id), "message": f"Bookmark {id} deleted."}
+
+    def add_category(self, name):
+        if not name or not name.strip():
+            raise CommandError("Name cannot be empty.")
+        category = self.manager.add_category(name.strip())
+        return {"id": category.id, "message": f"Category '{category.name}' added with ID {category.id}."}
+
+    def add_subcategory(self, name, category):
+        if not name or not name.strip():
+            raise CommandError("Name cannot be empty.")
+        category = self.find_category(category)
+        subcategory = self.manager.add_subcategory(name.strip(), category.id)
+        return {"id": subcategory.id, "message": f"Subcategory '{subcategory.name}' added with ID {subcategory.id}."}
+
+    def import_data(self, data, replace=False):
+        # Categories and subcategories are matched by name, so importing an
+        # export from another library merges into this one. Tags are checked
+        # up front so a bad one fails the import before anything changes
+        from tag_index import normalize_tags
+
+        tags = [normalize_tags(b.get("tags")) for b in data.get("bookmarks", [])]
+        with self.manager.batch():
+            if replace:
+                self.manager.categories = []
+                self.manager.subcategories = []
+                self.manager.bookmarks = []
+                self.manager.dirty = True
+
+            category_ids = {}
+            for c in data.get("categories", []):
+                existing = next((x for x in self.manager.categories if x.name.lower() == c["name"].lower()), None)
+                category_ids[c["id"]] = (existing or self.manager.add_category(c["name"])).id
+
+            subcategory_ids = {}
+            for s in data.get("subcategories", []):
+                category_id = category_ids.get(s["category_id"])
+                if category_id is None:
+                    continue
+                existing = next((x for x in self.manager.get_subcategories_for_category(category_id)
+                                 if x.name.lower() == s["name"].lower()), None)
+                subcategory_ids[s["id"]] = (existing or self.manager.add_subcategory(s["name"], category_id)).id
+
+            imported = 0
+            for b, bookmark_tags in zip(data.get("bookmarks", []), tags):
+                category_id = category_ids.get(b["category_id"])
+                subcategory_id = subcategory_ids.get(b["subcategory_id"])
+                if category_id is None or subcategory_id is None:
+                    continue
+                self.manager.add_bookmark(b["name"], b.get("url"), b.get("description"),
+                                          category_id, subcategory_id, b.get("type", BookmarkType.FREE),
+                                          bookmark_tags)
+                imported += 1
+
+        return {"imported": imported, "message": f"Imported {imported} bookmarks."}
+
+    def export_data(self):
+        return {
+            "categories": [{"id": c.id, "name": c.name} for c in self.manager.categories],
+            "subcategories": [{"id": s.id, "name": s.name, "category_id": s.category_id}
+                              for s in self.manager.subcategories],
+            "bookmarks": [b.to_dict() for b in self.manager.bookmarks]
+        }
+
+    def apply(self, operation):
+        # Applies one batch operation, e.g. {"op": "add", "name": ..., ...}
+        if not isinstance(operation, dict):
+            raise CommandError("Expected an operation object")
+        operation = dict(operation)
+        op = operation.pop("op", None)
+        for field, value in operation.items():
+            expected = self.FIELD_TYPES.get(field)
+            if value is not None and expected and (isinstance(value, bool) or not isinstance(value, expected)):
+                raise CommandError(f"Invalid value for '{field}': {value!r}")
+        handlers = {
+            "add": self.add,
+            "update": self.update,
+            "delete": self.delete,
+            "add_category": self.add_category,
+            "add_subcategory": self.add_subcategory
+        }
+        if op not in handlers:
+            raise CommandError(f"Unknown operation: {op}")
+        try:
+            return handlers[op](**operation)
+        except TypeError as e:
+            raise CommandError(f"Invalid arguments for '{op}': {e}")
+
+def generate_library(path, size, seed=0):
+    # Writes a synthetic data file with `size` bookmarks for benchmarking.
+    # Imported here so one-shot commands don't pay for it at startup.
+    import json
+    import random
+
+    rng = random.Random(seed)
+    categories = [{"id": i, "name": f"Category {i}"} for i in range(1, 21)]
+    subcategories = [{"id": i, "name": f"Subcategory {i}", "category_id": (i - 1) // 5 + 1}
+                     for i in range(1, 101)]
+    words = ["ai", "photo", "video", "writer", "notes", "chat", "code", "design", "mail", "sheet", "meet", "plan"]
+    bookmarks = []
+    for i in range(1, size + 1):
+        subcategory = rng.choice(subcategories)
+        name = " ".join(rng.choice(words) for _ in range(2)).title() + f" {i}"
+        bookmarks.append({
+            "id": i, "name": name, "url": f"https://example{i}.com",
+            "description": " ".join(rng.choice(words) for _ in range(6)),
+            "category_id": subcategory["category_id"], "subcategory_id": subcategory["id"],
+            "type": rng.choice(BookmarkCommands.TYPE_CHOICES),
+            "created_at": 0, "updated_at": 0
+        })
+    with open(path, "w") as f:
+        json.dump({"categories": categories, "subcategories": subcategories, "bookmarks": bookmarks}, f)
+
+def run_bench(args, output):
+    import subprocess
+    import tempfile
+
+    def timed(label, func, repeat=1):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        elapsed = (time.perf_counter() - started) / repeat
+        output.write(f"{label:<28} {elapsed * 1000:>10.2f} ms\n")
+        return result
+
+    # With PYTHONDONTWRITEBYTECODE set every run would recompile each module
+    # (about 15 ms here), which an installed CLI never pays
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                      env.get("PYTHONPATH")]))
+
+    def startup(label, command):
+        # Best of several runs of a fresh interpreter, as a user would see it
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True, env=env)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        output.write(f"{label:<28} {best * 1000:>10.2f} ms\n")
+
+    path = args.data
+    temp_dir = None
+    if args.size:
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "bookmark_data.json")
+        timed(f"generate {args.size} bookmarks", lambda: generate_library(path, args.size))
+
+    try:
+        script = os.path.abspath(__file__)
+        startup("python startup", [sys.executable, "-c", "pass"])
+        startup("import bookmark_cli", [sys.executable, "-c", f"import sys; sys.path.insert(0, {os.path.dirname(script)!r}); import bookmark_cli"])
+        snapshot = snapshot_path(path)
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+        timed("cold start (json)", lambda: BookmarkManager(path).bookmarks)
+        startup("cold start: categories", [sys.executable, script, "--data", path, "categories"])
+        # A script's own code is compiled on every run; as a module it is
+        # read from __pycache__
+        startup("cold start: -m categories", [sys.executable, "-m", "bookmark_cli", "--data", path, "categories"])
+        startup("cold start: list", [sys.executable, script, "--data", path, "list", "--format", "ndjson"])
+
+        manager = timed("load (snapshot)", lambda: BookmarkManager(path))
+        timed("materialize bookmarks", lambda: manager.bookmarks)
+        commands = BookmarkCommands(manager, output)
+        output.write(f"{'bookmarks':<28} {len(manager.bookmarks):>10}\n")
+        for sort_by in BookmarkCommands.SORT_CHOICES:
+            timed(f"list --sort {sort_by}", lambda: commands.sort_bookmarks(manager.bookmarks, sort_by), args.repeat)
+        timed("search 'photo'", lambda: manager.search_bookmarks("photo"), args.repeat)
+        timed("filter by type", lambda: manager.filter_bookmarks_by_type(BookmarkType.PAID), args.repeat)
+        timed("save", manager.save_data)
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bookmark Manager CLI. Run without a command for the interactive menu.")
+    parser.add_argument("--data", default="bookmark_data.json", help="bookmark data file")
+    subparsers = parser.add_subparsers(dest="command")
+
+    def add_format(subparser, default="table"):
+        subparser.add_argument("--format", choices=("table", "json", "ndjson"), default=default)
+
+    add_parser = subparsers.add_parser("add", help="add a bookmark")
+    add_parser.add_argument("name")
+    add_parser.add_argument("--url")
+    add_parser.add_argument("--description")
+    add_parser.add_argument("--category", required=True, help="category id or name")
+    add_parser.add_argument("--subcategory", required=True, help="subcategory id or name")
+    add_parser.add_argument("--type", choices=BookmarkCommands.TYPE_CHOICES, default=BookmarkType.FREE)
+    add_format(add_parser)
+
+    categories_parser = subparsers.add_parser("categories", help="list categories and subcategories")
+    add_format(categories_parser)
+
+    list_parser = subparsers.add_parser("list", help="list bookmarks")
+    list_parser.add_argument("--sort", choices=BookmarkCommands.SORT_CHOICES, default="name_asc")
+    list_parser.add_argument("--category", help="category id or name")
+    list_parser.add_argument("--type", choices=BookmarkCommands.TYPE_CHOICES)
+    add_format(list_parser)
+
+    search_parser = subparsers.add_parser("search", help="search bookmarks")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--sort", choices=BookmarkCommands.SORT_CHOICES, default="name_asc")
+    add_format(search_parser)
+
+    delete_parser = subparsers.add_parser("delete", help="delete bookmarks by id")
+    delete_parser.add_argument("ids", nargs="+", type=int)
+    add_format(delete_parser)
+
+    import_parser = subparsers.add_parser("import", help="import a JSON export ('-' for stdin)")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--replace", action="store_true", help="replace all current data")
+    add_format(import_parser)
+
+    export_parser = subparsers.add_parser("export", help="export all data as JSON")
+    export_parser.add_argument("file", nargs="?", default="-")
+    export_parser.add_argument("--format", choices=("json", "ndjson"), default="json")
+
+    batch_parser = subparsers.add_parser("batch", help="apply NDJSON operations from stdin with a single save")
+    batch_parser.add_argument("--continue-on-error", action="store_true",
+                              help="save the operations that succeed; otherwise a failure rolls back the batch")
+    add_format(batch_parser, default="ndjson")
+
+    bench_parser = subparsers.add_parser("bench", help="time common operations")
+    bench_parser.add_argument("--size", type=int, help="benchmark a synthetic library of this many bookmarks")
+    bench_parser.add_argument("--repeat", type=int, default=5)
+
+    return parser
+
+def run_command(args, stdin=None, output=None):
+    stdin = stdin or sys.stdin
+    output = output or sys.stdout
+
+    if args.command == "bench":
+        run_bench(args, output)
+        return 0
+
+    commands = BookmarkCommands(BookmarkManager(args.data), output)
+    manager = commands.manager
+
+    if args.command == "add":
+        result = commands.add(args.name, args.url, args.description, args.category, args.subcategory, args.type)
+        commands.write_result(result, args.format)
+    elif args.command == "categories":
+        # Only needs the snapshot header; bookmarks are never loaded
+        commands.write_categories(args.format)
+    elif args.command in ("list", "search"):
+        if args.command == "search":
+            bookmarks = manager.search_bookmarks(args.query)
+        else:
+            bookmarks = manager.bookmarks
+            if args.category:
+                category_id = commands.find_category(args.category).id
+                bookmarks = [b for b in bookmarks if b.category_id == category_id]
+            if args.type:
+                bookmarks = [b for b in bookmarks if b.type == args.type]
+        commands.write_bookmarks(commands.sort_bookmarks(bookmarks, args.sort), args.format)
+    elif args.command == "delete":
+        # Every id is checked first, so a typo deletes nothing
+        known = {b.id for b in manager.bookmarks}
+        missing = [bookmark_id for bookmark_id in args.ids if bookmark_id not in known]
+        if missing:
+            raise CommandError(f"Bookmark not found: {', '.join(map(str, missing))}")
+        with manager.batch():
+            for bookmark_id in args.ids:
+                commands.write_result(commands.delete(bookmark_id), args.format)
+    elif args.command == "import":
+        import json
+
+        if args.file == "-":
+            data = json.load(stdin)
+        else:
+            with open(args.file, "r") as f:
+                data = json.load(f)
+        commands.write_result(commands.import_data(data, args.replace), args.format)
+    elif args.command == "export":
+        import json
+
+        data = commands.export_data()
+        target = output if args.file == "-" else open(args.file, "w")
+        try:
+            if args.format == "ndjson":
+                kinds = {"categories": "category", "subcategories": "subcategory", "bookmarks": "bookmark"}
+                for key, kind in kinds.items():
+                    for item in data[key]:
+                        target.write(json.dumps(dict(item, kind=kind)) + "\n")
+            else:
+                json.dump(data, target, indent=2)
+                target.write("\n")
+        finally:
+            if target is not output:
+                target.close()
+    elif args.command == "batch":
+        import json
+
+        applied = failed = 0
+        with manager.batch():
+            for line_number, line in enumerate(stdin, 1):
+                if not line.strip():
+                    continue
+                try:
+                    result = commands.apply(json.loads(line))
+                except (CommandError, ValueError) as e:
+                    failed += 1
+                    commands.write_result({"line": line_number, "error": str(e)}, args.format)
+                    if not args.continue_on_error:
+                        # All or nothing: the operations before this one are
+                        # undone and the data file is left as it was
+                        manager.rollback()
+                        commands.write_result({"rolled_back": applied,
+                                               "message": f"Rolled back {applied} earlier operations."},
+                                              args.format)
+                        break
+                    continue
+                applied += 1
+                result["line"] = line_number
+                commands.write_result(result, args.format)
+        return 1 if failed else 0
+
+    return 0
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not args.command:
+        from integrity import DataFileError
+
+        try:
+            cli = BookmarkCLI(args.data)
+        except DataFileError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        cli.run()
+        return 0
+
+    try:
+        return run_command(args)
+    except BrokenPipeError:
+        # Output was piped into a command that stopped reading, e.g. head
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (CommandError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
 if __name__ == "__main__":
-    cli = BookmarkCLI()
-    cli.run()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
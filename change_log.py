@@ -0,0 +1,66 @@
+"""
+Bookmark Change Log
+
+Gives the data set a version number that goes up with every change, and
+remembers which records the recent versions touched. Clients that cached
+the data at some version can then ask for just what changed since, and
+only need a full download when they are too far behind.
+
+The epoch identifies one in-memory history; it changes whenever the log
+starts over (for example when the server restarts), so versions from an
+older history are never compared against this one. Worker processes forked
+from one loaded copy share the epoch and, through the shared journal (see
+shared_state.py), the version numbers.
+"""
+
+import threading
+import uuid
+from collections import deque
+
+
+class ChangeLog:
+    def __init__(self, max_entries=5000):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.reset()
+
+    def reset(self, epoch=None, version=0):
+        with self.lock:
+            self.epoch = epoch or uuid.uuid4().hex[:12]
+            self.version = version
+            # (version, kind, id), oldest first
+            self.entries = deque(maxlen=self.max_entries)
+
+    def record(self, kind, item_id, version=None):
+        # `version` is given when replaying a change another process made
+        with self.lock:
+            self.version = version if version is not None else self.version + 1
+            self.entries.append((self.version, kind, item_id))
+            return self.version
+
+    def entries_since(self, version):
+        with self.lock:
+            entries = []
+            for entry in reversed(self.entries):
+                if entry[0] <= version:
+                    break
+                entries.append(entry)
+            entries.reverse()
+            return entries
+
+    def changes_since(self, epoch, version):
+        # Returns (current version, {kind: set of ids}), or None when the
+        # caller has to start over with a full copy
+        with self.lock:
+            if epoch != self.epoch or version > self.version:
+                return None
+            oldest = self.entries[0][0] if self.entries else self.version + 1
+            if version < oldest - 1:
+                return None
+
+            changed = {}
+            for entry_version, kind, item_id in reversed(self.entries):
+                if entry_version <= version:
+                    break
+                changed.setdefault(kind, set()).add(item_id)
+            return self.version, changed
@@ -0,0 +1,106 @@
+"""
+HTTP Response Compression
+
+Compresses text responses (JSON, HTML, CSS, JavaScript) above a size
+threshold with whichever encoding the client accepts, preferring brotli
+when the optional `brotli` package is installed and falling back to gzip.
+Static files are compressed once per version and kept in memory.
+"""
+
+import gzip
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/javascript", "text/javascript",
+    "text/html", "text/css", "text/plain", "image/svg+xml"
+}
+
+
+def accepted_encodings(accept_encoding):
+    # Encodings the client accepts, ignoring any with q=0
+    encodings = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, max_cached_bytes=8 * 1024 * 1024):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.max_cached_bytes = max_cached_bytes
+        # (path, etag, encoding) -> compressed bytes for static files
+        self.static_cache = {}
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        app.after_request(self.compress_response)
+
+    def choose_encoding(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, response):
+        from flask import request
+
+        if (response.status_code < 200 or response.status_code in (204, 206, 304) or
+                "Content-Encoding" in response.headers or
+                response.mimetype not in COMPRESSIBLE_TYPES or
+                request.method == "HEAD"):
+            return response
+
+        encoding = self.choose_encoding(request.headers.get("Accept-Encoding"))
+        response.vary.add("Accept-Encoding")
+        if encoding is None:
+            return response
+
+        is_static = request.endpoint == "static"
+        if response.direct_passthrough and not is_static:
+            # Streamed responses are left alone
+            return response
+
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        if is_static and etag:
+            key = (request.path, etag, encoding)
+            compressed = self.static_cache.get(key)
+            if compressed is None:
+                compressed = self.compress(data, encoding)
+                with self.lock:
+                    if self.cached_bytes + len(compressed) <= self.max_cached_bytes:
+                        self.static_cache[key] = compressed
+                        self.cached_bytes += len(compressed)
+        else:
+            compressed = self.compress(data, encoding)
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # Same content, different bytes: a weak ETag still lets
+            # If-None-Match revalidate (werkzeug compares weakly)
+            response.set_etag(etag, weak=True)
+        return response
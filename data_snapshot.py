@@ -0,0 +1,84 @@
+"""
+Bookmark Data Snapshot
+
+A compiled binary copy of bookmark_data.json that starts up much faster
+than parsing the JSON. The snapshot holds two marshal records: a small
+header (categories, subcategories, next ids and the size/mtime of the JSON
+file it was built from) followed by the bookmark columns. The header is
+length-prefixed so callers can stop after it when they do not need any
+bookmarks yet.
+
+The JSON file stays the source of truth; a snapshot whose recorded
+size/mtime no longer matches it is ignored and rebuilt.
+"""
+
+import marshal
+import os
+import struct
+
+SNAPSHOT_VERSION = 3
+LENGTH_PREFIX = struct.Struct("<I")
+BOOKMARK_FIELDS = ("id", "name", "url", "description", "category_id", "subcategory_id", "type", "tags",
+                   "created_at", "updated_at")
+
+
+def snapshot_path(data_file):
+    return data_file + ".snapshot"
+
+
+def source_signature(data_file):
+    stat = os.stat(data_file)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def write_snapshot(data_file, categories, subcategories, bookmarks, next_ids):
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "source": source_signature(data_file),
+        "categories": [(c.id, c.name) for c in categories],
+        "subcategories": [(s.id, s.name, s.category_id) for s in subcategories],
+        "next_ids": tuple(next_ids),
+        "bookmark_count": len(bookmarks)
+    }
+    columns = tuple(
+        tuple(getattr(bookmark, field) for bookmark in bookmarks)
+        for field in BOOKMARK_FIELDS
+    )
+
+    header_bytes = marshal.dumps(header)
+    path = snapshot_path(data_file)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(LENGTH_PREFIX.pack(len(header_bytes)))
+        f.write(header_bytes)
+        f.write(marshal.dumps(columns))
+    os.replace(temp_path, path)
+
+
+def read_snapshot_header(data_file):
+    # Returns the header, or None when the snapshot is missing or stale
+    path = snapshot_path(data_file)
+    try:
+        with open(path, "rb") as f:
+            length, = LENGTH_PREFIX.unpack(f.read(LENGTH_PREFIX.size))
+            header = marshal.loads(f.read(length))
+        if (not isinstance(header, dict) or
+                header.get("version") != SNAPSHOT_VERSION or
+                tuple(header.get("source", ())) != source_signature(data_file)):
+            return None
+        return header
+    except (OSError, EOFError, ValueError, TypeError, struct.error):
+        return None
+
+
+def read_snapshot_rows(data_file):
+    # Yields one tuple per bookmark, in BOOKMARK_FIELDS order
+    # marshal.loads on one buffer is far faster than marshal.load on a file
+    with open(snapshot_path(data_file), "rb") as f:
+        try:
+            length, = LENGTH_PREFIX.unpack(f.read(LENGTH_PREFIX.size))
+        except struct.error:
+            raise ValueError("Truncated snapshot")
+        f.seek(length, os.SEEK_CUR)
+        columns = marshal.loads(f.read())
+    return zip(*columns)
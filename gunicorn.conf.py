@@ -0,0 +1,28 @@
+"""
+Gunicorn Configuration
+
+Threaded workers with the app preloaded in the master, so the data file is
+read and indexed once before workers fork. Run with:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+preload_app = True
+worker_class = "gthread"
+# Each worker holds its own copy of the data; writes reach the others
+# through the shared journal (see shared_state.py)
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, os.cpu_count() or 1)))
+threads = int(os.environ.get("THREADS", 8))
+timeout = 30
+graceful_timeout = 10
+keepalive = 5
+
+
+def worker_exit(server, worker):
+    # Don't lose a save that is still waiting on the background writer
+    from app import flush_pending_writes
+
+    flush_pending_writes()
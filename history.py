@@ -0,0 +1,287 @@
+"""
+Bookmark History
+
+Keeps enough history to undo recent operations and to rebuild the library
+as it was at any time since the oldest checkpoint. Lives in a directory
+next to the data file (<data>.history/):
+
+- log-<n>.jsonl: the log, in segments. One line per operation (usually
+  one request), listing every record it changed with its value before and
+  after: {"op": id, "t": time, "changes": [[kind, id, before, after], ...]}.
+  A null value means the record didn't exist. Undo and redo operations
+  also name the operation they reverse ("undo_of"/"redo_of").
+- checkpoint-<n>.json: the full state at the start of segment n, so
+  rebuilding a past state replays at most a segment or two of log.
+- index.json: the segments and checkpoints.
+
+Writes only ever append a line to the current segment. Once it has grown
+past the checkpoint size, the next append starts a new segment, and a
+background thread builds that segment's checkpoint from the previous
+checkpoint and the log in between - never from the live library, and
+never while a write waits. The checkpoint size is `checkpoint_bytes` or
+the size of the last checkpoint, whichever is larger, so a big library
+isn't re-serialized after every few hundred kilobytes of edits.
+
+Only `keep_checkpoints` are kept; dropping the oldest deletes the segments
+before the next one, so the history stays bounded. How far back undo and
+`as_of` reach is therefore about keep_checkpoints x checkpoint size of log
+(8 x 256 KB by default, about 2 MB or a few thousand edits); raise either
+for a longer history (see BOOKMARKS_HISTORY_CHECKPOINTS in wsgi.py).
+
+Writers must be serialized by the caller (the bookmark manager's write
+batches); a file lock keeps readers from seeing a half-pruned history.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+
+from background_tasks import DeferredWriter
+
+KINDS = ("category", "subcategory", "bookmark")
+
+
+class HistoryError(Exception):
+    pass
+
+
+class History:
+    def __init__(self, path, checkpoint_bytes=256 * 1024, keep_checkpoints=8):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        self.checkpoint_bytes = checkpoint_bytes
+        self.keep_checkpoints = max(2, keep_checkpoints)
+        self.lock = threading.Lock()
+        self.checkpointer = DeferredWriter(self.checkpoint, delay=0)
+        os.makedirs(path, exist_ok=True)
+
+    def _file_lock(self, exclusive):
+        fd = os.open(os.path.join(self.path, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return fd
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, f"log-{seq:08d}.jsonl")
+
+    def _checkpoint_path(self, seq):
+        return os.path.join(self.path, f"checkpoint-{seq:08d}.json")
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        if "segments" not in index:
+            index = {"segments": [], "checkpoints": [], "checkpoint_size": 0}
+        return index
+
+    def _write_json(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _write_checkpoint(self, path, when, state):
+        # Returns the checkpoint's size
+        self._write_json(path, {"time": when, "state": {kind: list(records.values())
+                                                        for kind, records in state.items()}})
+        return os.path.getsize(path)
+
+    def start(self, state):
+        # Called with the loaded state; takes the first checkpoint when
+        # there is no history yet
+        with self.lock:
+            fd = self._file_lock(exclusive=True)
+            try:
+                index = self._read_index()
+                if not index["checkpoints"]:
+                    self._restart(index, state)
+            finally:
+                os.close(fd)
+
+    def _restart(self, index, state):
+        # Hold the file lock. Starts a segment whose checkpoint is `state`.
+        seq = index["segments"][-1] + 1 if index["segments"] else 0
+        now = time.time()
+        size = self._write_checkpoint(self._checkpoint_path(seq), now, state)
+        index["segments"].append(seq)
+        index["checkpoints"].append({"seq": seq, "time": now})
+        index["checkpoint_size"] = size
+        self._prune(index)
+        self._write_json(self.index_path, index)
+
+    def append(self, changes, state=None, **extra):
+        # Records one operation. `changes` is [(kind, id, before, after)].
+        # A "full" operation (the caller lost track of what changed) also
+        # passes the full `state` after it, which becomes a checkpoint.
+        # Returns the operation id.
+        op = {"op": uuid.uuid4().hex[:12], "t": time.time()}
+        op.update(extra)
+        op["changes"] = [list(change) for change in changes]
+        due = False
+        with self.lock:
+            fd = self._file_lock(exclusive=True)
+            try:
+                index = self._read_index()
+                seq = index["segments"][-1]
+                with open(self._segment_path(seq), "a") as f:
+                    f.write(json.dumps(op) + "\n")
+                    size = f.tell()
+                if extra.get("full"):
+                    self._restart(index, state)
+                elif size > max(self.checkpoint_bytes, index["checkpoint_size"]):
+                    # New writes go to a new segment; its checkpoint is
+                    # built in the background
+                    index["segments"].append(seq + 1)
+                    self._write_json(self.index_path, index)
+                    due = True
+            finally:
+                os.close(fd)
+        if due:
+            self.checkpointer.request()
+        return op["op"]
+
+    def checkpoint(self):
+        # Builds the checkpoint for the current segment from the last one
+        # and the closed segments after it. Runs on the checkpointer's
+        # thread; the lock is only held to read and update the index.
+        fd = self._file_lock(exclusive=False)
+        try:
+            index = self._read_index()
+        finally:
+            os.close(fd)
+        if not index["checkpoints"]:
+            return
+        base = index["checkpoints"][-1]
+        target = index["segments"][-1]
+        if base["seq"] >= target:
+            return
+
+        # The segments read here are closed, and the base checkpoint
+        # outlives the next prune, so this needs no lock
+        try:
+            with open(self._checkpoint_path(base["seq"]), "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading history checkpoint: {e}")
+            return
+        state = {kind: {record["id"]: record for record in saved["state"].get(kind, [])} for kind in KINDS}
+        when = saved["time"]
+        for seq in index["segments"]:
+            if base["seq"] <= seq < target:
+                for op in self._read_segment(seq):
+                    self._replay(state, op)
+                    when = max(when, op["t"])
+        building_path = f"{self._checkpoint_path(target)}.{os.getpid()}.building"
+        size = self._write_checkpoint(building_path, when, state)
+
+        fd = self._file_lock(exclusive=True)
+        try:
+            index = self._read_index()
+            # Another worker or a full checkpoint may have got there first
+            if target in index["segments"] and all(c["seq"] < target for c in index["checkpoints"]):
+                os.replace(building_path, self._checkpoint_path(target))
+                index["checkpoints"].append({"seq": target, "time": when})
+                index["checkpoint_size"] = size
+                self._prune(index)
+                self._write_json(self.index_path, index)
+            else:
+                os.remove(building_path)
+        finally:
+            os.close(fd)
+
+    def _prune(self, index):
+        # Hold the file lock. Drops the oldest checkpoints and the segments
+        # only they needed.
+        if len(index["checkpoints"]) <= self.keep_checkpoints:
+            return
+        dropped = index["checkpoints"][:-self.keep_checkpoints]
+        index["checkpoints"] = index["checkpoints"][-self.keep_checkpoints:]
+        first = index["checkpoints"][0]["seq"]
+        paths = [self._checkpoint_path(c["seq"]) for c in dropped]
+        paths += [self._segment_path(seq) for seq in index["segments"] if seq < first]
+        index["segments"] = [seq for seq in index["segments"] if seq >= first]
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _read_segment(self, seq):
+        ops = []
+        try:
+            with open(self._segment_path(seq), "r") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        ops.append(json.loads(line))
+        except OSError:
+            pass
+        return ops
+
+    def _replay(self, state, op):
+        for kind, item_id, before, after in op["changes"]:
+            if after is None:
+                state[kind].pop(item_id, None)
+            else:
+                state[kind][item_id] = after
+
+    def oldest(self):
+        # Earliest time a state can be rebuilt for, or None
+        checkpoints = self._read_index()["checkpoints"]
+        return checkpoints[0]["time"] if checkpoints else None
+
+    def state_at(self, when):
+        # {kind: {id: record}} as it was at time `when`
+        fd = self._file_lock(exclusive=False)
+        try:
+            index = self._read_index()
+            checkpoints = [c for c in index["checkpoints"] if c["time"] <= when]
+            if not checkpoints:
+                raise HistoryError("History does not reach back that far")
+            checkpoint = checkpoints[-1]
+            with open(self._checkpoint_path(checkpoint["seq"]), "r") as f:
+                saved = json.load(f)["state"]
+            ops = [op for seq in index["segments"] if seq >= checkpoint["seq"]
+                   for op in self._read_segment(seq)]
+        finally:
+            os.close(fd)
+
+        state = {kind: {record["id"]: record for record in saved.get(kind, [])} for kind in KINDS}
+        for op in ops:
+            if op["t"] > when:
+                break
+            self._replay(state, op)
+        return state
+
+    def undo_stacks(self):
+        # ([undoable ops, most recent last], [redoable ops, same]) from the
+        # operations still in the log
+        undo, redo = [], []
+        fd = self._file_lock(exclusive=False)
+        try:
+            index = self._read_index()
+            ops = [op for seq in index["segments"] for op in self._read_segment(seq)]
+        finally:
+            os.close(fd)
+        for op in ops:
+            if op.get("full"):
+                undo, redo = [], []
+            elif "undo_of" in op:
+                if undo and undo[-1]["op"] == op["undo_of"]:
+                    redo.append(undo.pop())
+            elif "redo_of" in op:
+                if redo and redo[-1]["op"] == op["redo_of"]:
+                    redo.pop()
+                    undo.append(op)
+            else:
+                undo.append(op)
+                redo = []
+        return undo, redo
+
+    def close(self):
+        # Finishes a checkpoint that is due
+        self.checkpointer.close()
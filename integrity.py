@@ -0,0 +1,284 @@
+"""
+Data Integrity
+
+Checks a bookmark library (the data file, or an export) for records the
+rest of the code assumes can't exist:
+
+- id collisions: two categories, subcategories or bookmarks with one id
+- orphans: a subcategory whose category is gone, a bookmark whose
+  category or subcategory is gone, or whose subcategory belongs to a
+  different category than the bookmark says
+- bad values: a bookmark type other than FREE, PAID or FREEMIUM, and
+  records with missing or mistyped fields
+
+The check is a single pass over the records, parents before children, that
+builds an id index per kind as it goes, so every lookup is a dict hit and
+the cost grows linearly with the library. Problems are yielded as they are
+found. In repair mode each one is also fixed on the spot:
+
+- a duplicate category or subcategory is dropped (references resolve to
+  the first one); a duplicate bookmark gets a new id
+- a subcategory whose category is gone moves to the category its first
+  bookmark names; a bookmark whose category disagrees with its
+  subcategory takes the subcategory's
+- anything left without a parent moves to a "Recovered" category or
+  subcategory
+- an unknown type becomes FREE; a record too malformed to keep is dropped
+
+A data file that isn't valid JSON is never replaced: read_library raises
+DataFileError, and the apps stop instead of starting over with the default
+library. A file loaded with problems is repaired in memory, and a copy of
+the original is kept next to it before anything is saved over it.
+
+Command line:
+
+    python integrity.py check [data file]
+    python integrity.py repair [data file]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+
+BOOKMARK_TYPES = ("FREE", "PAID", "FREEMIUM")
+RECOVERED = "Recovered"
+
+
+class DataFileError(ValueError):
+    pass
+
+
+def read_library(path):
+    # The parsed data file, with every list present. Raises DataFileError
+    # rather than let a caller fall back to defaults and save over the file.
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise DataFileError(f"{path} is not valid JSON ({e}); fix it or restore a backup "
+                            f"(see integrity.py and backup.py) - it has not been changed")
+    if not isinstance(data, dict):
+        raise DataFileError(f"{path} does not hold a bookmark library; it has not been changed")
+    for kind in ("categories", "subcategories", "bookmarks"):
+        if not isinstance(data.get(kind, []), list):
+            raise DataFileError(f"{path}: \"{kind}\" is not a list; it has not been changed")
+        data.setdefault(kind, [])
+    return data
+
+
+def _malformed(record, fields):
+    # A description of what's wrong with the record's fields, or None
+    if not isinstance(record, dict):
+        return "is not an object"
+    for name, types in fields:
+        if not isinstance(record.get(name), types) or isinstance(record.get(name), bool):
+            return f"has no valid \"{name}\""
+    return None
+
+
+CATEGORY_FIELDS = (("id", int), ("name", str))
+SUBCATEGORY_FIELDS = CATEGORY_FIELDS + (("category_id", int),)
+BOOKMARK_FIELDS = SUBCATEGORY_FIELDS + (("subcategory_id", int), ("type", str))
+
+
+def _issue(kind, record, problem, fix):
+    item_id = record.get("id") if isinstance(record, dict) else None
+    return {"kind": kind, "id": item_id, "problem": problem, "fix": fix}
+
+
+def check_library(data, repair=False):
+    # Yields {"kind", "id", "problem", "fix"} for each problem found. With
+    # `repair`, also fixes them in `data`, which is only complete once the
+    # generator is exhausted (see repair_library).
+    categories = {}
+    subcategories = {}
+    # Subcategory id -> its category id, as repaired
+    homes = {}
+    orphans = {}
+    recovered = {}
+
+    def recovered_category():
+        if "category" not in recovered:
+            category = {"id": max(categories, default=0) + 1, "name": RECOVERED}
+            categories[category["id"]] = category
+            recovered["category"] = category
+        return recovered["category"]
+
+    def recovered_subcategory(category_id):
+        if category_id not in recovered:
+            subcategory = {"id": max(subcategories, default=0) + 1, "name": RECOVERED,
+                           "category_id": category_id}
+            subcategories[subcategory["id"]] = subcategory
+            recovered[category_id] = subcategory
+        return recovered[category_id]
+
+    for c in data["categories"]:
+        problem = _malformed(c, CATEGORY_FIELDS)
+        if problem:
+            yield _issue("category", c, f"Category {problem}", "dropped")
+        elif c["id"] in categories:
+            yield _issue("category", c, f"Category id {c['id']} is used more than once",
+                         "dropped the duplicate")
+        else:
+            categories[c["id"]] = c
+
+    for s in data["subcategories"]:
+        problem = _malformed(s, SUBCATEGORY_FIELDS)
+        if problem:
+            yield _issue("subcategory", s, f"Subcategory {problem}", "dropped")
+            continue
+        if s["id"] in subcategories:
+            yield _issue("subcategory", s, f"Subcategory id {s['id']} is used more than once",
+                         "dropped the duplicate")
+            continue
+        if s["category_id"] not in categories:
+            # Rehomed by its first bookmark below, or at the end
+            orphans[s["id"]] = s
+        subcategories[s["id"]] = s
+        homes[s["id"]] = s["category_id"]
+
+    bookmarks = {}
+    collided = []
+    for b in data["bookmarks"]:
+        problem = _malformed(b, BOOKMARK_FIELDS)
+        if problem:
+            yield _issue("bookmark", b, f"Bookmark {problem}", "dropped")
+            continue
+
+        orphan = orphans.pop(b["subcategory_id"], None)
+        if orphan is not None:
+            # A subcategory whose category is gone goes where its bookmarks are
+            if b["category_id"] in categories:
+                home, fix = b["category_id"], f"moved to category {b['category_id']}, with its bookmarks"
+            else:
+                home, fix = recovered_category()["id"], f"moved to the \"{RECOVERED}\" category"
+            yield _issue("subcategory", orphan, f"Category {orphan['category_id']} does not exist", fix)
+            homes[orphan["id"]] = home
+            if repair:
+                orphan["category_id"] = home
+
+        home = homes.get(b["subcategory_id"])
+        if home is not None:
+            if home != b["category_id"]:
+                if b["category_id"] in categories:
+                    problem = f"Subcategory {b['subcategory_id']} belongs to category {home}, not {b['category_id']}"
+                else:
+                    problem = f"Category {b['category_id']} does not exist"
+                yield _issue("bookmark", b, problem, f"moved to category {home}, with its subcategory")
+                if repair:
+                    b["category_id"] = home
+        elif b["category_id"] in categories:
+            yield _issue("bookmark", b, f"Subcategory {b['subcategory_id']} does not exist",
+                         f"moved to a \"{RECOVERED}\" subcategory of its category")
+            if repair:
+                b["subcategory_id"] = recovered_subcategory(b["category_id"])["id"]
+        else:
+            yield _issue("bookmark", b,
+                         f"Category {b['category_id']} and subcategory {b['subcategory_id']} do not exist",
+                         f"moved to the \"{RECOVERED}\" category")
+            if repair:
+                b["category_id"] = recovered_category()["id"]
+                b["subcategory_id"] = recovered_subcategory(b["category_id"])["id"]
+
+        if b["type"] not in BOOKMARK_TYPES:
+            fixed = b["type"].upper() if b["type"].upper() in BOOKMARK_TYPES else "FREE"
+            yield _issue("bookmark", b, f"Unknown type \"{b['type']}\"", f"set to {fixed}")
+            if repair:
+                b["type"] = fixed
+        if repair and not isinstance(b.get("tags", []), list):
+            b["tags"] = []
+
+        if b["id"] in bookmarks:
+            collided.append(b)
+        else:
+            bookmarks[b["id"]] = b
+
+    for orphan in orphans.values():
+        yield _issue("subcategory", orphan, f"Category {orphan['category_id']} does not exist",
+                     f"moved to the \"{RECOVERED}\" category")
+        if repair:
+            orphan["category_id"] = recovered_category()["id"]
+
+    # New ids for colliding bookmarks once the highest id is known
+    next_id = max(bookmarks, default=0) + 1
+    for b in collided:
+        yield _issue("bookmark", b, f"Bookmark id {b['id']} is used more than once",
+                     f"given id {next_id}")
+        if repair:
+            b["id"] = next_id
+            bookmarks[next_id] = b
+        next_id += 1
+
+    if repair:
+        data["categories"] = list(categories.values())
+        data["subcategories"] = list(subcategories.values())
+        data["bookmarks"] = list(bookmarks.values())
+
+
+def repair_library(data):
+    # Fixes `data` in place; returns the problems that were fixed
+    return list(check_library(data, repair=True))
+
+
+def keep_original(path):
+    # Copies a data file that needed repairs next to it, once per version
+    # of the file, before a save can replace it. Returns the copy's path.
+    stat = os.stat(path)
+    copy_path = f"{path}.{stat.st_mtime_ns}.orig"
+    if not os.path.exists(copy_path):
+        shutil.copy2(path, copy_path)
+    return copy_path
+
+
+def load_library(path):
+    # Reads and repairs the data file for loading. The file itself is left
+    # as it is; its original is kept when it had problems.
+    data = read_library(path)
+    issues = repair_library(data)
+    if issues:
+        # stderr, so the CLI's output stays clean for pipes
+        print(f"{path}: repaired {len(issues)} integrity problem(s) on load; "
+              f"original kept as {keep_original(path)}", file=sys.stderr)
+        for issue in issues[:10]:
+            print(f"  {issue['kind']} {issue['id']}: {issue['problem']} ({issue['fix']})", file=sys.stderr)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a bookmark library for integrity problems")
+    parser.add_argument("command", choices=("check", "repair"))
+    parser.add_argument("data_file", nargs="?", default="bookmark_data.json")
+    args = parser.parse_args()
+
+    try:
+        data = read_library(args.data_file)
+    except (DataFileError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    repair = args.command == "repair"
+    issues = 0
+    for issue in check_library(data, repair=repair):
+        issues += 1
+        print(f"{issue['kind']} {issue['id']}: {issue['problem']}"
+              + (f" - {issue['fix']}" if repair else ""))
+    if not issues:
+        print("No problems found")
+        return 0
+    if not repair:
+        print(f"{issues} problem(s) found; run `python integrity.py repair {args.data_file}` to fix them")
+        return 1
+
+    copy_path = keep_original(args.data_file)
+    tmp_path = f"{args.data_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, args.data_file)
+    print(f"Repaired {issues} problem(s); original kept as {copy_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
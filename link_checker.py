@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Bookmark Link Checker
+
+Probes bookmark URLs concurrently with asyncio and records the HTTP status,
+latency and last-checked time for each bookmark. Requests go out as HEAD
+(falling back to GET when HEAD is not supported), with a global concurrency
+limit, a per-host concurrency limit and request interval, keep-alive
+connection reuse, timeouts and retries with exponential backoff. A timeout
+covers a request's time on the network only, not time spent queued for a
+slot, so a busy host doesn't make its links look dead.
+
+It only needs the standard library, so it can run from the command line:
+
+    python link_checker.py --concurrency 20 --timeout 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HEAD_UNSUPPORTED_STATUSES = {405, 501}
+
+
+class LinkCheckError(Exception):
+    pass
+
+
+class _HostState:
+    def __init__(self, concurrency):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.next_slot = 0.0
+
+    async def wait_turn(self, interval):
+        # Space out requests to the same host by at least `interval` seconds
+        now = asyncio.get_running_loop().time()
+        delay = self.next_slot - now
+        self.next_slot = max(now, self.next_slot) + interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class LinkChecker:
+    def __init__(self, concurrency=20, per_host_concurrency=2, per_host_interval=0.2,
+                 timeout=10.0, retries=2, backoff=0.5, max_redirects=5):
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_interval = per_host_interval
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.user_agent = "LSSR-Bookmarks-LinkChecker/1.0"
+
+    def run(self, targets):
+        # targets is an iterable of (bookmark_id, url)
+        return asyncio.run(self.check_all(list(targets)))
+
+    async def check_all(self, targets):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._hosts = {}
+        self._idle = {}
+        self._ssl_context = ssl.create_default_context()
+
+        try:
+            results = await asyncio.gather(
+                *(self._check_one(bookmark_id, url) for bookmark_id, url in targets)
+            )
+        finally:
+            self._close_idle()
+
+        return dict(results)
+
+    async def _check_one(self, bookmark_id, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return bookmark_id, self._result(url, None, "Unsupported URL", 0.0)
+
+        status = None
+        error = None
+        latency = 0.0
+
+        # No slot is held between attempts, so a backoff never blocks
+        # other hosts
+        for attempt in range(self.retries + 1):
+            try:
+                status, latency = await self._probe(url)
+                error = None
+            except asyncio.TimeoutError:
+                status, error = None, "Timed out"
+            except (OSError, LinkCheckError, ValueError) as e:
+                status, error = None, str(e) or e.__class__.__name__
+
+            if error is None and status not in RETRY_STATUSES:
+                break
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        return bookmark_id, self._result(url, status, error, latency)
+
+    def _result(self, url, status, error, latency):
+        return {
+            "url": url,
+            "status": status,
+            "ok": status is not None and 200 <= status < 400,
+            "error": error,
+            "latency_ms": round(latency * 1000, 1),
+            "checked_at": datetime.now().timestamp()
+        }
+
+    async def _probe(self, url):
+        # Returns (status, seconds spent on the network) after following
+        # redirects
+        elapsed = 0.0
+        for _ in range(self.max_redirects + 1):
+            status, headers, seconds = await self._request("HEAD", url)
+            elapsed += seconds
+            if status in HEAD_UNSUPPORTED_STATUSES:
+                status, headers, seconds = await self._request("GET", url)
+                elapsed += seconds
+
+            location = headers.get("location")
+            if status in REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                continue
+            return status, elapsed
+
+        raise LinkCheckError("Too many redirects")
+
+    def _host(self, key):
+        host = self._hosts.get(key)
+        if host is None:
+            host = self._hosts[key] = _HostState(self.per_host_concurrency)
+        return host
+
+    async def _request(self, method, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise LinkCheckError(f"Unsupported URL: {url}")
+
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # Only HEAD responses have no body, so only those connections are
+        # handed back to the pool; GET fallbacks close after the headers
+        keep_alive = method == "HEAD"
+        request = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc.rsplit('@', 1)[-1]}\r\n"
+            f"User-Agent: {self.user_agent}\r\n"
+            f"Accept: */*\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        ).encode("latin-1")
+
+        # The host's slot and interval come first, then a global slot; the
+        # timeout only starts once both are granted, so time spent queued
+        # behind other requests never counts against a link
+        host = self._host(key)
+        async with host.semaphore:
+            await host.wait_turn(self.per_host_interval)
+            async with self._semaphore:
+                started = time.perf_counter()
+                reader, writer, status, headers = await asyncio.wait_for(
+                    self._exchange(key, request), self.timeout
+                )
+                elapsed = time.perf_counter() - started
+
+        if keep_alive and headers.get("connection", "").lower() != "close":
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+
+        return status, headers, elapsed
+
+    async def _exchange(self, key, request):
+        while True:
+            reader, writer, reused = await self._connect(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers = await self._read_head(reader)
+            except (ConnectionError, LinkCheckError):
+                writer.close()
+                if reused:
+                    # The server dropped an idle connection; retry on a fresh one
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            return reader, writer, status, headers
+
+    async def _connect(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        scheme, hostname, port = key
+        if scheme == "https":
+            reader, writer = await asyncio.open_connection(
+                hostname, port, ssl=self._ssl_context, server_hostname=hostname
+            )
+        else:
+            reader, writer = await asyncio.open_connection(hostname, port)
+        return reader, writer, False
+
+    async def _read_head(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+
+        parts = status_line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise LinkCheckError(f"Invalid HTTP response: {status_line[:50]!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        return status, headers
+
+    def _close_idle(self):
+        for connections in self._idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self._idle = {}
+
+
+class LinkStatusStore:
+    def __init__(self, path="link_status.json"):
+        self.path = path
+        self.results = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.results = {int(k): v for k, v in json.load(f).items()}
+        except (ValueError, OSError) as e:
+            print(f"Error loading link status: {e}")
+
+    def save(self):
+        with self.lock:
+            data = {str(k): v for k, v in self.results.items()}
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def update(self, results):
+        with self.lock:
+            self.results.update(results)
+
+    def get(self, bookmark_id):
+        return self.results.get(bookmark_id)
+
+    def prune(self, bookmark_ids):
+        # Drop results for bookmarks that no longer exist
+        with self.lock:
+            self.results = {k: v for k, v in self.results.items() if k in bookmark_ids}
+
+
+class LinkCheckJob:
+    # Runs a link check on a background thread so requests never wait on it
+    def __init__(self, store, checker=None):
+        self.store = store
+        self.checker = checker or LinkChecker()
+        self.thread = None
+        self.started_at = None
+        self.finished_at = None
+        self.checked = 0
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, targets):
+        if self.running:
+            return False
+
+        targets = [(bookmark_id, url) for bookmark_id, url in targets if url]
+        self.started_at = datetime.now().timestamp()
+        self.finished_at = None
+        self.thread = threading.Thread(target=self._run, args=(targets,), daemon=True)
+        self.thread.start()
+        return True
+
+    def _run(self, targets):
+        try:
+            results = self.checker.run(targets)
+            self.store.update(results)
+            self.store.save()
+            self.checked = len(results)
+        except Exception as e:
+            print(f"Error checking links: {e}")
+        finally:
+            self.finished_at = datetime.now().timestamp()
+
+    def to_dict(self):
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "checked": self.checked
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check bookmark URLs for dead links.")
+    parser.add_argument("--data", default="bookmark_data.json", help="bookmark data file")
+    parser.add_argument("--output", default="link_status.json", help="where to store link status")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--per-host", type=int, default=2, help="concurrent requests per host")
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between requests to one host")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--broken-only", action="store_true", help="only print failing links")
+    args = parser.parse_args(argv)
+
+    with open(args.data, "r") as f:
+        bookmarks = json.load(f).get("bookmarks", [])
+    names = {b["id"]: b["name"] for b in bookmarks}
+    targets = [(b["id"], b["url"]) for b in bookmarks if b.get("url")]
+
+    checker = LinkChecker(
+        concurrency=args.concurrency,
+        per_host_concurrency=args.per_host,
+        per_host_interval=args.interval,
+        timeout=args.timeout,
+        retries=args.retries
+    )
+    results = checker.run(targets)
+
+    store = LinkStatusStore(args.output)
+    store.update(results)
+    store.prune(set(names))
+    store.save()
+
+    broken = 0
+    for bookmark_id, result in sorted(results.items()):
+        if not result["ok"]:
+            broken += 1
+        elif args.broken_only:
+            continue
+        status = result["status"] or result["error"]
+        print(f"{'OK' if result['ok'] else 'FAIL':<5} {str(status):<12} {result['latency_ms']:>8.1f}ms  "
+              f"{names[bookmark_id][:30]:<30} {result['url']}")
+
+    print(f"\nChecked {len(results)} links, {broken} broken.")
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""
+Load Test
+
+Replays the API traffic the web front end (static/js/main.js) generates -
+paged and filtered listings, searches, typeahead suggestions, category and
+subcategory lists, bookmark details, link clicks, creates, edits and
+category renames - from concurrent keep-alive clients, and reports
+throughput, error rates and p50/p95/p99 latency per operation.
+
+By default it starts a server of its own on a temporary copy of
+bookmark_data.json, so writes never touch the real data:
+
+    python load_test.py                             # gunicorn
+    python load_test.py --server dev --clients 8
+    python load_test.py --compare --duration 10     # dev server vs gunicorn
+    python load_test.py --url http://localhost:5000 --write-ratio 0
+
+Against --url, the bookmarks the run creates are deleted at the end; its
+clicks stay counted, so pass --read-mix visit=0 to leave visit counts alone.
+The operation mix and the skew towards popular bookmarks and search terms
+are configurable; see --help.
+"""
+
+import argparse
+import bisect
+import gzip
+import http.client
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Clicks are POSTs but take no write lock, so they count as browsing
+READ_MIX = {"list": 35, "search": 25, "suggest": 20, "categories": 8, "subcategories": 7, "detail": 5,
+            "visit": 10}
+WRITE_MIX = {"create": 50, "update": 35, "rename_category": 15}
+
+SORTS = ["name_asc", "name_desc", "category", "type", "popular", "recent"]
+TYPES = ["FREE", "PAID", "FREEMIUM"]
+PAGE_SIZE = 60
+
+DEV_SERVER = [sys.executable, "-c",
+              "import app; app.app.run(host='127.0.0.1', port={port}, debug=True, use_reloader=False)"]
+GUNICORN = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+            "--bind", "127.0.0.1:{port}", "--log-level", "warning", "wsgi:app"]
+
+
+def parse_mix(text, defaults):
+    # "list=40,search=20" overrides some weights; 0 drops an operation
+    mix = dict(defaults)
+    for part in filter(None, (text or "").split(",")):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in defaults:
+            raise SystemExit(f"Unknown operation '{name}'; choose from {', '.join(defaults)}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+class SkewedChoice:
+    # Picks items with Zipf-like popularity: the item at rank r is chosen
+    # in proportion to 1 / r ** skew (0 means uniform)
+    def __init__(self, items, skew):
+        self.items = list(items)
+        self.cumulative = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, len(self.items) + 1)))
+
+    def __call__(self, rng):
+        return self.items[bisect.bisect_left(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+class Workload:
+    def __init__(self, catalogue, read_mix, write_mix, write_ratio, skew, seed):
+        self.rng = random.Random(seed)
+        bookmarks = catalogue["bookmarks"]
+        self.rng.shuffle(bookmarks)
+        self.categories = catalogue["categories"]
+        self.subcategories = catalogue["subcategories"]
+        self.bookmark = SkewedChoice(bookmarks, skew)
+        self.category = SkewedChoice(self.categories, skew)
+
+        # Search terms as people type them: prefixes and words of names
+        terms = set()
+        for bookmark in bookmarks:
+            name = bookmark["name"].lower()
+            terms.update(name[:n] for n in (2, 3, 5) if len(name) >= n)
+            terms.update(word for word in name.split() if len(word) > 2)
+        self.term = SkewedChoice(sorted(terms), skew)
+
+        self.read_mix = read_mix
+        self.write_mix = write_mix
+        self.write_ratio = write_ratio if write_mix else 0
+
+    def client_rng(self, index):
+        return random.Random(self.rng.random() + index)
+
+    def pick(self, rng, mix):
+        names = list(mix)
+        return rng.choices(names, weights=[mix[name] for name in names])[0]
+
+    def next_request(self, rng, created):
+        # Returns (operation, method, path, body)
+        if rng.random() < self.write_ratio:
+            operation = self.pick(rng, self.write_mix)
+            if operation == "update" and not created:
+                operation = "create"
+            return (operation,) + self.write_request(operation, rng, created)
+        operation = self.pick(rng, self.read_mix)
+        return (operation,) + self.read_request(operation, rng)
+
+    def read_request(self, operation, rng):
+        if operation in ("list", "search"):
+            path = f"/api/bookmarks?sort={rng.choice(SORTS)}&offset={PAGE_SIZE * rng.choice([0, 0, 0, 1, 2])}&limit={PAGE_SIZE}"
+            if operation == "search":
+                path += f"&search={quote(self.term(rng))}"
+            elif rng.random() < 0.5:
+                path += f"&category={self.category(rng)['id']}"
+            if rng.random() < 0.2:
+                path += f"&type={rng.choice(TYPES)}"
+            return "GET", path, None
+        if operation == "suggest":
+            return "GET", f"/api/suggest?q={quote(self.term(rng))}&limit=10", None
+        if operation == "categories":
+            return "GET", "/api/categories", None
+        if operation == "subcategories":
+            return "GET", f"/api/subcategories?category_id={self.category(rng)['id']}", None
+        if operation == "visit":
+            return "POST", f"/api/bookmarks/{self.bookmark(rng)['id']}/visit", None
+        return "GET", f"/api/bookmarks/{self.bookmark(rng)['id']}", None
+
+    def bookmark_body(self, rng, name):
+        subcategory = rng.choice(self.subcategories)
+        return {
+            "name": name,
+            "url": f"https://{name.lower().replace(' ', '-')}.example.com",
+            "description": "Created by the load test",
+            "category_id": subcategory["category_id"],
+            "subcategory_id": subcategory["id"],
+            "type": rng.choice(TYPES)
+        }
+
+    def write_request(self, operation, rng, created):
+        if operation == "create":
+            return "POST", "/api/bookmarks", self.bookmark_body(rng, f"Load test {rng.getrandbits(48):x}")
+        if operation == "update":
+            bookmark_id = rng.choice(created)
+            return "PUT", f"/api/bookmarks/{bookmark_id}", self.bookmark_body(rng, f"Load test {bookmark_id} edited")
+        # Renaming a category to its own name takes the full write path
+        # (reindex, save) without changing the data
+        category = self.category(rng)
+        return "PUT", f"/api/categories/{category['id']}", {"name": category["name"]}
+
+
+class Client:
+    def __init__(self, url, token=None):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.headers = {"Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        if token:
+            self.headers["X-API-Token"] = token
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        # Returns (status, body bytes); status 0 means the request failed
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            self.connection.request(method, self.prefix + path,
+                                    body=json.dumps(body) if body is not None else None,
+                                    headers=self.headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            if response.getheader("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, b""
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def load_catalogue(url, token):
+    client = Client(url, token)
+    try:
+        catalogue = {}
+        for name, path in (("bookmarks", "/api/bookmarks?limit=100000"),
+                           ("categories", "/api/categories"),
+                           ("subcategories", "/api/subcategories")):
+            status, body = client.request("GET", path)
+            if status != 200:
+                raise SystemExit(f"Could not load {path} (status {status})")
+            catalogue[name] = json.loads(body)
+    finally:
+        client.close()
+    if not catalogue["bookmarks"] or not catalogue["subcategories"]:
+        raise SystemExit("The server has no bookmarks or subcategories to exercise")
+    return catalogue
+
+
+def run_client(url, token, workload, rng, deadline, remaining, samples, created):
+    client = Client(url, token)
+    own = []
+    while time.perf_counter() < deadline:
+        if remaining is not None and next(remaining) <= 0:
+            break
+        operation, method, path, body = workload.next_request(rng, own)
+        start = time.perf_counter()
+        status, data = client.request(method, path, body)
+        samples.append((operation, time.perf_counter() - start, status))
+        if operation == "create" and status == 201:
+            own.append(json.loads(data)["id"])
+    client.close()
+    created.extend(own)
+
+
+def run_load(url, workload, clients, duration, requests=None, token=None):
+    samples = []
+    created = []
+    # Counts down the requests left when the run is capped by --requests
+    remaining = itertools.count(requests, -1) if requests else None
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=run_client,
+                                args=(url, token, workload, workload.client_rng(i), deadline, remaining,
+                                      samples, created))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start, created
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        latencies = sorted(row[1] for row in rows)
+        errors = sum(1 for row in rows if row[2] == 0 or row[2] >= 400)
+        return {
+            "count": len(rows),
+            "error_rate": errors / len(rows) if rows else 0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000
+        }
+
+    by_operation = {}
+    for row in samples:
+        by_operation.setdefault(row[0], []).append(row)
+    statuses = {}
+    for row in samples:
+        statuses[row[2]] = statuses.get(row[2], 0) + 1
+
+    return {
+        "seconds": elapsed,
+        "throughput": len(samples) / elapsed if elapsed else 0,
+        "all": stats(samples),
+        "operations": {name: stats(rows) for name, rows in sorted(by_operation.items())},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+
+def print_summary(label, summary):
+    print(f"\n{label}: {summary['throughput']:.1f} req/s over {summary['seconds']:.1f}s")
+    print(f"  {'operation':<16}{'count':>8}{'errors':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    rows = list(summary["operations"].items()) + [("all", summary["all"])]
+    for name, stats in rows:
+        print(f"  {name:<16}{stats['count']:>8}{stats['error_rate']:>8.1%}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    print("  status codes: " + ", ".join(f"{status}: {count}" for status, count in summary["statuses"].items()))
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        client = Client(f"http://127.0.0.1:{port}")
+        status, _ = client.request("GET", "/api/categories")
+        client.close()
+        if status == 200:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+class LocalServer:
+    # Runs the API from this checkout on a throwaway copy of the data
+    def __init__(self, command, port, workers=None, rate_limits=False):
+        self.command = [part.format(port=port) for part in command]
+        self.port = port
+        self.workers = workers
+        self.rate_limits = rate_limits
+        self.directory = None
+        self.process = None
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix="bookmarks-load-")
+        if os.path.exists(os.path.join(ROOT, "bookmark_data.json")):
+            shutil.copy(os.path.join(ROOT, "bookmark_data.json"), self.directory)
+
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        # One client machine would soon run out of its rate limit budget
+        env["BOOKMARKS_RATE_LIMITS"] = "1" if self.rate_limits else "0"
+        if self.workers:
+            env["WEB_CONCURRENCY"] = str(self.workers)
+        self.process = subprocess.Popen(self.command, cwd=self.directory, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not wait_until_up(self.port):
+            self.__exit__(None, None, None)
+            raise SystemExit("Server did not start")
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def run_against(url, args, label):
+    catalogue = load_catalogue(url, args.token)
+    workload = Workload(catalogue, parse_mix(args.read_mix, READ_MIX), parse_mix(args.write_mix, WRITE_MIX),
+                        args.write_ratio, args.skew, args.seed)
+    if args.warmup:
+        run_load(url, workload, args.clients, args.warmup, token=args.token)
+    samples, elapsed, created = run_load(url, workload, args.clients, args.duration, args.requests, args.token)
+    summary = summarize(samples, elapsed)
+    summary["label"] = label
+    print_summary(label, summary)
+    return summary, created
+
+
+def cleanup(url, token, created):
+    client = Client(url, token)
+    for bookmark_id in created:
+        client.request("DELETE", f"/api/bookmarks/{bookmark_id}")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay mixed API traffic against the bookmark server")
+    parser.add_argument("--url", help="Test a running server instead of starting one")
+    parser.add_argument("--token", help="API token to send (selects the tenant)")
+    parser.add_argument("--server", choices=["gunicorn", "dev"], default="gunicorn",
+                        help="Server to start when no --url is given")
+    parser.add_argument("--compare", action="store_true", help="Run against the dev server, then gunicorn")
+    parser.add_argument("--workers", type=int, help="gunicorn workers (WEB_CONCURRENCY)")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep per-client rate limits on")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--warmup", type=float, default=1, help="Seconds of unmeasured warm-up")
+    parser.add_argument("--write-ratio", type=float, default=0.05, help="Share of requests that write")
+    parser.add_argument("--read-mix", help="Read weights, e.g. list=35,search=25,suggest=20,"
+                                           "categories=8,subcategories=7,detail=5")
+    parser.add_argument("--write-mix", help="Write weights, e.g. create=50,update=35,rename_category=15")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Zipf exponent for picking bookmarks, categories and terms (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    if args.requests:
+        args.duration = float("inf")
+
+    results = []
+    if args.url:
+        summary, created = run_against(args.url, args, args.url)
+        results.append(summary)
+        cleanup(args.url, args.token, created)
+    else:
+        servers = [("dev server", DEV_SERVER), ("gunicorn", GUNICORN)] if args.compare else \
+            [("dev server", DEV_SERVER) if args.server == "dev" else ("gunicorn", GUNICORN)]
+        for label, command in servers:
+            with LocalServer(command, args.port, args.workers, args.rate_limits) as url:
+                results.append(run_against(url, args, label)[0])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Bookmark Metadata Fetcher
+
+Fetches page titles, descriptions and favicons for bookmark URLs on a
+background worker pool. Favicon bytes are kept in a content-addressed
+on-disk cache (blobs are named by their SHA-256) whose total size is
+bounded with least-recently-used eviction, so the web server can serve
+them without ever waiting on a remote site.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = "LSSR-Bookmarks-MetadataFetcher/1.0"
+MAX_PAGE_BYTES = 256 * 1024
+MAX_ICON_BYTES = 128 * 1024
+
+
+class ContentCache:
+    def __init__(self, root="cache", max_bytes=50 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        # hash -> {"size", "content_type"}, least recently used first
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+        except (ValueError, OSError) as e:
+            print(f"Error loading content cache index: {e}")
+            return
+
+        for digest, entry in entries:
+            if os.path.exists(self._path(digest)):
+                self.entries[digest] = entry
+                self.total_bytes += entry["size"]
+
+    def save(self):
+        with self.lock:
+            entries = list(self.entries.items())
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.index_path, "w") as f:
+            json.dump(entries, f)
+
+    def _path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def put(self, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if digest in self.entries:
+                self.entries.move_to_end(digest)
+                return digest
+
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+            self.entries[digest] = {"size": len(data), "content_type": content_type}
+            self.total_bytes += len(data)
+            self._evict()
+        return digest
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            self.entries.move_to_end(digest)
+
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read(), entry["content_type"]
+        except OSError:
+            return None
+
+    def __contains__(self, digest):
+        return digest in self.entries
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            digest, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+
+class _HeadParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.title = None
+        self.description = None
+        self.icon = None
+        self._in_title = False
+        self._title_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k.lower(): (v or "") for k, v in attrs}
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            key = (attrs.get("name") or attrs.get("property") or "").lower()
+            content = attrs.get("content", "").strip()
+            if key in ("description", "og:description") and content and not self.description:
+                self.description = content
+            elif key == "og:title" and content and not self.title:
+                self.title = content
+        elif tag == "link":
+            rel = attrs.get("rel", "").lower().split()
+            if "icon" in rel and attrs.get("href") and not self.icon:
+                self.icon = attrs["href"]
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+            if not self.title:
+                self.title = " ".join("".join(self._title_parts).split()) or None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+
+
+class MetadataStore:
+    def __init__(self, path=os.path.join("cache", "metadata.json")):
+        self.path = path
+        self.records = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.records = {int(k): v for k, v in json.load(f).items()}
+        except (ValueError, OSError) as e:
+            print(f"Error loading metadata: {e}")
+
+    def save(self):
+        with self.lock:
+            data = {str(k): v for k, v in self.records.items()}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def get(self, bookmark_id):
+        return self.records.get(bookmark_id)
+
+    def set(self, bookmark_id, record):
+        with self.lock:
+            self.records[bookmark_id] = record
+
+
+class MetadataFetcher:
+    def __init__(self, store, cache, workers=8, timeout=10.0, on_update=None):
+        self.store = store
+        self.cache = cache
+        self.timeout = timeout
+        # Called with the bookmark id whenever its record changes
+        self.on_update = on_update
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metadata")
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def needs_fetch(self, bookmark_id, url):
+        record = self.store.get(bookmark_id)
+        if not record or record.get("url") != url:
+            return True
+        favicon = record.get("favicon")
+        return bool(favicon) and favicon not in self.cache
+
+    def enqueue(self, bookmark_id, url, force=False):
+        # Returns immediately; the fetch happens on the worker pool
+        if not url or (not force and not self.needs_fetch(bookmark_id, url)):
+            return False
+        with self.lock:
+            if bookmark_id in self.pending:
+                return False
+            self.pending.add(bookmark_id)
+        self.executor.submit(self._run, bookmark_id, url)
+        return True
+
+    def _run(self, bookmark_id, url):
+        try:
+            record = self.fetch(url)
+            self.store.set(bookmark_id, record)
+            if self.on_update:
+                self.on_update(bookmark_id)
+        except Exception as e:
+            print(f"Error fetching metadata for {url}: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(bookmark_id)
+                idle = not self.pending
+
+        # Persist once per batch rather than after every bookmark
+        if idle:
+            self.store.save()
+            self.cache.save()
+
+    def _open(self, url, limit):
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.geturl(), response.headers.get_content_type(), response.read(limit)
+
+    def fetch(self, url):
+        record = {
+            "url": url,
+            "title": None,
+            "description": None,
+            "favicon": None,
+            "fetched_at": datetime.now().timestamp()
+        }
+
+        final_url = url
+        icon_url = None
+        try:
+            final_url, content_type, body = self._open(url, MAX_PAGE_BYTES)
+            if content_type == "text/html":
+                parser = _HeadParser()
+                parser.feed(body.decode("utf-8", errors="replace"))
+                record["title"] = parser.title
+                record["description"] = parser.description
+                if parser.icon:
+                    icon_url = urljoin(final_url, parser.icon)
+        except (OSError, ValueError) as e:
+            record["error"] = str(e)
+
+        parts = urlsplit(final_url)
+        if not icon_url and parts.scheme in ("http", "https"):
+            icon_url = f"{parts.scheme}://{parts.netloc}/favicon.ico"
+
+        if icon_url:
+            try:
+                _, content_type, data = self._open(icon_url, MAX_ICON_BYTES)
+                if data and content_type.startswith("image/"):
+                    record["favicon"] = self.cache.put(data, content_type)
+                elif data and content_type == "application/octet-stream":
+                    record["favicon"] = self.cache.put(data, "image/x-icon")
+            except (OSError, ValueError):
+                pass
+
+        return record
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,70 @@
+"""
+Bookmark Query Index
+
+Keeps a posting set of bookmark ids for every category, subcategory and type
+value so that combined filters are answered by set intersection before any
+bookmark rows are materialized.
+"""
+
+
+class BookmarkIndex:
+    FIELDS = ("category_id", "subcategory_id", "type")
+
+    def __init__(self):
+        self.by_id = {}
+        self.postings = {field: {} for field in self.FIELDS}
+
+    def rebuild(self, bookmarks):
+        self.by_id = {}
+        self.postings = {field: {} for field in self.FIELDS}
+        for bookmark in bookmarks:
+            self.add(bookmark)
+
+    def add(self, bookmark):
+        self.by_id[bookmark.id] = bookmark
+        for field in self.FIELDS:
+            value = getattr(bookmark, field)
+            self.postings[field].setdefault(value, set()).add(bookmark.id)
+
+    def remove(self, bookmark):
+        self.by_id.pop(bookmark.id, None)
+        for field in self.FIELDS:
+            value = getattr(bookmark, field)
+            ids = self.postings[field].get(value)
+            if ids is None:
+                continue
+            ids.discard(bookmark.id)
+            if not ids:
+                del self.postings[field][value]
+
+    def get(self, bookmark_id):
+        return self.by_id.get(bookmark_id)
+
+    def ids_for(self, field, value):
+        return self.postings[field].get(value, set())
+
+    def query_ids(self, category_id=None, subcategory_id=None, bookmark_type=None):
+        # Returns None when no filter applies, meaning "every bookmark"
+        sets = []
+        if category_id is not None:
+            sets.append(self.ids_for("category_id", category_id))
+        if subcategory_id is not None:
+            sets.append(self.ids_for("subcategory_id", subcategory_id))
+        if bookmark_type is not None:
+            sets.append(self.ids_for("type", bookmark_type))
+
+        if not sets:
+            return None
+
+        # Intersect starting from the smallest posting set so the cost is
+        # bounded by the most selective filter rather than the library size
+        sets.sort(key=len)
+        if len(sets) == 1:
+            return set(sets[0])
+        return sets[0].intersection(*sets[1:])
+
+    def query(self, category_id=None, subcategory_id=None, bookmark_type=None):
+        ids = self.query_ids(category_id, subcategory_id, bookmark_type)
+        if ids is None:
+            ids = self.by_id.keys()
+        return [self.by_id[bookmark_id] for bookmark_id in sorted(ids)]
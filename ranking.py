@@ -0,0 +1,142 @@
+"""
+Bookmark Rankings
+
+Keeps bookmark ids in "popular" and "recent" order as bookmarks and visit
+counts change, so those sorts cost a walk over an already sorted list
+instead of a sort.
+
+- recent: the latest of the bookmark's last edit (or creation) and its
+  last visit.
+- popular: the visit score from visit_counter, with the last edit counted
+  as one more visit so new bookmarks don't start at the very bottom.
+
+Both keys are fixed points in time (see visit_counter for why a decayed
+score is one), so an ordering stays correct until a bookmark changes.
+"""
+
+import bisect
+
+from visit_counter import add_visits
+
+
+class SortedKeys:
+    # Ids ordered by key, highest first; ties go to the lower id. Entries
+    # are (-key, id) kept in sorted buckets of a few hundred, so a change
+    # costs a bisect and a short list insert rather than a shift of the
+    # whole ordering.
+    LOAD = 500
+
+    def __init__(self):
+        self.keys = {}
+        self.buckets = []
+        # Last (largest) entry of each bucket
+        self.maxes = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rebuild(self, keys):
+        self.keys = dict(keys)
+        order = sorted((-key, item_id) for item_id, key in self.keys.items())
+        self.buckets = [order[i:i + self.LOAD] for i in range(0, len(order), self.LOAD)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+
+    def _insert(self, entry):
+        if not self.buckets:
+            self.buckets.append([entry])
+            self.maxes.append(entry)
+            return
+        i = min(bisect.bisect_left(self.maxes, entry), len(self.maxes) - 1)
+        bucket = self.buckets[i]
+        bisect.insort(bucket, entry)
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self.LOAD:
+            self.buckets[i:i + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self.maxes[i:i + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+
+    def _delete(self, entry):
+        i = bisect.bisect_left(self.maxes, entry)
+        bucket = self.buckets[i]
+        del bucket[bisect.bisect_left(bucket, entry)]
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def set(self, item_id, key):
+        old = self.keys.get(item_id)
+        if old == key:
+            return
+        if old is not None:
+            self._delete((-old, item_id))
+        self.keys[item_id] = key
+        self._insert((-key, item_id))
+
+    def remove(self, item_id):
+        old = self.keys.pop(item_id, None)
+        if old is not None:
+            self._delete((-old, item_id))
+
+    def sort_key(self, item_id):
+        return (-self.keys[item_id], item_id)
+
+    def pick(self, by_id):
+        # The values of `by_id` (keyed by id) in this order
+        return [by_id[item_id] for bucket in self.buckets for _, item_id in bucket if item_id in by_id]
+
+
+class BookmarkRankings:
+    def __init__(self):
+        # bookmark id -> updated_at, and -> (last visited, score)
+        self.edited = {}
+        self.visits = {}
+        self.rankings = {"popular": SortedKeys(), "recent": SortedKeys()}
+
+    def rebuild(self, bookmarks):
+        self.edited = {b.id: b.updated_at for b in bookmarks}
+        self._rank_all()
+
+    def _rank_all(self):
+        self.rankings["popular"].rebuild({i: self._popular_key(i) for i in self.edited})
+        self.rankings["recent"].rebuild({i: self._recent_key(i) for i in self.edited})
+
+    def _popular_key(self, bookmark_id):
+        visits = self.visits.get(bookmark_id)
+        return add_visits(visits[1] if visits else None, 1, self.edited[bookmark_id])
+
+    def _recent_key(self, bookmark_id):
+        visits = self.visits.get(bookmark_id)
+        return max(self.edited[bookmark_id], visits[0] if visits else 0)
+
+    def _rank(self, bookmark_id):
+        self.rankings["popular"].set(bookmark_id, self._popular_key(bookmark_id))
+        self.rankings["recent"].set(bookmark_id, self._recent_key(bookmark_id))
+
+    def add(self, bookmark):
+        self.edited[bookmark.id] = bookmark.updated_at
+        self._rank(bookmark.id)
+
+    def remove(self, bookmark):
+        self.edited.pop(bookmark.id, None)
+        for ranking in self.rankings.values():
+            ranking.remove(bookmark.id)
+
+    def apply_visits(self, replaced, changes):
+        # Takes VisitCounter.drain() output
+        if replaced:
+            self.visits = {k: (v[1], v[2]) for k, v in changes.items()}
+            self._rank_all()
+            return
+        for bookmark_id, (count, last_visited, score) in changes.items():
+            self.visits[bookmark_id] = (last_visited, score)
+            if bookmark_id in self.edited:
+                self._rank(bookmark_id)
+
+    def order(self, name, bookmarks):
+        # `bookmarks` in ranking order. A small subset is sorted on the
+        # ranking's keys; a large one is picked out of the ranked list.
+        ranking = self.rankings[name]
+        if len(bookmarks) < len(ranking) // 8:
+            return sorted(bookmarks, key=lambda b: ranking.sort_key(b.id))
+        return ranking.pick({b.id: b for b in bookmarks})
@@ -0,0 +1,192 @@
+"""
+Rate Limiting and Admission Control
+
+Each client (API token, or IP address without one) gets two token buckets,
+one for reads and one for writes. A request that finds its bucket empty
+gets 429 Too Many Requests with a Retry-After header.
+
+Writes also pass through a bounded queue: only so many may be waiting for
+the write lock at once, and the rest are turned away with 429 straight
+away instead of piling up behind a slow save.
+
+Buckets live in memory by default. With several worker processes,
+SqliteBuckets keeps them in a small SQLite file so every worker draws from
+the same budget.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from tenants import request_token
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # key -> (tokens, last updated), least recently used first
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost, now):
+        # Returns how long to wait before `cost` tokens are available; 0
+        # means they were taken
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / rate
+            self.buckets[key] = (tokens, now)
+
+            # The least recently used bucket has had the longest to refill,
+            # so it is the closest to having no bucket at all
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+
+class SqliteBuckets:
+    def __init__(self, path="rate_limits.db", prune_every=1000, max_idle=3600):
+        self.path = path
+        self.local = threading.local()
+        # Every so often, drop buckets nobody has touched for a while
+        self.prune_every = prune_every
+        self.max_idle = max_idle
+        self.calls = 0
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # A bucket lost in a power cut only hands a client a fresh
+            # burst, so commits skip the fsync
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets "
+                               "(key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def take(self, key, rate, burst, cost, now):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0, now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / rate
+            connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                               (key, tokens, now))
+            self.calls += 1
+            if self.calls % self.prune_every == 0:
+                connection.execute("DELETE FROM buckets WHERE updated < ?", (now - self.max_idle,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, backend=None):
+        # `rate` tokens per second, up to `burst` saved up
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend or MemoryBuckets()
+
+    def check(self, key, cost=1):
+        # Seconds until the request would be allowed; 0 if it is
+        return self.backend.take(key, self.rate, self.burst, cost, time.time())
+
+
+class WriteQueue:
+    def __init__(self, max_pending=16):
+        self.max_pending = max_pending
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def try_enter(self):
+        return self.slots.acquire(blocking=False)
+
+    def leave(self):
+        self.slots.release()
+
+
+def client_key(request):
+    token = request_token(request)
+    if token:
+        return "token:" + token
+    return "ip:" + (request.remote_addr or "")
+
+
+class AdmissionControl:
+    def __init__(self, app=None, read_rate=20, read_burst=100, write_rate=5, write_burst=20,
+                 max_pending_writes=16, light_writes=()):
+        self.read_rate = read_rate
+        self.read_burst = read_burst
+        self.write_rate = write_rate
+        self.write_burst = write_burst
+        self.write_queue = WriteQueue(max_pending_writes)
+        # Endpoints that write without taking the write lock (e.g. visit
+        # counters) are budgeted as reads
+        self.light_writes = set(light_writes)
+        self.enabled = False
+        self.read_limiter = None
+        self.write_limiter = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Register before anything that loads data or waits for the write
+        # lock, so rejected requests cost next to nothing
+        app.before_request(self.admit)
+        app.teardown_request(self.release)
+
+    def enable(self, backend=None):
+        self.read_limiter = RateLimiter(self.read_rate, self.read_burst, backend)
+        self.write_limiter = RateLimiter(self.write_rate, self.write_burst, backend)
+        self.enabled = True
+
+    def too_many_requests(self, retry_after):
+        from flask import jsonify
+
+        response = jsonify({"error": "Too many requests"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def admit(self):
+        from flask import g, request
+
+        if not self.enabled or request.endpoint == "static":
+            return None
+
+        is_write = request.method in WRITE_METHODS and request.endpoint not in self.light_writes
+        limiter = self.write_limiter if is_write else self.read_limiter
+        wait = limiter.check(("write:" if is_write else "read:") + client_key(request))
+        if wait:
+            return self.too_many_requests(wait)
+
+        if is_write:
+            if not self.write_queue.try_enter():
+                return self.too_many_requests(1)
+            g.holds_write_slot = True
+        return None
+
+    def release(self, exc=None):
+        from flask import g
+
+        if g.pop("holds_write_slot", False):
+            self.write_queue.leave()
@@ -0,0 +1,172 @@
+"""
+Bookmark Search Index
+
+A precomputed inverted index used for ranked, typo-tolerant search. Query
+terms are expanded to indexed terms with a similar trigram profile (so
+"photshop" still finds "photoshop") and documents are scored with BM25
+across the name, description, category and subcategory fields. Only the
+top results are kept, using a heap.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzySearchIndex:
+    FIELD_WEIGHTS = {
+        "name": 3.0,
+        "description": 1.0,
+        "category": 1.5,
+        "subcategory": 1.5
+    }
+    K1 = 1.2
+    B = 0.75
+    MIN_SIMILARITY = 0.3
+    MAX_EXPANSIONS = 8
+
+    def __init__(self, get_fields):
+        # get_fields(bookmark) returns {field: text} for the indexed fields
+        self.get_fields = get_fields
+        self.clear()
+
+    def clear(self):
+        self.docs = {}
+        self.doc_lengths = {}
+        self.postings = {}
+        self.term_trigrams = {}
+        self.term_gram_counts = {}
+        self.field_lengths = {field: 0 for field in self.FIELD_WEIGHTS}
+
+    def rebuild(self, bookmarks):
+        self.clear()
+        for bookmark in bookmarks:
+            self.add(bookmark)
+
+    def add(self, bookmark):
+        if bookmark.id in self.docs:
+            self.remove(bookmark)
+
+        texts = self.get_fields(bookmark)
+        doc = {}
+        lengths = {}
+        for field in self.FIELD_WEIGHTS:
+            terms = Counter(tokenize(texts.get(field)))
+            doc[field] = terms
+            lengths[field] = sum(terms.values())
+            self.field_lengths[field] += lengths[field]
+            for term, count in terms.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = {}
+                    self._add_term(term)
+                postings.setdefault(bookmark.id, {})[field] = count
+        self.docs[bookmark.id] = doc
+        self.doc_lengths[bookmark.id] = lengths
+
+    def remove(self, bookmark):
+        doc = self.docs.pop(bookmark.id, None)
+        if doc is None:
+            return
+
+        lengths = self.doc_lengths.pop(bookmark.id)
+        for field, terms in doc.items():
+            self.field_lengths[field] -= lengths[field]
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(bookmark.id, None)
+                if not postings:
+                    del self.postings[term]
+                    self._remove_term(term)
+
+    def _add_term(self, term):
+        grams = trigrams(term)
+        self.term_gram_counts[term] = len(grams)
+        for gram in grams:
+            self.term_trigrams.setdefault(gram, set()).add(term)
+
+    def _remove_term(self, term):
+        del self.term_gram_counts[term]
+        for gram in trigrams(term):
+            terms = self.term_trigrams.get(gram)
+            if terms is None:
+                continue
+            terms.discard(term)
+            if not terms:
+                del self.term_trigrams[gram]
+
+    def expand(self, term):
+        # Map a query term to (indexed term, similarity) pairs
+        if term in self.postings:
+            matches = {term: 1.0}
+        else:
+            matches = {}
+
+        query_grams = trigrams(term)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.term_trigrams.get(gram, ()))
+
+        for candidate, count in shared.items():
+            if candidate in matches:
+                continue
+            union = len(query_grams) + self.term_gram_counts[candidate] - count
+            similarity = count / union
+            if similarity >= self.MIN_SIMILARITY:
+                matches[candidate] = similarity
+
+        return heapq.nlargest(self.MAX_EXPANSIONS, matches.items(), key=lambda m: m[1])
+
+    def search(self, query, limit=50, candidates=None):
+        # Returns [(bookmark_id, score)] with the best matches first
+        return self.search_counted(query, limit, candidates)[0]
+
+    def search_counted(self, query, limit=50, candidates=None):
+        # Returns (the best `limit` matches as search() does, the number of
+        # bookmarks that matched at all)
+        doc_count = len(self.docs)
+        if not doc_count:
+            return [], 0
+
+        average_lengths = {
+            field: (length / doc_count) or 1.0
+            for field, length in self.field_lengths.items()
+        }
+        scores = {}
+
+        for query_term in set(tokenize(query)):
+            for term, similarity in self.expand(query_term):
+                postings = self.postings[term]
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+
+                for bookmark_id, field_counts in postings.items():
+                    if candidates is not None and bookmark_id not in candidates:
+                        continue
+
+                    # BM25F: combine the length-normalized field frequencies
+                    lengths = self.doc_lengths[bookmark_id]
+                    weighted_tf = 0.0
+                    for field, count in field_counts.items():
+                        norm = 1 - self.B + self.B * lengths[field] / average_lengths[field]
+                        weighted_tf += self.FIELD_WEIGHTS[field] * count / norm
+
+                    score = similarity * idf * weighted_tf / (self.K1 + weighted_tf)
+                    scores[bookmark_id] = scores.get(bookmark_id, 0.0) + score
+
+        return heapq.nlargest(limit, scores.items(), key=lambda s: s[1]), len(scores)
@@ -0,0 +1,178 @@
+"""
+Shared State Between Worker Processes
+
+Every gunicorn worker keeps its own copy of the bookmarks in memory. To keep
+those copies in step, writers append what they changed to a journal next to
+the data file and bump a version counter held in a small memory-mapped
+file. Before handling a request a worker compares that counter with the
+version it has applied - a single memory read - and replays only the
+journal entries it has not seen yet.
+
+Files, alongside the data file:
+
+- <data>.version: two little-endian uint64s, the latest version and the
+  version the data file was last written at. Its file lock also
+  serializes journal access between processes.
+- <data>.journal: a JSON header line {"base": version, "epoch": ...}
+  followed by one line per change:
+  {"v": version, "kind": ..., "id": ..., "record": ...}. A null record
+  means the item was deleted.
+
+The journal is cut back to an empty one once the data file has caught up
+with it; a worker that was behind the cut reloads the data file instead.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+
+COUNTERS = struct.Struct("<QQ")
+
+
+class SharedState:
+    def __init__(self, path, max_entries=10000):
+        self.version_path = path + ".version"
+        self.journal_path = path + ".journal"
+        self.max_entries = max_entries
+        # Version this process has applied, and where its journal reading
+        # left off
+        self.seen = 0
+        self.epoch = None
+        self.base = None
+        self.offset = 0
+        self.depth = 0
+        self.fd = None
+        self.map = None
+        self.pid = None
+        self._open()
+
+    def _open(self):
+        # File locks belong to the open file, which a forked worker would
+        # share with its parent, so each process opens its own
+        self.pid = os.getpid()
+        self.fd = os.open(self.version_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size < COUNTERS.size:
+            os.ftruncate(self.fd, COUNTERS.size)
+        self.map = mmap.mmap(self.fd, COUNTERS.size)
+        self.depth = 0
+
+    def _ensure_open(self):
+        if self.pid != os.getpid():
+            self._open()
+
+    def acquire(self, exclusive=True):
+        # Reentrant within a process; callers serialize their own threads
+        self._ensure_open()
+        if not self.depth:
+            fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if not self.depth:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def current(self):
+        self._ensure_open()
+        return COUNTERS.unpack_from(self.map)[0]
+
+    def written(self):
+        self._ensure_open()
+        return COUNTERS.unpack_from(self.map)[1]
+
+    def is_stale(self):
+        return self.current() != self.seen
+
+    def reset(self, version, epoch):
+        # Starts a fresh journal at `version`; called by the process that
+        # loaded the data file, before any workers fork
+        self.acquire()
+        try:
+            self.epoch = epoch
+            header = json.dumps({"base": version, "epoch": epoch}) + "\n"
+            with open(self.journal_path, "w") as f:
+                f.write(header)
+            COUNTERS.pack_into(self.map, 0, version, version)
+            self.seen = version
+            self.base = version
+            self.offset = len(header)
+        finally:
+            self.release()
+
+    def join(self):
+        # For a process that loaded the data file on its own while holding
+        # the lock: returns the journal's epoch, or None when there is no
+        # journal yet and the caller should reset() one
+        try:
+            with open(self.journal_path, "r") as f:
+                header = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+        self.epoch = header.get("epoch")
+        self.seen = self.written()
+        self.base = None
+        return self.epoch
+
+    def read_new(self):
+        # Entries after `seen` as (version, kind, id, record), or None when
+        # the journal no longer reaches back that far. Hold the lock.
+        # Binary mode, so the offset is a plain byte count that stops short
+        # of a line another process is still writing
+        with open(self.journal_path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["base"] > self.seen:
+                return None
+            if header["base"] == self.base:
+                f.seek(self.offset)
+            self.base = header["base"]
+            offset = f.tell()
+
+            entries = []
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                entry = json.loads(line)
+                if entry["v"] > self.seen:
+                    entries.append((entry["v"], entry["kind"], entry["id"], entry["record"]))
+            self.offset = offset
+
+        if entries:
+            self.seen = entries[-1][0]
+        return entries
+
+    def append(self, entries):
+        # Publishes (version, kind, id, record) entries that follow `seen`.
+        # Hold the lock exclusively and be caught up first.
+        if not entries:
+            return
+        lines = "".join(json.dumps({"v": v, "kind": kind, "id": item_id, "record": record}) + "\n"
+                        for v, kind, item_id, record in entries)
+        with open(self.journal_path, "a") as f:
+            f.write(lines)
+            f.flush()
+            self.offset = f.tell()
+        self.seen = entries[-1][0]
+        COUNTERS.pack_into(self.map, 0, self.seen, self.written())
+
+    def mark_written(self, version):
+        # Records that the data file now holds `version`. Hold the lock
+        # exclusively.
+        current = self.current()
+        COUNTERS.pack_into(self.map, 0, current, version)
+        if version == current and current - (self.base or 0) > self.max_entries:
+            header = json.dumps({"base": current, "epoch": self.epoch}) + "\n"
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(header)
+            os.replace(tmp_path, self.journal_path)
+            if self.seen == current:
+                self.base = current
+                self.offset = len(header)
@@ -0,0 +1,126 @@
+// Bookmark query worker
+//
+// Holds a copy of the cached data set and answers filter/sort/page queries
+// off the main thread, with the same semantics as GET /api/bookmarks.
+// The sorted result of the last query is kept, so scrolling through its
+// pages only slices it.
+
+let categories = new Map();
+let subcategories = new Map();
+let bookmarks = new Map();
+let lastQuery = null;
+
+function applyRecords(data) {
+    if (data.full) {
+        categories = new Map();
+        subcategories = new Map();
+        bookmarks = new Map();
+    }
+
+    data.categories.forEach(category => categories.set(category.id, category));
+    data.subcategories.forEach(subcategory => subcategories.set(subcategory.id, subcategory));
+    data.bookmarks.forEach(bookmark => bookmarks.set(bookmark.id, bookmark));
+
+    data.deleted.categories.forEach(id => categories.delete(id));
+    data.deleted.subcategories.forEach(id => subcategories.delete(id));
+    data.deleted.bookmarks.forEach(id => bookmarks.delete(id));
+
+    lastQuery = null;
+}
+
+function categoryName(id) {
+    const category = categories.get(id);
+    return category ? category.name : '';
+}
+
+function subcategoryName(id) {
+    const subcategory = subcategories.get(id);
+    return subcategory ? subcategory.name : '';
+}
+
+function withNames(bookmark) {
+    return {
+        ...bookmark,
+        category_name: categoryName(bookmark.category_id),
+        subcategory_name: subcategoryName(bookmark.subcategory_id)
+    };
+}
+
+function byName(a, b) {
+    const left = a.name.toLowerCase();
+    const right = b.name.toLowerCase();
+    return left < right ? -1 : left > right ? 1 : 0;
+}
+
+function runQuery(params) {
+    const needle = (params.searchQuery || '').toLowerCase();
+    const categoryId = params.categoryFilter && params.categoryFilter !== 'ALL' ? parseInt(params.categoryFilter, 10) : null;
+    const typeFilter = params.typeFilter && params.typeFilter !== 'ALL' ? params.typeFilter : null;
+
+    const results = [];
+    bookmarks.forEach(bookmark => {
+        if (categoryId !== null && bookmark.category_id !== categoryId) {
+            return;
+        }
+        if (typeFilter !== null && bookmark.type !== typeFilter) {
+            return;
+        }
+        if (needle && !(
+            bookmark.name.toLowerCase().includes(needle) ||
+            (bookmark.description && bookmark.description.toLowerCase().includes(needle)) ||
+            categoryName(bookmark.category_id).toLowerCase().includes(needle) ||
+            subcategoryName(bookmark.subcategory_id).toLowerCase().includes(needle)
+        )) {
+            return;
+        }
+        results.push(bookmark);
+    });
+
+    if (params.sort === 'name_asc') {
+        results.sort(byName);
+    } else if (params.sort === 'name_desc') {
+        results.sort((a, b) => byName(b, a));
+    } else if (params.sort === 'category') {
+        const key = bookmark => categoryName(bookmark.category_id).toLowerCase();
+        results.sort((a, b) => key(a) < key(b) ? -1 : key(a) > key(b) ? 1 : byName(a, b));
+    } else if (params.sort === 'type') {
+        results.sort((a, b) => a.type < b.type ? -1 : a.type > b.type ? 1 : byName(a, b));
+    }
+
+    return results;
+}
+
+self.onmessage = (event) => {
+    const message = event.data;
+
+    if (message.type === 'apply') {
+        applyRecords(message.data);
+    } else if (message.type === 'query') {
+        const key = JSON.stringify(message.params);
+        if (!lastQuery || lastQuery.key !== key) {
+            lastQuery = { key, results: runQuery(message.params) };
+        }
+
+        const page = lastQuery.results.slice(message.offset, message.offset + message.limit);
+        self.postMessage({
+            requestId: message.requestId,
+            bookmarks: page.map(withNames),
+            total: lastQuery.results.length
+        });
+    } else if (message.type === 'categories') {
+        const result = Array.from(categories.values()).sort((a, b) => a.id - b.id);
+        self.postMessage({ requestId: message.requestId, categories: result });
+    } else if (message.type === 'subcategories') {
+        let result = Array.from(subcategories.values()).sort((a, b) => a.id - b.id);
+        if (message.categoryId) {
+            result = result.filter(subcategory => subcategory.category_id === message.categoryId);
+        }
+        self.postMessage({
+            requestId: message.requestId,
+            subcategories: result.map(subcategory => ({
+                ...subcategory,
+                category_name: categoryName(subcategory.category_id)
+            }))
+        });
+    }
+};
@@ -7,6 +7,27 @@ let subcategoryModalMode = 'add';
 let itemToDelete = null;
 let deleteType = null;
 
+// Search pipeline: input is debounced, a newer request aborts the one in
+// flight, and a query that extends the previous one filters its results
+// locally instead of asking the server again
+const SEARCH_DEBOUNCE_MS = 200;
+let searchDebounceTimer = null;
+let bookmarksController = null;
+let suggestionsController = null;
+
+// Windowed bookmark list: only cards in or near the viewport exist in the
+// DOM, keyed by bookmark id, and pages of /api/bookmarks are fetched as
+// they scroll into view
+const BOOKMARK_PAGE_SIZE = 60;
+// Sorts the local cache can't answer
+const SERVER_SORTS = ['popular', 'recent'];
+const OVERSCAN_ROWS = 3;
+let bookmarkList = null;
+const renderedCards = new Map();
+let bookmarkRowHeight = 0;
+let bookmarkColumns = 0;
+let renderFrame = null;
+
 // DOM elements
 const elements = {
     // Navigation
@@ -21,6 +42,7 @@ const elements = {
     
     // Search and filters
     searchInput: document.getElementById('search-input'),
+    searchSuggestions: document.getElementById('search-suggestions'),
     categoryFilter: document.getElementById('category-filter'),
     typeFilter: document.getElementById('type-filter'),
     sortButtons: document.querySelectorAll('.sort-buttons .btn'),
@@ -29,6 +51,8 @@ const elements = {
     bookmarksContainer: document.getElementById('bookmarks-container'),
     loadingIndicator: document.getElementById('loading-indicator'),
     noBookmarksMessage: document.getElementById('no-bookmarks-message'),
+    bookmarksSpacerTop: document.getElementById('bookmarks-spacer-top'),
+    bookmarksSpacerBottom: document.getElementById('bookmarks-spacer-bottom'),
     addBookmarkBtn: document.getElementById('add-bookmark-btn'),
     
     // Category elements
@@ -49,6 +73,7 @@ const elements = {
     bookmarkName: document.getElementById('bookmark-name'),
     bookmarkUrl: document.getElementById('bookmark-url'),
     bookmarkDescription: document.getElementById('bookmark-description'),
+    bookmarkTags: document.getElementById('bookmark-tags'),
     bookmarkCategory: document.getElementById('bookmark-category'),
     bookmarkSubcategory: document.getElementById('bookmark-subcategory'),
     bookmarkTypeRadios: document.getElementsByName('bookmark-type'),
@@ -78,15 +103,33 @@ const elements = {
 };
 
 // Initialize application
-document.addEventListener('DOMContentLoaded', () => {
+document.addEventListener('DOMContentLoaded', async () => {
     // Set up event listeners
     setupEventListeners();
     
+    // Render from the cached copy straight away when there is one, then
+    // catch up with the server; on a first visit, fill the cache first
+    const cached = await initLocalData();
+    if (!cached) {
+        await syncLocalData();
+    }
+    
     // Load initial data
     loadCategories();
     loadBookmarks();
+    
+    if (cached) {
+        refreshIfChanged();
+    }
 });
 
+async function refreshIfChanged() {
+    if (await syncLocalData()) {
+        loadCategories();
+        loadBookmarks();
+    }
+}
+
 // Set up event listeners
 function setupEventListeners() {
     // Navigation
@@ -107,7 +150,11 @@ function setupEventListeners() {
     
     // Search and filters
     elements.searchInput.addEventListener('input', () => {
-        loadBookmarks();
+        clearTimeout(searchDebounceTimer);
+        searchDebounceTimer = setTimeout(() => {
+            loadSuggestions();
+            loadBookmarks({ refine: true });
+        }, SEARCH_DEBOUNCE_MS);
     });
     
     elements.categoryFilter.addEventListener('change', () => {
@@ -118,6 +165,17 @@ function setupEventListeners() {
         loadBookmarks();
     });
     
+    // Catch up with changes made elsewhere when the tab comes back
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'visible') {
+            refreshIfChanged();
+        }
+    });
+    
+    // Windowed bookmark list
+    window.addEventListener('scroll', scheduleBookmarkRender, { passive: true });
+    window.addEventListener('resize', scheduleBookmarkRender);
+    
     // Sort buttons
     elements.sortButtons.forEach(button => {
         button.addEventListener('click', (e) => {
@@ -199,12 +257,17 @@ function showScreen(screen) {
 }
 
 // API Functions
-async function fetchBookmarks() {
-    const searchQuery = elements.searchInput.value;
-    const categoryFilter = elements.categoryFilter.value;
-    const typeFilter = elements.typeFilter.value;
+async function fetchBookmarks(params, signal, offset = 0, limit = BOOKMARK_PAGE_SIZE) {
+    // params are captured when a list is first loaded, so later pages of it
+    // use the same query even if the inputs have changed since
+    // Visit counts are only on the server, so those sorts always ask it
+    if (localDataReady && !SERVER_SORTS.includes(params.sort)) {
+        return queryLocalBookmarks(params, signal, offset, limit);
+    }
     
-    let url = `/api/bookmarks?sort=${currentSort}`;
+    const { searchQuery, categoryFilter, typeFilter, sort } = params;
+    
+    let url = `${API_BASE}/api/bookmarks?sort=${sort}&offset=${offset}&limit=${limit}`;
     
     if (searchQuery) {
         url += `&search=${encodeURIComponent(searchQuery)}`;
@@ -218,16 +281,31 @@ async function fetchBookmarks() {
         url += `&type=${typeFilter}`;
     }
     
-    const response = await fetch(url);
+    const response = await fetch(url, { signal });
     if (!response.ok) {
         throw new Error('Failed to fetch bookmarks');
     }
     
+    const bookmarks = await response.json();
+    const total = parseInt(response.headers.get('X-Total-Count'), 10);
+    return { bookmarks, total: isNaN(total) ? bookmarks.length : total };
+}
+
+async function fetchSuggestions(query, signal) {
+    const response = await fetch(`${API_BASE}/api/suggest?q=${encodeURIComponent(query)}&limit=10`, { signal });
+    if (!response.ok) {
+        throw new Error('Failed to fetch suggestions');
+    }
+    
     return response.json();
 }
 
 async function fetchCategories() {
-    const response = await fetch('/api/categories');
+    if (localDataReady) {
+        return getLocalCategories();
+    }
+    
+    const response = await fetch(API_BASE + '/api/categories');
     if (!response.ok) {
         throw new Error('Failed to fetch categories');
     }
@@ -236,7 +314,11 @@ async function fetchCategories() {
 }
 
 async function fetchSubcategories(categoryId = null) {
-    let url = '/api/subcategories';
+    if (localDataReady) {
+        return getLocalSubcategories(categoryId);
+    }
+    
+    let url = API_BASE + '/api/subcategories';
     if (categoryId) {
         url += `?category_id=${categoryId}`;
     }
@@ -250,7 +332,7 @@ async function fetchSubcategories(categoryId = null) {
 }
 
 async function fetchBookmark(id) {
-    const response = await fetch(`/api/bookmarks/${id}`);
+    const response = await fetch(`${API_BASE}/api/bookmarks/${id}`);
     if (!response.ok) {
         throw new Error('Failed to fetch bookmark');
     }
@@ -259,7 +341,7 @@ async function fetchBookmark(id) {
 }
 
 async function createBookmark(bookmark) {
-    const response = await fetch('/api/bookmarks', {
+    const response = await fetch(API_BASE + '/api/bookmarks', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -272,11 +354,14 @@ async function createBookmark(bookmark) {
         throw new Error(error.error || 'Failed to create bookmark');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function updateBookmark(id, bookmark) {
-    const response = await fetch(`/api/bookmarks/${id}`, {
+    const response = await fetch(`${API_BASE}/api/bookmarks/${id}`, {
         method: 'PUT',
         headers: {
             'Content-Type': 'application/json'
@@ -289,11 +374,14 @@ async function updateBookmark(id, bookmark) {
         throw new Error(error.error || 'Failed to update bookmark');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function deleteBookmark(id) {
-    const response = await fetch(`/api/bookmarks/${id}`, {
+    const response = await fetch(`${API_BASE}/api/bookmarks/${id}`, {
         method: 'DELETE'
     });
     
@@ -302,11 +390,14 @@ async function deleteBookmark(id) {
         throw new Error(error.error || 'Failed to delete bookmark');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function createCategory(category) {
-    const response = await fetch('/api/categories', {
+    const response = await fetch(API_BASE + '/api/categories', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -319,11 +410,14 @@ async function createCategory(category) {
         throw new Error(error.error || 'Failed to create category');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function updateCategory(id, category) {
-    const response = await fetch(`/api/categories/${id}`, {
+    const response = await fetch(`${API_BASE}/api/categories/${id}`, {
         method: 'PUT',
         headers: {
             'Content-Type': 'application/json'
@@ -336,11 +430,14 @@ async function updateCategory(id, category) {
         throw new Error(error.error || 'Failed to update category');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function deleteCategory(id) {
-    const response = await fetch(`/api/categories/${id}`, {
+    const response = await fetch(`${API_BASE}/api/categories/${id}`, {
         method: 'DELETE'
     });
     
@@ -349,11 +446,14 @@ async function deleteCategory(id) {
         throw new Error(error.error || 'Failed to delete category');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function createSubcategory(subcategory) {
-    const response = await fetch('/api/subcategories', {
+    const response = await fetch(API_BASE + '/api/subcategories', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -366,11 +466,14 @@ async function createSubcategory(subcategory) {
         throw new Error(error.error || 'Failed to create subcategory');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function updateSubcategory(id, subcategory) {
-    const response = await fetch(`/api/subcategories/${id}`, {
+    const response = await fetch(`${API_BASE}/api/subcategories/${id}`, {
         method: 'PUT',
         headers: {
             'Content-Type': 'application/json'
@@ -383,11 +486,14 @@ async function updateSubcategory(id, subcategory) {
         throw new Error(error.error || 'Failed to update subcategory');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function deleteSubcategory(id) {
-    const response = await fetch(`/api/subcategories/${id}`, {
+    const response = await fetch(`${API_BASE}/api/subcategories/${id}`, {
         method: 'DELETE'
     });
     
@@ -396,11 +502,14 @@ async function deleteSubcategory(id) {
         throw new Error(error.error || 'Failed to delete subcategory');
     }
     
-    return response.json();
+    // Pull the change into the local copy before the caller re-renders from it
+    const result = await response.json();
+    await syncLocalData();
+    return result;
 }
 
 async function exportDataAPI() {
-    const response = await fetch('/api/export');
+    const response = await fetch(API_BASE + '/api/export');
     if (!response.ok) {
         throw new Error('Failed to export data');
     }
@@ -408,6 +517,39 @@ async function exportDataAPI() {
     return response.json();
 }
 
+async function importDataAPI(data) {
+    // The server imports in the background; poll the job until it finishes
+    const response = await fetch(API_BASE + '/api/import', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(data)
+    });
+    
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.error || 'Failed to import data');
+    }
+    
+    let job = await response.json();
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 250));
+        const jobResponse = await fetch(`${API_BASE}/api/jobs/${job.id}`);
+        if (!jobResponse.ok) {
+            throw new Error('Failed to check import progress');
+        }
+        job = await jobResponse.json();
+    }
+    
+    if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to import data');
+    }
+    
+    await syncLocalData();
+    return job.result;
+}
+
 // Utility functions
 function getSelectedBookmarkType() {
     for (const radio of elements.bookmarkTypeRadios) {
@@ -428,39 +570,318 @@ function setBookmarkType(type) {
 }
 
 // Main functions
-async function loadBookmarks() {
+function bookmarkQueryParams() {
+    return {
+        searchQuery: elements.searchInput.value,
+        categoryFilter: elements.categoryFilter.value,
+        typeFilter: elements.typeFilter.value,
+        sort: currentSort
+    };
+}
+
+function bookmarkFilterKey() {
+    return [currentSort, elements.categoryFilter.value, elements.typeFilter.value].join('|');
+}
+
+function canRefineBookmarks(query) {
+    // Anything matching the new query also matches a query it contains,
+    // as long as every page of the previous results has been loaded
+    return bookmarkList !== null &&
+        bookmarkList.query !== '' &&
+        bookmarkList.loaded === bookmarkList.total &&
+        bookmarkList.filterKey === bookmarkFilterKey() &&
+        query.toLowerCase().includes(bookmarkList.query.toLowerCase());
+}
+
+function refineBookmarks(bookmarks, query) {
+    // Same fields as the server-side substring search; the order is kept
+    const needle = query.toLowerCase();
+    return bookmarks.filter(bookmark =>
+        bookmark.name.toLowerCase().includes(needle) ||
+        (bookmark.description && bookmark.description.toLowerCase().includes(needle)) ||
+        (bookmark.category_name || '').toLowerCase().includes(needle) ||
+        (bookmark.subcategory_name || '').toLowerCase().includes(needle)
+    );
+}
+
+function createBookmarkList(params, filterKey, total, bookmarks) {
+    const list = {
+        params,
+        query: params.searchQuery,
+        filterKey,
+        total,
+        items: new Array(total),
+        loaded: bookmarks.length,
+        requestedPages: new Set([0]),
+        controller: new AbortController()
+    };
+    bookmarks.forEach((bookmark, index) => {
+        list.items[index] = bookmark;
+    });
+    return list;
+}
+
+async function loadBookmarks({ refine = false } = {}) {
+    // A newer load always supersedes a request still in flight
+    if (bookmarksController) {
+        bookmarksController.abort();
+        bookmarksController = null;
+    }
+    
+    const params = bookmarkQueryParams();
+    const query = params.searchQuery;
+    const filterKey = bookmarkFilterKey();
+    
+    if (refine && canRefineBookmarks(query)) {
+        const bookmarks = refineBookmarks(bookmarkList.items, query);
+        showBookmarkList(createBookmarkList(params, filterKey, bookmarks.length, bookmarks));
+        return;
+    }
+    
+    const controller = new AbortController();
+    bookmarksController = controller;
+    
     // Show loading indicator
-    elements.loadingIndicator.classList.remove('d-none');
-    elements.noBookmarksMessage.classList.add('d-none');
-    elements.bookmarksContainer.querySelectorAll('.bookmark-card').forEach(card => card.remove());
+    if (!bookmarkList) {
+        elements.loadingIndicator.classList.remove('d-none');
+        elements.noBookmarksMessage.classList.add('d-none');
+    }
     
     try {
-        const bookmarks = await fetchBookmarks();
+        // The first page tells us the total; the rest load as they come into view
+        const { bookmarks, total } = await fetchBookmarks(params, controller.signal);
+        showBookmarkList(createBookmarkList(params, filterKey, total, bookmarks));
+    } catch (error) {
+        if (error.name === 'AbortError') {
+            return;
+        }
+        console.error('Error loading bookmarks:', error);
+        showBookmarkList(null);
+        elements.noBookmarksMessage.querySelector('p').textContent = 'Error loading bookmarks. Please try again.';
+    } finally {
+        if (bookmarksController === controller) {
+            bookmarksController = null;
+        }
+    }
+}
+
+async function loadBookmarkPage(list, page) {
+    try {
+        const offset = page * BOOKMARK_PAGE_SIZE;
+        const { bookmarks } = await fetchBookmarks(list.params, list.controller.signal, offset);
+        bookmarks.forEach((bookmark, index) => {
+            if (offset + index < list.total && !list.items[offset + index]) {
+                list.items[offset + index] = bookmark;
+                list.loaded++;
+            }
+        });
+        if (list === bookmarkList) {
+            scheduleBookmarkRender();
+        }
+    } catch (error) {
+        list.requestedPages.delete(page);
+        if (error.name !== 'AbortError') {
+            console.error('Error loading bookmarks:', error);
+        }
+    }
+}
+
+function showBookmarkList(list) {
+    const previous = bookmarkList;
+    if (previous && previous !== list) {
+        previous.controller.abort();
+    }
+    bookmarkList = list;
+    
+    // Hide loading indicator
+    elements.loadingIndicator.classList.add('d-none');
+    
+    if (!list || list.total === 0) {
+        elements.noBookmarksMessage.querySelector('p').textContent = 'No bookmarks found.';
+        elements.noBookmarksMessage.classList.remove('d-none');
+    } else {
+        elements.noBookmarksMessage.classList.add('d-none');
+    }
+    
+    // A different search or filter starts again from the top of the list
+    const listTop = elements.bookmarksSpacerTop.getBoundingClientRect().top;
+    if (previous && list && (previous.query !== list.query || previous.filterKey !== list.filterKey) && listTop < 0) {
+        window.scrollBy(0, listTop);
+    }
+    
+    renderBookmarkWindow();
+}
+
+function bookmarkColumnsPerRow() {
+    // Matches the col-md-6 col-lg-4 breakpoints of the cards
+    if (window.innerWidth >= 992) {
+        return 3;
+    }
+    return window.innerWidth >= 768 ? 2 : 1;
+}
+
+function scheduleBookmarkRender() {
+    if (renderFrame === null) {
+        renderFrame = requestAnimationFrame(renderBookmarkWindow);
+    }
+}
+
+function renderBookmarkWindow() {
+    if (renderFrame !== null) {
+        cancelAnimationFrame(renderFrame);
+        renderFrame = null;
+    }
+    
+    const list = bookmarkList;
+    const total = list ? list.total : 0;
+    const columns = bookmarkColumnsPerRow();
+    
+    // Row heights are re-measured whenever the layout changes
+    if (columns !== bookmarkColumns) {
+        bookmarkColumns = columns;
+        bookmarkRowHeight = 0;
+        elements.bookmarksContainer.style.removeProperty('--bookmark-row-height');
+    }
+    const rowHeight = bookmarkRowHeight || 200;
+    
+    const totalRows = Math.ceil(total / columns);
+    const listTop = elements.bookmarksSpacerTop.getBoundingClientRect().top;
+    const firstRow = Math.min(totalRows, Math.max(0, Math.floor(-listTop / rowHeight) - OVERSCAN_ROWS));
+    const lastRow = Math.min(totalRows, Math.max(firstRow, Math.ceil((window.innerHeight - listTop) / rowHeight) + OVERSCAN_ROWS));
+    const start = firstRow * columns;
+    const end = Math.min(total, lastRow * columns);
+    
+    elements.bookmarksSpacerTop.style.height = `${firstRow * rowHeight}px`;
+    elements.bookmarksSpacerBottom.style.height = `${(totalRows - lastRow) * rowHeight}px`;
+    
+    if (list) {
+        requestBookmarkPages(list, start, end);
+    }
+    reconcileBookmarkCards(list ? list.items : [], start, end);
+    measureBookmarkRows();
+}
+
+function requestBookmarkPages(list, start, end) {
+    if (start >= end || list.loaded === list.total) {
+        return;
+    }
+    const firstPage = Math.floor(start / BOOKMARK_PAGE_SIZE);
+    const lastPage = Math.floor((end - 1) / BOOKMARK_PAGE_SIZE);
+    for (let page = firstPage; page <= lastPage; page++) {
+        if (!list.requestedPages.has(page)) {
+            list.requestedPages.add(page);
+            loadBookmarkPage(list, page);
+        }
+    }
+}
+
+function reconcileBookmarkCards(items, start, end) {
+    // Keyed diff: cards that stay in view are kept (or replaced if their
+    // bookmark changed), moved only when out of order, and the rest removed
+    const wanted = [];
+    for (let index = start; index < end; index++) {
+        const bookmark = items[index];
+        wanted.push(bookmark
+            ? { key: `bookmark-${bookmark.id}`, bookmark }
+            : { key: `placeholder-${index}`, bookmark: null });
+    }
+    
+    const wantedKeys = new Set(wanted.map(item => item.key));
+    renderedCards.forEach((entry, key) => {
+        if (!wantedKeys.has(key)) {
+            entry.element.remove();
+            renderedCards.delete(key);
+        }
+    });
+    
+    let cursor = elements.bookmarksSpacerTop.nextElementSibling;
+    wanted.forEach(({ key, bookmark }) => {
+        const signature = bookmark ? JSON.stringify(bookmark) : '';
+        let entry = renderedCards.get(key);
         
-        // Hide loading indicator
-        elements.loadingIndicator.classList.add('d-none');
+        if (entry && entry.signature !== signature) {
+            const element = createBookmarkCard(bookmark);
+            if (cursor === entry.element) {
+                cursor = element;
+            }
+            entry.element.replaceWith(element);
+            entry = { element, signature };
+            renderedCards.set(key, entry);
+        } else if (!entry) {
+            const element = bookmark ? createBookmarkCard(bookmark) : createPlaceholderCard();
+            entry = { element, signature };
+            renderedCards.set(key, entry);
+        }
         
-        if (bookmarks.length === 0) {
-            elements.noBookmarksMessage.classList.remove('d-none');
-            return;
+        if (entry.element === cursor) {
+            cursor = cursor.nextElementSibling;
+        } else {
+            elements.bookmarksContainer.insertBefore(entry.element, cursor);
         }
+    });
+}
+
+function measureBookmarkRows() {
+    // Every row is given the height of the tallest one seen so far, which
+    // keeps the spacer arithmetic exact while scrolling
+    let tallest = bookmarkRowHeight;
+    renderedCards.forEach(entry => {
+        tallest = Math.max(tallest, entry.element.offsetHeight);
+    });
+    if (tallest > bookmarkRowHeight) {
+        bookmarkRowHeight = tallest;
+        elements.bookmarksContainer.style.setProperty('--bookmark-row-height', `${tallest}px`);
+        scheduleBookmarkRender();
+    }
+}
+
+function createPlaceholderCard() {
+    const col = document.createElement('div');
+    col.className = 'col-md-6 col-lg-4 bookmark-slot';
+    col.innerHTML = '<div class="card bookmark-card bookmark-placeholder"></div>';
+    return col;
+}
+
+async function loadSuggestions() {
+    const query = elements.searchInput.value.trim();
+    
+    if (suggestionsController) {
+        suggestionsController.abort();
+        suggestionsController = null;
+    }
+    
+    if (!query) {
+        elements.searchSuggestions.innerHTML = '';
+        return;
+    }
+    
+    const controller = new AbortController();
+    suggestionsController = controller;
+    
+    try {
+        const suggestions = await fetchSuggestions(query, controller.signal);
         
-        // Create bookmark cards
-        bookmarks.forEach(bookmark => {
-            const bookmarkCard = createBookmarkCard(bookmark);
-            elements.bookmarksContainer.appendChild(bookmarkCard);
+        elements.searchSuggestions.innerHTML = '';
+        suggestions.forEach(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.name;
+            option.label = suggestion.type;
+            elements.searchSuggestions.appendChild(option);
         });
     } catch (error) {
-        console.error('Error loading bookmarks:', error);
-        elements.loadingIndicator.classList.add('d-none');
-        elements.noBookmarksMessage.classList.remove('d-none');
-        elements.noBookmarksMessage.querySelector('p').textContent = 'Error loading bookmarks. Please try again.';
+        if (error.name !== 'AbortError') {
+            console.error('Error loading suggestions:', error);
+        }
+    } finally {
+        if (suggestionsController === controller) {
+            suggestionsController = null;
+        }
     }
 }
 
 function createBookmarkCard(bookmark) {
     const col = document.createElement('div');
-    col.className = 'col-md-6 col-lg-4';
+    col.className = 'col-md-6 col-lg-4 bookmark-slot';
     
     // Get badge class based on bookmark type
     let badgeClass = 'badge-secondary';
@@ -472,19 +893,28 @@ function createBookmarkCard(bookmark) {
         badgeClass = 'badge-freemium';
     }
     
+    // Page metadata is fetched by the server in the background, so it may
+    // not be available yet; the card renders fine without it
+    const favicon = bookmark.favicon_url
+        ? `<img class="bookmark-favicon" src="${bookmark.favicon_url}" alt="" loading="lazy">`
+        : '';
+    const description = bookmark.description || bookmark.page_description;
+    
     // Create card HTML
     col.innerHTML = `
         <div class="card bookmark-card" data-id="${bookmark.id}">
             <div class="card-header">
-                <h5 class="card-title">${escapeHtml(bookmark.name)}</h5>
+                <h5 class="card-title">${favicon}${escapeHtml(bookmark.name)}</h5>
                 <span class="badge text-bg-${badgeClass === 'badge-free' ? 'success' : badgeClass === 'badge-paid' ? 'danger' : 'warning'} bookmark-type-badge">${bookmark.type}</span>
             </div>
             <div class="card-body">
                 <div class="bookmark-category">
                     <i class="fas fa-folder me-1"></i> ${escapeHtml(bookmark.category_name)} > ${escapeHtml(bookmark.subcategory_name)}
                 </div>
+                ${bookmark.page_title ? `<div class="bookmark-page-title">${escapeHtml(bookmark.page_title)}</div>` : ''}
                 ${bookmark.url ? `<div class="bookmark-url"><i class="fas fa-link me-1"></i> <a href="${bookmark.url}" target="_blank">${escapeHtml(bookmark.url)}</a></div>` : ''}
-                ${bookmark.description ? `<div class="bookmark-description">${escapeHtml(bookmark.description)}</div>` : ''}
+                ${description ? `<div class="bookmark-description">${escapeHtml(description)}</div>` : ''}
+                ${bookmark.tags && bookmark.tags.length ? `<div class="bookmark-tags">${bookmark.tags.map(tag => `<span class="badge text-bg-light me-1">${escapeHtml(tag)}</span>`).join('')}</div>` : ''}
                 <div class="bookmark-actions">
                     <button class="btn btn-sm btn-outline-primary edit-bookmark-btn" data-id="${bookmark.id}">
                         <i class="fas fa-edit"></i>
@@ -509,9 +939,22 @@ function createBookmarkCard(bookmark) {
         openDeleteBookmarkConfirmation(bookmark.id, bookmark.name);
     });
     
+    const link = col.querySelector('.bookmark-url a');
+    if (link) {
+        link.addEventListener('click', () => recordVisit(bookmark.id));
+    }
+    
     return col;
 }
 
+function recordVisit(id) {
+    // sendBeacon survives the page navigating away and never blocks it
+    const url = `${API_BASE}/api/bookmarks/${id}/visit`;
+    if (!navigator.sendBeacon || !navigator.sendBeacon(url)) {
+        fetch(url, { method: 'POST', keepalive: true }).catch(() => {});
+    }
+}
+
 async function loadCategories() {
     try {
         const categories = await fetchCategories();
@@ -521,8 +964,12 @@ async function loadCategories() {
         elements.bookmarkCategory.innerHTML = '<option value="">Select Category</option>';
         elements.subcategoryCategory.innerHTML = '<option value="">Select Category</option>';
         
-        // Update categories list
-        elements.categoriesList.innerHTML = '';
+        // Existing list items are reused by id; only new or renamed categories are rebuilt
+        const existingItems = new Map();
+        elements.categoriesList.querySelectorAll('.category-item').forEach(item => {
+            existingItems.set(item.getAttribute('data-id'), item);
+        });
+        let cursor = elements.categoriesList.firstElementChild;
         
         categories.forEach(category => {
             // Add to filter dropdown
@@ -544,47 +991,75 @@ async function loadCategories() {
             elements.subcategoryCategory.appendChild(subcategoryOption);
             
             // Add to categories list
-            const listItem = document.createElement('li');
-            listItem.className = 'list-group-item category-item';
-            listItem.setAttribute('data-id', category.id);
-            listItem.innerHTML = `
-                <span class="item-name">${escapeHtml(category.name)}</span>
-                <div class="item-actions">
-                    <button class="btn btn-sm btn-outline-primary edit-category-btn">
-                        <i class="fas fa-edit"></i>
-                    </button>
-                    <button class="btn btn-sm btn-outline-danger delete-category-btn">
-                        <i class="fas fa-trash"></i>
-                    </button>
-                </div>
-            `;
+            const key = String(category.id);
+            let listItem = existingItems.get(key);
+            existingItems.delete(key);
             
-            // Add event listeners
-            const editBtn = listItem.querySelector('.edit-category-btn');
-            const deleteBtn = listItem.querySelector('.delete-category-btn');
-            
-            editBtn.addEventListener('click', () => {
-                openEditCategoryModal(category.id, category.name);
-            });
-            
-            deleteBtn.addEventListener('click', () => {
-                openDeleteCategoryConfirmation(category.id, category.name);
-            });
-            
-            // Add selection functionality
-            listItem.addEventListener('click', (e) => {
-                if (!e.target.closest('.item-actions')) {
-                    selectCategory(category.id);
+            if (listItem && listItem.getAttribute('data-name') !== category.name) {
+                const replacement = createCategoryItem(category);
+                replacement.classList.toggle('active', listItem.classList.contains('active'));
+                if (cursor === listItem) {
+                    cursor = replacement;
                 }
-            });
+                listItem.replaceWith(replacement);
+                listItem = replacement;
+            } else if (!listItem) {
+                listItem = createCategoryItem(category);
+            }
             
-            elements.categoriesList.appendChild(listItem);
+            if (listItem === cursor) {
+                cursor = cursor.nextElementSibling;
+            } else {
+                elements.categoriesList.insertBefore(listItem, cursor);
+            }
         });
+        
+        // Whatever was not reused belongs to deleted categories
+        existingItems.forEach(item => item.remove());
     } catch (error) {
         console.error('Error loading categories:', error);
     }
 }
 
+function createCategoryItem(category) {
+    const listItem = document.createElement('li');
+    listItem.className = 'list-group-item category-item';
+    listItem.setAttribute('data-id', category.id);
+    listItem.setAttribute('data-name', category.name);
+    listItem.innerHTML = `
+        <span class="item-name">${escapeHtml(category.name)}</span>
+        <div class="item-actions">
+            <button class="btn btn-sm btn-outline-primary edit-category-btn">
+                <i class="fas fa-edit"></i>
+            </button>
+            <button class="btn btn-sm btn-outline-danger delete-category-btn">
+                <i class="fas fa-trash"></i>
+            </button>
+        </div>
+    `;
+
+    // Add event listeners
+    const editBtn = listItem.querySelector('.edit-category-btn');
+    const deleteBtn = listItem.querySelector('.delete-category-btn');
+
+    editBtn.addEventListener('click', () => {
+        openEditCategoryModal(category.id, category.name);
+    });
+
+    deleteBtn.addEventListener('click', () => {
+        openDeleteCategoryConfirmation(category.id, category.name);
+    });
+
+    // Add selection functionality
+    listItem.addEventListener('click', (e) => {
+        if (!e.target.closest('.item-actions')) {
+            selectCategory(category.id);
+        }
+    });
+
+    return listItem;
+}
+
 async function loadSubcategories(categoryId = null) {
     try {
         const subcategories = await fetchSubcategories(categoryId);
@@ -673,6 +1148,7 @@ async function openEditBookmarkModal(id) {
         elements.bookmarkName.value = bookmark.name;
         elements.bookmarkUrl.value = bookmark.url || '';
         elements.bookmarkDescription.value = bookmark.description || '';
+        elements.bookmarkTags.value = (bookmark.tags || []).join(', ');
         elements.bookmarkCategory.value = bookmark.category_id;
         
         // Load subcategories for selected category
@@ -692,6 +1168,7 @@ async function saveBookmark() {
     const name = elements.bookmarkName.value.trim();
     const url = elements.bookmarkUrl.value.trim();
     const description = elements.bookmarkDescription.value.trim();
+    const tags = elements.bookmarkTags.value.split(',').map(tag => tag.trim()).filter(tag => tag);
     const categoryId = elements.bookmarkCategory.value;
     const subcategoryId = elements.bookmarkSubcategory.value;
     const type = getSelectedBookmarkType();
@@ -717,7 +1194,8 @@ async function saveBookmark() {
         description: description || null,
         category_id: parseInt(categoryId),
         subcategory_id: parseInt(subcategoryId),
-        type
+        type,
+        tags
     };
     
     try {
@@ -939,7 +1417,28 @@ async function exportData() {
 }
 
 function importData() {
-    alert('Import functionality would import data from a JSON file.');
+    const input = document.createElement('input');
+    input.type = 'file';
+    input.accept = 'application/json,.json';
+    
+    input.addEventListener('change', async () => {
+        const file = input.files[0];
+        if (!file) return;
+        
+        try {
+            const data = JSON.parse(await file.text());
+            const result = await importDataAPI(data);
+            
+            await loadCategories();
+            await loadBookmarks();
+            alert(`Imported ${result.imported} bookmarks.`);
+        } catch (error) {
+            console.error('Error importing data:', error);
+            alert('Failed to import data: ' + error.message);
+        }
+    });
+    
+    input.click();
 }
 
 // Helper function to escape HTML
@@ -0,0 +1,195 @@
+// Offline data cache
+//
+// Keeps the last copy of the categories, subcategories and bookmarks in
+// IndexedDB, together with the server's data epoch and version. On page
+// load the app renders from that copy straight away and then asks
+// /api/sync for whatever changed since. Queries over the cached data run in
+// a Web Worker (bookmark-worker.js), so filtering, sorting and paging make
+// no network round trip.
+//
+// Everything here degrades gracefully: without IndexedDB or Worker support
+// localDataReady stays false and the app talks to the API as before.
+
+// Set when the page is served under a tenant prefix (/t/<tenant id>); each
+// tenant's data is cached in its own database
+const API_BASE = document.body.dataset.apiBase || '';
+const CACHE_DB_NAME = 'lssr-bookmarks' + API_BASE;
+const CACHE_DB_VERSION = 1;
+const CACHE_STORES = ['categories', 'subcategories', 'bookmarks'];
+// The page passes the fingerprinted worker URL on this script's tag
+const WORKER_URL = (document.currentScript && document.currentScript.dataset.workerUrl) ||
+    '/static/js/bookmark-worker.js';
+
+let cacheDb = null;
+let dataWorker = null;
+let localDataReady = false;
+let localDataVersion = null;
+let syncPromise = null;
+let workerRequestId = 0;
+const workerRequests = new Map();
+
+function openCacheDb() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(CACHE_DB_NAME, CACHE_DB_VERSION);
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            CACHE_STORES.forEach(name => db.createObjectStore(name, { keyPath: 'id' }));
+            db.createObjectStore('meta');
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function readCachedData() {
+    return new Promise((resolve, reject) => {
+        const transaction = cacheDb.transaction([...CACHE_STORES, 'meta'], 'readonly');
+        const data = { full: true, deleted: { categories: [], subcategories: [], bookmarks: [] } };
+
+        CACHE_STORES.forEach(name => {
+            const request = transaction.objectStore(name).getAll();
+            request.onsuccess = () => {
+                data[name] = request.result;
+            };
+        });
+        const versionRequest = transaction.objectStore('meta').get('version');
+        versionRequest.onsuccess = () => {
+            data.version = versionRequest.result || null;
+        };
+
+        transaction.oncomplete = () => resolve(data);
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+function writeCachedData(data) {
+    // Applies a full copy or a delta from /api/sync in one transaction
+    return new Promise((resolve, reject) => {
+        const transaction = cacheDb.transaction([...CACHE_STORES, 'meta'], 'readwrite');
+
+        CACHE_STORES.forEach(name => {
+            const store = transaction.objectStore(name);
+            if (data.full) {
+                store.clear();
+            }
+            data[name].forEach(record => store.put(record));
+            data.deleted[name].forEach(id => store.delete(id));
+        });
+        transaction.objectStore('meta').put({ epoch: data.epoch, version: data.version }, 'version');
+
+        transaction.oncomplete = () => resolve();
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+function askWorker(message, signal) {
+    return new Promise((resolve, reject) => {
+        const requestId = ++workerRequestId;
+        workerRequests.set(requestId, resolve);
+
+        // The worker still answers, but an aborted caller never sees it
+        if (signal) {
+            signal.addEventListener('abort', () => {
+                workerRequests.delete(requestId);
+                reject(new DOMException('Aborted', 'AbortError'));
+            }, { once: true });
+        }
+
+        dataWorker.postMessage({ ...message, requestId });
+    });
+}
+
+function applyData(data) {
+    dataWorker.postMessage({ type: 'apply', data });
+    localDataVersion = { epoch: data.epoch, version: data.version };
+    localDataReady = true;
+}
+
+function hasChanges(data) {
+    return data.full ||
+        CACHE_STORES.some(name => data[name].length > 0 || data.deleted[name].length > 0);
+}
+
+async function initLocalData() {
+    // Resolves true when cached data was available to render from
+    if (!window.indexedDB || !window.Worker) {
+        return false;
+    }
+
+    try {
+        dataWorker = new Worker(WORKER_URL);
+        dataWorker.onmessage = (event) => {
+            const resolve = workerRequests.get(event.data.requestId);
+            if (resolve) {
+                workerRequests.delete(event.data.requestId);
+                resolve(event.data);
+            }
+        };
+
+        cacheDb = await openCacheDb();
+        const cached = await readCachedData();
+        if (cached.version) {
+            applyData({ ...cached, ...cached.version });
+            return true;
+        }
+    } catch (error) {
+        console.error('Error opening local data cache:', error);
+        cacheDb = null;
+        dataWorker = null;
+    }
+    return false;
+}
+
+function syncLocalData() {
+    // Resolves true when the local data changed. Concurrent callers share
+    // one request.
+    if (!dataWorker) {
+        return Promise.resolve(false);
+    }
+    if (!syncPromise) {
+        syncPromise = runSync().finally(() => {
+            syncPromise = null;
+        });
+    }
+    return syncPromise;
+}
+
+async function runSync() {
+    let url = API_BASE + '/api/sync';
+    if (localDataVersion) {
+        url += `?epoch=${encodeURIComponent(localDataVersion.epoch)}&since=${localDataVersion.version}`;
+    }
+
+    try {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error('Failed to sync data');
+        }
+        const data = await response.json();
+
+        const changed = hasChanges(data);
+        applyData(data);
+        if (cacheDb) {
+            await writeCachedData(data);
+        }
+        return changed;
+    } catch (error) {
+        console.error('Error syncing local data:', error);
+        return false;
+    }
+}
+
+async function queryLocalBookmarks(params, signal, offset, limit) {
+    const result = await askWorker({ type: 'query', params, offset, limit }, signal);
+    return { bookmarks: result.bookmarks, total: result.total };
+}
+
+async function getLocalCategories() {
+    const result = await askWorker({ type: 'categories' });
+    return result.categories;
+}
+
+async function getLocalSubcategories(categoryId = null) {
+    const result = await askWorker({ type: 'subcategories', categoryId: categoryId ? parseInt(categoryId, 10) : null });
+    return result.subcategories;
+}
@@ -0,0 +1,71 @@
+"""
+Fingerprinted Static Assets
+
+Templates link static files through asset_url(), which appends a short
+hash of the file contents (?v=<hash>). URLs carrying the current hash are
+served as immutable and cached for a year; a changed file gets a new URL,
+so browsers pick it up on the next page load. Pages and unversioned
+static URLs are revalidated on every use.
+"""
+
+import hashlib
+import os
+import threading
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class StaticAssets:
+    def __init__(self, app=None):
+        self.static_folder = None
+        # filename -> (mtime_ns, size, fingerprint)
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        app.add_template_global(self.asset_url, "asset_url")
+        app.after_request(self.set_cache_headers)
+
+    def fingerprint(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        stat = os.stat(path)
+        cached = self.fingerprints.get(filename)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:12]
+        with self.lock:
+            self.fingerprints[filename] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+        return fingerprint
+
+    def asset_url(self, filename):
+        from flask import url_for
+
+        try:
+            return url_for("static", filename=filename, v=self.fingerprint(filename))
+        except OSError:
+            return url_for("static", filename=filename)
+
+    def set_cache_headers(self, response):
+        from flask import request
+
+        if request.endpoint == "static":
+            filename = (request.view_args or {}).get("filename")
+            version = request.args.get("v")
+            try:
+                current = version and filename and self.fingerprint(filename) == version
+            except OSError:
+                current = False
+            # Only a URL naming the current contents may be cached forever
+            response.headers["Cache-Control"] = IMMUTABLE if current else REVALIDATE
+        elif response.mimetype == "text/html":
+            response.headers["Cache-Control"] = REVALIDATE
+        return response
@@ -0,0 +1,62 @@
+"""
+Bookmark Suggest Index
+
+A sorted array of lowercase name keys searched with bisect, used for
+search-as-you-type suggestions. Every word start of a name is indexed so
+that "photo" suggests both "Photoroom" and "Adobe Photoshop".
+"""
+
+from bisect import bisect_left, insort
+
+
+def name_keys(name):
+    words = (name or "").lower().split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class SuggestIndex:
+    def __init__(self):
+        # Entries are (key, kind, id, name) tuples kept in sorted order
+        self.entries = []
+
+    def rebuild(self, items):
+        # items yields (kind, id, name)
+        self.entries = sorted(
+            (key, kind, item_id, name)
+            for kind, item_id, name in items
+            for key in name_keys(name)
+        )
+
+    def add(self, kind, item_id, name):
+        for key in name_keys(name):
+            insort(self.entries, (key, kind, item_id, name))
+
+    def remove(self, kind, item_id, name):
+        for key in name_keys(name):
+            entry = (key, kind, item_id, name)
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def suggest(self, prefix, limit=10, kinds=None):
+        prefix = " ".join((prefix or "").lower().split())
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        position = bisect_left(self.entries, (prefix,))
+
+        while position < len(self.entries) and len(results) < limit:
+            key, kind, item_id, name = self.entries[position]
+            position += 1
+            if not key.startswith(prefix):
+                break
+            if kinds and kind not in kinds:
+                continue
+            if (kind, item_id) in seen:
+                continue
+            seen.add((kind, item_id))
+            results.append({"type": kind, "id": item_id, "name": name})
+
+        return results
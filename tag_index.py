@@ -0,0 +1,161 @@
+"""
+Bookmark Tag Index
+
+A bookmark can carry any number of tags. The index keeps a posting set of
+bookmark ids per tag and answers boolean tag queries such as
+
+    writing AND (coding OR research) NOT paid
+
+by set intersection, union and difference, intersecting from the smallest
+posting set first. Adjacent terms are ANDed, `-tag` is short for `NOT tag`
+and operators are case-insensitive.
+"""
+
+import re
+
+TAG_PATTERN = re.compile(r"^[^\s(),]{1,40}$")
+TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+OPERATORS = {"and", "or", "not"}
+
+
+class TagQueryError(ValueError):
+    pass
+
+
+def normalize_tags(value):
+    # Accepts a list or a comma separated string; returns sorted, unique,
+    # lowercase tags with spaces turned into dashes
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("Tags must be a list or a comma separated string")
+
+    tags = set()
+    for tag in value:
+        if not isinstance(tag, str):
+            raise ValueError("Tags must be strings")
+        tag = "-".join(tag.strip().lower().split())
+        if not tag:
+            continue
+        if not TAG_PATTERN.match(tag) or tag in OPERATORS:
+            raise ValueError(f"Invalid tag: {tag}")
+        tags.add(tag)
+    return sorted(tags)
+
+
+def parse_tag_query(text):
+    # Returns a tree of ("tag", name), ("not", node), ("and", [nodes]) and
+    # ("or", [nodes])
+    tokens = TOKEN_PATTERN.findall(text or "")
+    position = 0
+
+    def peek():
+        return tokens[position].lower() if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        nodes = [parse_and()]
+        while peek() == "or":
+            take()
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and():
+        nodes = [parse_not()]
+        while peek() not in (None, "or", ")"):
+            if peek() == "and":
+                take()
+            nodes.append(parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not():
+        token = peek()
+        if token == "not":
+            take()
+            return ("not", parse_not())
+        if token is not None and token.startswith("-") and len(token) > 1:
+            take()
+            return ("not", ("tag", token[1:]))
+        return parse_atom()
+
+    def parse_atom():
+        token = peek()
+        if token is None:
+            raise TagQueryError("Unexpected end of tag query")
+        if token == "(":
+            take()
+            node = parse_or()
+            if peek() != ")":
+                raise TagQueryError("Missing closing parenthesis")
+            take()
+            return node
+        if token in OPERATORS or token == ")":
+            raise TagQueryError(f"Unexpected '{take()}'")
+        return ("tag", take().lower())
+
+    if not tokens:
+        raise TagQueryError("Empty tag query")
+    tree = parse_or()
+    if position < len(tokens):
+        raise TagQueryError(f"Unexpected '{tokens[position]}'")
+    return tree
+
+
+class TagIndex:
+    def __init__(self):
+        self.postings = {}
+
+    def rebuild(self, bookmarks):
+        self.postings = {}
+        for bookmark in bookmarks:
+            self.add(bookmark)
+
+    def add(self, bookmark):
+        for tag in bookmark.tags:
+            self.postings.setdefault(tag, set()).add(bookmark.id)
+
+    def remove(self, bookmark):
+        for tag in bookmark.tags:
+            ids = self.postings.get(tag)
+            if ids is None:
+                continue
+            ids.discard(bookmark.id)
+            if not ids:
+                del self.postings[tag]
+
+    def counts(self):
+        # [(tag, number of bookmarks)], most used first
+        return sorted(((tag, len(ids)) for tag, ids in self.postings.items()),
+                      key=lambda item: (-item[1], item[0]))
+
+    def query(self, text, universe):
+        # Ids matching the tag query; `universe` (every bookmark id) is
+        # only touched by negations that have nothing to subtract from
+        return set(self.evaluate(parse_tag_query(text), universe))
+
+    def evaluate(self, node, universe):
+        # May return a posting set itself, so never modify the result
+        kind = node[0]
+        if kind == "tag":
+            return self.postings.get(node[1], frozenset())
+        if kind == "not":
+            return set(universe) - self.evaluate(node[1], universe)
+        if kind == "or":
+            return set().union(*(self.evaluate(child, universe) for child in node[1]))
+
+        # AND: intersect the positive terms, smallest first, then subtract
+        # the negated ones
+        positive = [self.evaluate(child, universe) for child in node[1] if child[0] != "not"]
+        negative = [self.evaluate(child[1], universe) for child in node[1] if child[0] == "not"]
+        if positive:
+            positive.sort(key=len)
+            ids = positive[0].intersection(*positive[1:])
+        else:
+            ids = set(universe)
+        return ids.difference(*negative)
@@ -0,0 +1,175 @@
+"""
+Tenant Stores
+
+Each tenant (a team or user) has its own bookmark library in
+tenants/<tenant id>/. A request picks its tenant by path prefix
+(/t/<tenant id>/api/...) or by an API token listed in tenants.json:
+
+    {"tokens": {"<token>": "<tenant id>"}}
+
+Requests with neither use the original top-level data files.
+
+Loaded tenants are kept in a bounded LRU. When it is full, or a tenant has
+been idle too long, the least recently used tenant that no request or job
+is using is flushed to disk and dropped.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+def is_valid_tenant_id(tenant_id):
+    return bool(tenant_id) and TENANT_ID.match(tenant_id) is not None
+
+
+def request_token(request):
+    # The API token from X-API-Token or an Authorization: Bearer header
+    token = request.headers.get("X-API-Token")
+    authorization = request.headers.get("Authorization", "")
+    if not token and authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):].strip()
+    return token or None
+
+
+class TenantRegistry:
+    def __init__(self, path="tenants.json", root="tenants"):
+        self.path = path
+        self.root = root
+        self.tokens = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                tokens = json.load(f).get("tokens", {})
+            self.tokens = {token: tenant_id for token, tenant_id in tokens.items()
+                           if is_valid_tenant_id(tenant_id)}
+        except (ValueError, OSError, AttributeError) as e:
+            print(f"Error loading tenants: {e}")
+
+    def tenant_for_token(self, token):
+        return self.tokens.get(token)
+
+    def tenant_dir(self, tenant_id):
+        return os.path.join(self.root, tenant_id)
+
+    def exists(self, tenant_id):
+        # Only tenants with a token or an existing library can be opened,
+        # so arbitrary URLs can't create stores
+        return is_valid_tenant_id(tenant_id) and (
+            tenant_id in self.tokens.values() or os.path.isdir(self.tenant_dir(tenant_id)))
+
+
+class TenantPrefixMiddleware:
+    # Moves a /t/<tenant id> path prefix into SCRIPT_NAME, so the app's
+    # routes match and url_for() keeps generating prefixed URLs
+    def __init__(self, wsgi_app, prefix="/t/"):
+        self.wsgi_app = wsgi_app
+        self.prefix = prefix
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith(self.prefix):
+            tenant_id, _, rest = path[len(self.prefix):].partition("/")
+            environ["bookmarks.tenant"] = tenant_id
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + self.prefix + tenant_id
+            environ["PATH_INFO"] = "/" + rest
+        return self.wsgi_app(environ, start_response)
+
+
+class TenantStores:
+    def __init__(self, open_tenant, max_open=32, idle_seconds=600):
+        # open_tenant(tenant_id) loads a tenant; the result must have
+        # close() and is_busy()
+        self.open_tenant = open_tenant
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        # tenant id -> [tenant, users, last used], least recently used first
+        self.open = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def checkout(self, tenant_id):
+        # Every checkout must be matched by a checkin
+        while True:
+            with self.lock:
+                entry = self.open.get(tenant_id)
+                if entry is not None:
+                    entry[1] += 1
+                    entry[2] = time.monotonic()
+                    self.open.move_to_end(tenant_id)
+                    return entry[0]
+                loaded = self.loading.get(tenant_id)
+                if loaded is None:
+                    loaded = self.loading[tenant_id] = threading.Event()
+                    break
+            # Another thread is loading this tenant; use its copy
+            loaded.wait()
+
+        try:
+            tenant = self.open_tenant(tenant_id)
+        except Exception:
+            with self.lock:
+                del self.loading[tenant_id]
+            loaded.set()
+            raise
+
+        with self.lock:
+            self.open[tenant_id] = [tenant, 1, time.monotonic()]
+            del self.loading[tenant_id]
+            evicted = self._pick_evictions()
+        loaded.set()
+        self._close(evicted)
+        return tenant
+
+    def checkin(self, tenant_id):
+        with self.lock:
+            entry = self.open.get(tenant_id)
+            if entry is not None:
+                entry[1] -= 1
+                entry[2] = time.monotonic()
+            evicted = self._pick_evictions()
+        self._close(evicted)
+
+    def _pick_evictions(self):
+        # Hold the lock. Walks from the least recently used end, dropping
+        # tenants idle for too long and any beyond capacity.
+        now = time.monotonic()
+        evicted = []
+        for tenant_id, (tenant, users, last_used) in list(self.open.items()):
+            if users or tenant.is_busy():
+                continue
+            if len(self.open) > self.max_open or now - last_used > self.idle_seconds:
+                # Checkouts wait until it is flushed, then load it afresh
+                evicted.append((tenant_id, tenant))
+                self.loading[tenant_id] = threading.Event()
+                del self.open[tenant_id]
+        return evicted
+
+    def _close(self, tenants):
+        for tenant_id, tenant in tenants:
+            try:
+                tenant.close()
+            except Exception as e:
+                print(f"Error closing tenant: {e}")
+            finally:
+                with self.lock:
+                    closed = self.loading.pop(tenant_id)
+                closed.set()
+
+    def close_all(self):
+        with self.lock:
+            tenants = []
+            for tenant_id, entry in self.open.items():
+                self.loading[tenant_id] = threading.Event()
+                tenants.append((tenant_id, entry[0]))
+            self.open.clear()
+        self._close(tenants)
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse can be observed
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def handle_one(self, method):
+        server = self.server
+        with server.lock:
+            server.hits.append((method, self.path))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            route = server.routes.get(self.path.split("?")[0])
+            if route is None:
+                status, headers, body = 404, {}, b"not found"
+            else:
+                status, headers, body = route(method, [h for h in server.hits if h[1] == self.path])
+            if server.delay:
+                time.sleep(server.delay)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.handle_one("HEAD")
+
+    def do_GET(self):
+        self.handle_one("GET")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        # path -> fn(method, earlier hits on the path) -> (status, headers, body)
+        self.routes = {}
+        self.delay = 0
+        self.hits = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="session")
+def app_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("app")
+
+
+@pytest.fixture(scope="session")
+def app_session(app_dir):
+    # The app resolves its files against the working directory when it is
+    # imported. Closing the default tenant at the end flushes its writers
+    # while the session directory still exists.
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    yield app
+    app.default_tenant.close()
+    app.content_cache.save()
+
+
+@pytest.fixture
+def app_module(app_session, app_dir, monkeypatch):
+    monkeypatch.chdir(app_dir)
+    return app_session
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def run_job(client, response):
+    job_id = response.get_json()["id"]
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def add_bookmark(client, name):
+    subcategory = client.get("/api/subcategories").get_json()[0]
+    return client.post("/api/bookmarks", json={
+        "name": name, "url": f"https://backup.example/{name.replace(' ', '-')}/{time.time()}", "description": "",
+        "category_id": subcategory["category_id"], "subcategory_id": subcategory["id"], "type": "FREE"
+    }).get_json()
+
+
+def library(client):
+    return sorted((b["id"], b["name"]) for b in client.get("/api/bookmarks?limit=100000").get_json())
+
+
+def test_restore_brings_back_the_snapshot(client):
+    kept = add_bookmark(client, "kept")
+    snapshot = run_job(client, client.post("/api/backups"))["result"]
+
+    client.put(f"/api/bookmarks/{kept['id']}", json=dict(kept, name="edited", description=""))
+    add_bookmark(client, "added later")
+    job = run_job(client, client.post(f"/api/backups/{snapshot['id']}/restore"))
+
+    assert job["result"]["restored"] == 1 and job["result"]["removed"] == 1
+    names = dict(library(client))
+    assert names[kept["id"]] == "kept" and "added later" not in names.values()
+
+
+def test_damaged_backup_leaves_the_library_alone(client, app_module):
+    manager = app_module.default_tenant.manager
+    subcategory = manager.subcategories[0]
+    with manager.batch():
+        added = [manager.add_bookmark(f"bulk {i}", f"https://bulk.example/{time.time()}/{i}", "",
+                                      subcategory.category_id, subcategory.id, "FREE")
+                 for i in range(600)]
+    snapshot = run_job(client, client.post("/api/backups"))["result"]
+    store = app_module.default_tenant.backup_store
+    last_chunk = store.chunk_path(store.get(snapshot["id"])["chunks"][-1])
+    with open(last_chunk, "wb") as f:
+        f.write(b"damaged")
+
+    # Hundreds of records differ before the damaged chunk is reached
+    with manager.batch():
+        for bookmark in added:
+            manager.update_bookmark(bookmark.id, "renamed", bookmark.url, "", bookmark.category_id,
+                                    bookmark.subcategory_id, "FREE")
+    before = library(client)
+    job = run_job(client, client.post(f"/api/backups/{snapshot['id']}/restore"))
+
+    assert "unreadable" in job["result"]["error"]
+    assert library(client) == before
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def library(client):
+    # A category of its own with a few tagged bookmarks
+    category = client.post("/api/categories", json={"name": "Astronomy"}).get_json()
+    subcategory = client.post("/api/subcategories", json={"name": "Telescopes",
+                                                          "category_id": category["id"]}).get_json()
+    bookmarks = []
+    for i, tags in enumerate([["alpha"], ["alpha", "beta"], ["beta"], []]):
+        bookmarks.append(client.post("/api/bookmarks", json={
+            "name": f"Star chart {i}", "url": f"https://stars.example/{category['id']}/{i}", "description": "",
+            "category_id": category["id"], "subcategory_id": subcategory["id"], "type": "FREE", "tags": tags
+        }).get_json())
+    return {"category": category, "subcategory": subcategory, "bookmarks": bookmarks}
+
+
+QUERIES = [
+    "",
+    "tags=alpha",
+    "tags=alpha%20OR%20beta&sort=name_desc",
+    "sort=name_desc&offset=1&limit=2",
+    "search=astronomy",
+    "search=telescopes&type=FREE",
+    "format=columns&sort=category",
+    "sort=recent&offset=0&limit=3",
+    "mode=fuzzy&search=star%20chart&limit=2",
+]
+
+
+def wait_for_metadata(app_module):
+    # Fetched page metadata is not part of the history, so a fetch landing
+    # between two listings would change rows the library did not
+    fetcher = app_module.default_tenant.metadata_fetcher
+    deadline = time.time() + 10
+    while fetcher.pending and time.time() < deadline:
+        time.sleep(0.02)
+
+
+def test_as_of_answers_like_the_live_query_did(client, library, app_module):
+    wait_for_metadata(app_module)
+    before = {}
+    for query in QUERIES:
+        response = client.get(f"/api/bookmarks?{query}")
+        before[query] = (response.get_json(), response.headers["X-Total-Count"])
+    when = time.time()
+    time.sleep(0.01)
+
+    client.delete(f"/api/bookmarks/{library['bookmarks'][1]['id']}")
+    client.put(f"/api/categories/{library['category']['id']}", json={"name": "Renamed"})
+    wait_for_metadata(app_module)
+
+    for query in QUERIES:
+        response = client.get(f"/api/bookmarks?{query}&as_of={when}")
+        assert response.status_code == 200, query
+        assert (response.get_json(), response.headers["X-Total-Count"]) == before[query], query
+
+
+def test_as_of_rejects_bad_input(client, library):
+    assert client.get("/api/bookmarks?as_of=yesterday").status_code == 400
+    assert client.get("/api/bookmarks?as_of=1").status_code == 404
+    assert client.get(f"/api/bookmarks?as_of={time.time()}&tags=(alpha").status_code == 400
+
+
+def test_fuzzy_total_counts_every_match(client, library):
+    everything = client.get("/api/bookmarks?mode=fuzzy&search=star%20chart&limit=100")
+    total = int(everything.headers["X-Total-Count"])
+    assert total == len(everything.get_json()) >= 4
+
+    seen = []
+    for offset in range(0, total, 2):
+        page = client.get(f"/api/bookmarks?mode=fuzzy&search=star%20chart&offset={offset}&limit=2")
+        assert int(page.headers["X-Total-Count"]) == total
+        seen += [b["id"] for b in page.get_json()]
+    assert seen == [b["id"] for b in everything.get_json()]
+
+
+def test_category_names_follow_renames_and_undo(client, library, app_module):
+    manager = app_module.default_tenant.manager
+    category_id = library["category"]["id"]
+    client.put(f"/api/categories/{category_id}", json={"name": "Cosmos"})
+
+    listed = client.get(f"/api/bookmarks?category={category_id}&search=cosmos").get_json()
+    assert len(listed) == 4 and {b["category_name"] for b in listed} == {"Cosmos"}
+
+    client.post("/api/undo")
+    listed = client.get(f"/api/bookmarks?category={category_id}").get_json()
+    assert {b["category_name"] for b in listed} == {"Astronomy"}
+    assert client.get(f"/api/bookmarks?category={category_id}&search=cosmos").get_json() == []
+
+    client.delete(f"/api/categories/{category_id}")
+    assert manager.names["category"] == {c.id: c.name for c in manager.categories}
+    assert manager.names["subcategory"] == {s.id: s.name for s in manager.subcategories}
+
+
+def test_merging_duplicates_keeps_every_tag(client, library, app_module):
+    manager = app_module.default_tenant.manager
+    first = library["bookmarks"][1]
+    duplicate = manager.add_bookmark("Star chart copy", first["url"] + "/", "", first["category_id"],
+                                     first["subcategory_id"], "FREE", ["gamma", "beta"])
+
+    removed = client.post("/api/duplicates/merge").get_json()["removed"]
+    assert duplicate.id in removed and first["id"] not in removed
+
+    tagged = client.get("/api/bookmarks?tags=gamma").get_json()
+    assert [(b["id"], b["tags"]) for b in tagged] == [(first["id"], ["alpha", "beta", "gamma"])]
+    assert manager.find_duplicate(first["url"]).id == first["id"]
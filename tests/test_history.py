@@ -0,0 +1,66 @@
+import time
+
+from history import History
+
+
+def bookmark(item_id, name):
+    return {"id": item_id, "name": name}
+
+
+def empty_state():
+    return {"category": {}, "subcategory": {}, "bookmark": {}}
+
+
+def test_state_at_replays_from_background_checkpoints(tmp_path):
+    history = History(str(tmp_path), checkpoint_bytes=2000, keep_checkpoints=100)
+    history.start(empty_state())
+    times = []
+    for i in range(200):
+        history.append([("bookmark", i, None, bookmark(i, f"b{i}"))])
+        times.append(time.time())
+    history.close()
+
+    index = history._read_index()
+    assert len(index["checkpoints"]) >= 2
+    state = history.state_at(times[120])
+    assert sorted(state["bookmark"]) == list(range(121))
+
+
+def test_checkpoints_are_pruned_with_their_segments(tmp_path):
+    history = History(str(tmp_path), checkpoint_bytes=500, keep_checkpoints=3)
+    history.start(empty_state())
+    for i in range(300):
+        history.append([("bookmark", i, None, bookmark(i, "x" * 50))])
+        history.checkpointer.flush_now()
+    history.close()
+
+    index = history._read_index()
+    assert len(index["checkpoints"]) == 3
+    assert index["segments"][0] == index["checkpoints"][0]["seq"]
+    assert len(list(tmp_path.glob("log-*.jsonl"))) == len(index["segments"])
+    assert sorted(history.state_at(time.time())["bookmark"]) == list(range(300))
+
+
+def test_checkpoint_size_follows_the_library(tmp_path):
+    state = empty_state()
+    state["bookmark"] = {i: bookmark(i, "y" * 100) for i in range(1000)}
+    history = History(str(tmp_path), checkpoint_bytes=500)
+    history.start(state)
+    for i in range(50):
+        history.append([("bookmark", i, state["bookmark"][i], bookmark(i, "renamed"))])
+    history.close()
+
+    # The log is far smaller than one checkpoint, so no new one is due
+    assert len(history._read_index()["segments"]) == 1
+
+
+def test_undo_stacks(tmp_path):
+    history = History(str(tmp_path))
+    history.start(empty_state())
+    first = history.append([("bookmark", 1, None, bookmark(1, "a"))])
+    second = history.append([("bookmark", 2, None, bookmark(2, "b"))])
+    history.append([("bookmark", 2, bookmark(2, "b"), None)], undo_of=second)
+
+    undo, redo = history.undo_stacks()
+    assert [op["op"] for op in undo] == [first]
+    assert [op["op"] for op in redo] == [second]
@@ -0,0 +1,105 @@
+from link_checker import LinkChecker
+
+
+def ok(method, hits):
+    return 200, {}, b"ok"
+
+
+def checker(**kwargs):
+    settings = {"per_host_interval": 0, "timeout": 2, "retries": 0, "backoff": 0.01}
+    settings.update(kwargs)
+    return LinkChecker(**settings)
+
+
+def test_head_request(stub_server):
+    stub_server.routes["/ok"] = ok
+    results = checker().run([(1, stub_server.url("/ok"))])
+
+    assert results[1]["ok"] and results[1]["status"] == 200
+    assert stub_server.hits == [("HEAD", "/ok")]
+
+
+def test_falls_back_to_get_when_head_is_not_allowed(stub_server):
+    stub_server.routes["/page"] = lambda method, hits: (405, {}, b"") if method == "HEAD" else (200, {}, b"page")
+    results = checker().run([(1, stub_server.url("/page"))])
+
+    assert results[1]["status"] == 200
+    assert stub_server.hits == [("HEAD", "/page"), ("GET", "/page")]
+
+
+def test_follows_redirects(stub_server):
+    stub_server.routes["/old"] = lambda method, hits: (301, {"Location": "/new"}, b"")
+    stub_server.routes["/new"] = ok
+    results = checker().run([(1, stub_server.url("/old"))])
+
+    assert results[1]["status"] == 200
+    assert [path for _, path in stub_server.hits] == ["/old", "/new"]
+
+
+def test_redirect_loop_is_an_error(stub_server):
+    stub_server.routes["/loop"] = lambda method, hits: (302, {"Location": "/loop"}, b"")
+    results = checker(max_redirects=3).run([(1, stub_server.url("/loop"))])
+
+    assert not results[1]["ok"]
+    assert results[1]["error"] == "Too many redirects"
+
+
+def test_retries_on_503(stub_server):
+    stub_server.routes["/flaky"] = lambda method, hits: (503, {}, b"") if len(hits) < 3 else (200, {}, b"ok")
+    results = checker(retries=2).run([(1, stub_server.url("/flaky"))])
+
+    assert results[1]["status"] == 200
+    assert len(stub_server.hits) == 3
+
+
+def test_gives_up_after_retries(stub_server):
+    stub_server.routes["/down"] = lambda method, hits: (503, {}, b"")
+    results = checker(retries=1).run([(1, stub_server.url("/down"))])
+
+    assert results[1]["status"] == 503 and not results[1]["ok"]
+    assert len(stub_server.hits) == 2
+
+
+def test_reuses_keep_alive_connections(stub_server):
+    stub_server.routes["/ok"] = ok
+    targets = [(i, stub_server.url(f"/ok?{i}")) for i in range(10)]
+    results = checker(per_host_concurrency=1).run(targets)
+
+    assert all(result["ok"] for result in results.values())
+    assert stub_server.connections == 1
+
+
+def test_limits_concurrent_requests_per_host(stub_server):
+    stub_server.routes["/ok"] = ok
+    stub_server.delay = 0.05
+    targets = [(i, stub_server.url(f"/ok?{i}")) for i in range(12)]
+    results = checker(per_host_concurrency=2).run(targets)
+
+    assert all(result["ok"] for result in results.values())
+    assert stub_server.max_in_flight == 2
+
+
+def test_waiting_for_a_host_slot_does_not_count_as_timeout(stub_server):
+    # 20 links on one host, two at a time: the last ones wait far longer
+    # than the timeout for their turn, but each request is quick
+    stub_server.routes["/ok"] = ok
+    stub_server.delay = 0.2
+    targets = [(i, stub_server.url(f"/ok?{i}")) for i in range(20)]
+    results = checker(per_host_concurrency=2, timeout=1).run(targets)
+
+    assert [r["error"] for r in results.values() if not r["ok"]] == []
+    assert all(r["latency_ms"] < 1000 for r in results.values())
+
+
+def test_times_out_slow_responses(stub_server):
+    stub_server.routes["/slow"] = ok
+    stub_server.delay = 0.5
+    results = checker(timeout=0.1).run([(1, stub_server.url("/slow"))])
+
+    assert results[1]["error"] == "Timed out"
+
+
+def test_unsupported_url():
+    results = checker().run([(1, "ftp://example.com/file")])
+
+    assert results[1]["error"] == "Unsupported URL"
@@ -0,0 +1,102 @@
+import os
+import time
+
+from metadata_fetcher import ContentCache, MetadataFetcher, MetadataStore
+
+PAGE = (b"<html><head><title> Example  Page </title>"
+        b"<meta name=\"description\" content=\"An example\">"
+        b"<link rel=\"icon\" href=\"/static/icon.png\"></head><body></body></html>")
+ICON = b"\x89PNG fake icon"
+
+
+def serve_site(server):
+    server.routes["/"] = lambda method, hits: (200, {"Content-Type": "text/html; charset=utf-8"}, PAGE)
+    server.routes["/static/icon.png"] = lambda method, hits: (200, {"Content-Type": "image/png"}, ICON)
+
+
+def test_fetch_reads_title_description_and_favicon(stub_server, tmp_path):
+    serve_site(stub_server)
+    cache = ContentCache(str(tmp_path / "cache"))
+    fetcher = MetadataFetcher(MetadataStore(str(tmp_path / "metadata.json")), cache, workers=1)
+    try:
+        record = fetcher.fetch(stub_server.url("/"))
+    finally:
+        fetcher.shutdown()
+
+    assert record["title"] == "Example Page"
+    assert record["description"] == "An example"
+    assert cache.get(record["favicon"]) == (ICON, "image/png")
+
+
+def test_fetch_falls_back_to_favicon_ico(stub_server, tmp_path):
+    stub_server.routes["/plain"] = lambda method, hits: (200, {"Content-Type": "text/plain"}, b"hi")
+    stub_server.routes["/favicon.ico"] = lambda method, hits: (200, {"Content-Type": "image/x-icon"}, ICON)
+    cache = ContentCache(str(tmp_path / "cache"))
+    fetcher = MetadataFetcher(MetadataStore(str(tmp_path / "metadata.json")), cache, workers=1)
+    try:
+        record = fetcher.fetch(stub_server.url("/plain"))
+    finally:
+        fetcher.shutdown()
+
+    assert record["title"] is None
+    assert cache.get(record["favicon"]) == (ICON, "image/x-icon")
+
+
+def test_fetch_records_errors(stub_server, tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    fetcher = MetadataFetcher(MetadataStore(str(tmp_path / "metadata.json")), cache, workers=1)
+    try:
+        record = fetcher.fetch(stub_server.url("/missing"))
+    finally:
+        fetcher.shutdown()
+
+    assert "404" in record["error"]
+    assert record["favicon"] is None
+
+
+def test_content_cache_evicts_least_recently_used(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=250)
+    first = cache.put(b"a" * 100, "image/png")
+    second = cache.put(b"b" * 100, "image/png")
+    # Reading the first makes the second the least recently used
+    assert cache.get(first)
+    third = cache.put(b"c" * 100, "image/png")
+
+    assert first in cache and third in cache
+    assert second not in cache and cache.get(second) is None
+    assert cache.total_bytes == 200
+    assert not os.path.exists(cache._path(second))
+
+
+def test_content_cache_index_survives_reload(tmp_path):
+    cache = ContentCache(str(tmp_path))
+    digest = cache.put(ICON, "image/png")
+    cache.save()
+
+    assert ContentCache(str(tmp_path)).get(digest) == (ICON, "image/png")
+
+
+def test_favicon_is_404_until_fetched_then_cached(app_module, stub_server):
+    serve_site(stub_server)
+    manager = app_module.default_tenant.manager
+    fetcher = app_module.default_tenant.metadata_fetcher
+    bookmark = manager.add_bookmark("Stub", stub_server.url("/"), "", manager.categories[0].id,
+                                    manager.get_subcategories_for_category(manager.categories[0].id)[0].id,
+                                    "FREE")
+    client = app_module.app.test_client()
+
+    response = client.get(f"/api/bookmarks/{bookmark.id}/favicon")
+    assert response.status_code == 404
+
+    deadline = time.time() + 5
+    while fetcher.pending and time.time() < deadline:
+        time.sleep(0.02)
+
+    response = client.get(f"/api/bookmarks/{bookmark.id}/favicon")
+    assert response.status_code == 200
+    assert response.data == ICON
+    assert response.mimetype == "image/png"
+
+    response = client.get(f"/api/bookmarks/{bookmark.id}/favicon",
+                          headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
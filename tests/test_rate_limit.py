@@ -0,0 +1,22 @@
+from rate_limit import MemoryBuckets, SqliteBuckets
+
+
+def test_memory_buckets_evict_least_recently_used():
+    buckets = MemoryBuckets(max_keys=3)
+    for key in ("a", "b", "c"):
+        buckets.take(key, 1, 2, 2, 0)
+    # Touching "a" leaves "b" as the least recently used
+    assert buckets.take("a", 1, 2, 2, 0) == 2
+    buckets.take("d", 1, 2, 2, 0)
+
+    assert list(buckets.buckets) == ["c", "a", "d"]
+    assert buckets.take("b", 1, 2, 2, 0) == 0
+
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    first, second = SqliteBuckets(path), SqliteBuckets(path)
+    assert first.take("ip:1", 1, 2, 1, 100) == 0
+    assert second.take("ip:1", 1, 2, 1, 100) == 0
+    assert first.take("ip:1", 1, 2, 1, 100) == 1
+    assert second._connection().execute("PRAGMA synchronous").fetchone()[0] == 1
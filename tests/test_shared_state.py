@@ -0,0 +1,21 @@
+from shared_state import SharedState
+
+
+def test_read_new_stops_at_a_partly_written_line(tmp_path):
+    path = str(tmp_path / "data.json")
+    writer = SharedState(path)
+    writer.reset(0, "epoch")
+    reader = SharedState(path)
+    assert reader.join() == "epoch"
+
+    writer.append([(1, "bookmark", 1, {"name": "café"})])
+    with open(writer.journal_path, "a") as f:
+        f.write('{"v": 2, "kind": "bookmark", "id": 2, "rec')
+    assert reader.read_new() == [(1, "bookmark", 1, {"name": "café"})]
+    assert reader.read_new() == []
+
+    with open(writer.journal_path, "a") as f:
+        f.write('ord": null}\n')
+    assert reader.read_new() == [(2, "bookmark", 2, None)]
+    writer.close()
+    reader.close()
@@ -0,0 +1,96 @@
+"""
+Bookmark URL Index
+
+Maps canonical URLs to bookmark ids so duplicates can be detected in O(1)
+when a bookmark is added or edited, and reported or merged without
+comparing every pair of bookmarks.
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "_ga", "_gl"
+}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url):
+    # http/https, "www.", default ports, trailing slashes, fragments and
+    # tracking parameters do not make two bookmarks different
+    if not url or not url.strip():
+        return None
+
+    url = url.strip()
+    if "://" not in url:
+        url = "http://" + url
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url.lower()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+
+    path = parts.path.rstrip("/")
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    query.sort()
+
+    canonical = host + path
+    if scheme not in DEFAULT_PORTS:
+        canonical = f"{scheme}://{canonical}"
+    if query:
+        canonical += "?" + urlencode(query)
+    return canonical
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self.by_url = {}
+        self.duplicate_urls = set()
+
+    def rebuild(self, bookmarks):
+        self.by_url = {}
+        self.duplicate_urls = set()
+        for bookmark in bookmarks:
+            self.add(bookmark)
+
+    def add(self, bookmark):
+        canonical = canonicalize_url(bookmark.url)
+        if canonical is None:
+            return
+        ids = self.by_url.setdefault(canonical, set())
+        ids.add(bookmark.id)
+        if len(ids) > 1:
+            self.duplicate_urls.add(canonical)
+
+    def remove(self, bookmark):
+        canonical = canonicalize_url(bookmark.url)
+        ids = self.by_url.get(canonical)
+        if ids is None:
+            return
+        ids.discard(bookmark.id)
+        if len(ids) < 2:
+            self.duplicate_urls.discard(canonical)
+        if not ids:
+            del self.by_url[canonical]
+
+    def find(self, url, exclude_id=None):
+        # Returns the id of an existing bookmark with the same canonical URL
+        ids = self.by_url.get(canonicalize_url(url), ())
+        for bookmark_id in ids:
+            if bookmark_id != exclude_id:
+                return bookmark_id
+        return None
+
+    def groups(self):
+        return {url: sorted(self.by_url[url]) for url in self.duplicate_urls}
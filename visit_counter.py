@@ -0,0 +1,271 @@
+"""
+Bookmark Visit Counter
+
+Counts clicks on bookmarks without touching the bookmark data file. A hit
+only bumps an in-memory counter in one of several shards, each with its own
+lock, so concurrent clicks rarely wait on each other. The counts are merged
+into visits.json in periodic batches by a DeferredWriter:
+
+    {"<bookmark id>": {"count": n, "last_visited": timestamp, "score": s}}
+
+Several worker processes can share the file: each flush adds that
+process's counts to what is on disk under a file lock, and readers reload
+the file when another process has changed it.
+
+Two small top-k heaps, by count and by last visit, answer the "most
+visited" and "recently visited" views without sorting every bookmark.
+
+The score is an exponentially decayed visit count kept in log space:
+log(sum of exp(DECAY_RATE * visit time)). Every score decays at the same
+rate, so comparing scores compares current popularity and an ordering by
+score never goes stale while no one clicks; the count itself is
+exp(score - DECAY_RATE * now).
+"""
+
+import fcntl
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+from background_tasks import DeferredWriter
+
+# Visits lose half their weight in popularity rankings every week
+HALF_LIFE = 7 * 24 * 3600
+DECAY_RATE = math.log(2) / HALF_LIFE
+
+
+def add_visits(score, count, at):
+    # Adds `count` visits at time `at` to a log-space decayed score; None
+    # is the score of no visits
+    added = DECAY_RATE * at + math.log(count)
+    if score is None:
+        return added
+    high, low = max(score, added), min(score, added)
+    return high + math.log1p(math.exp(low - high))
+
+
+class TopK:
+    # The k ids with the highest scores. Scores only ever go up, so an id
+    # that drops out can only come back through update().
+    def __init__(self, k=100):
+        self.k = k
+        self.scores = {}
+        # Min-heap of (score, id); entries whose score is out of date are
+        # skipped and cleared out once they pile up
+        self.heap = []
+        self.ranked = None
+
+    def rebuild(self, scores):
+        best = heapq.nlargest(self.k, scores.items(), key=lambda item: item[1])
+        self.scores = dict(best)
+        self.heap = [(score, item_id) for item_id, score in best]
+        heapq.heapify(self.heap)
+        self.ranked = None
+
+    def _lowest(self):
+        while self.heap and self.scores.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0] if self.heap else None
+
+    def update(self, item_id, score):
+        if item_id not in self.scores:
+            if len(self.scores) >= self.k:
+                lowest = self._lowest()
+                if score <= lowest[0]:
+                    return
+                heapq.heappop(self.heap)
+                del self.scores[lowest[1]]
+        self.scores[item_id] = score
+        heapq.heappush(self.heap, (score, item_id))
+        if len(self.heap) > 2 * self.k:
+            self.heap = [(s, i) for i, s in self.scores.items()]
+            heapq.heapify(self.heap)
+        self.ranked = None
+
+    def top(self, limit):
+        if self.ranked is None:
+            self.ranked = sorted(self.scores.items(), key=lambda item: (-item[1], item[0]))
+        return self.ranked[:limit]
+
+
+class CounterShard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # bookmark id -> [hits since the last flush, last hit time]
+        self.pending = {}
+
+
+class VisitCounter:
+    def __init__(self, path="visits.json", shards=16, flush_interval=1.0, top_k=100):
+        self.path = path
+        self.shards = [CounterShard() for _ in range(shards)]
+        self.lock = threading.Lock()
+        # Merged totals as of the last flush or reload:
+        # bookmark id -> [count, last visited, score]
+        self.totals = {}
+        self.forgotten = set()
+        # Totals changed since the last drain(), for the bookmark rankings
+        self.changed = {}
+        self.replaced = True
+        self.most_visited = TopK(top_k)
+        self.recently_visited = TopK(top_k)
+        # Size and mtime of visits.json as this process last saw it
+        self.signature = None
+        self.scheduled = False
+        self.writer = DeferredWriter(self.flush, delay=flush_interval)
+        self.reload()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            # Files from before scores were kept count every visit at the
+            # last one
+            return {int(k): [v["count"], v["last_visited"],
+                             v.get("score") or add_visits(None, v["count"], v["last_visited"])]
+                    for k, v in data.items()}
+        except (ValueError, OSError, KeyError, TypeError) as e:
+            print(f"Error loading visits: {e}")
+            return {}
+
+    def reload(self):
+        with self.lock:
+            self.signature = self._file_signature()
+            self.totals = self._read_file()
+            self._rebuild_rankings()
+            self.replaced = True
+
+    def _rebuild_rankings(self):
+        self.most_visited.rebuild({k: v[0] for k, v in self.totals.items()})
+        self.recently_visited.rebuild({k: v[1] for k, v in self.totals.items()})
+
+    def hit(self, bookmark_id, now=None):
+        now = time.time() if now is None else now
+        shard = self.shards[bookmark_id % len(self.shards)]
+        with shard.lock:
+            entry = shard.pending.get(bookmark_id)
+            if entry is None:
+                shard.pending[bookmark_id] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+        # One flush request per batch; flush() clears the flag before
+        # collecting, so a hit is never left without a flush coming
+        if not self.scheduled:
+            self.scheduled = True
+            self.writer.request()
+
+    def forget(self, bookmark_ids):
+        # For deleted bookmarks; applied to the file on the next flush
+        if not bookmark_ids:
+            return
+        with self.lock:
+            self.forgotten.update(bookmark_ids)
+        self.writer.request()
+
+    def flush(self):
+        self.scheduled = False
+        deltas = {}
+        for shard in self.shards:
+            with shard.lock:
+                pending, shard.pending = shard.pending, {}
+            deltas.update(pending)
+
+        with self.lock:
+            forgotten, self.forgotten = self.forgotten, set()
+            if not deltas and not forgotten:
+                return
+
+            lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                # Another process wrote since we last looked: start from
+                # its totals and rank from scratch
+                changed = self._file_signature() != self.signature
+                if changed:
+                    self.totals = self._read_file()
+
+                for bookmark_id, (count, last_visited) in deltas.items():
+                    total = self.totals.get(bookmark_id)
+                    if total is None:
+                        total = self.totals[bookmark_id] = [0, 0, None]
+                    total[0] += count
+                    total[1] = max(total[1], last_visited)
+                    total[2] = add_visits(total[2], count, last_visited)
+                    self.changed[bookmark_id] = tuple(total)
+                    if not changed:
+                        self.most_visited.update(bookmark_id, total[0])
+                        self.recently_visited.update(bookmark_id, total[1])
+                for bookmark_id in forgotten:
+                    self.totals.pop(bookmark_id, None)
+                if changed or forgotten:
+                    self._rebuild_rankings()
+                    self.replaced = True
+
+                data = {str(k): {"count": v[0], "last_visited": v[1], "score": v[2]}
+                        for k, v in self.totals.items()}
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                self.signature = self._file_signature()
+            finally:
+                os.close(lock_fd)
+
+    def refresh(self):
+        # Picks up counts other processes have flushed; one stat() when
+        # nothing changed
+        if self._file_signature() != self.signature:
+            self.reload()
+
+    def drain(self):
+        # Returns (replaced, {bookmark id: (count, last visited, score)}):
+        # every total when `replaced`, otherwise those changed since the
+        # last call
+        with self.lock:
+            if self.replaced:
+                changes = {k: tuple(v) for k, v in self.totals.items()}
+            else:
+                changes = self.changed
+            replaced = self.replaced
+            self.changed = {}
+            self.replaced = False
+        return replaced, changes
+
+    def all_totals(self):
+        # {bookmark id: (count, last visited, score)} as of the last flush
+        self.refresh()
+        with self.lock:
+            return {k: tuple(v) for k, v in self.totals.items()}
+
+    def get(self, bookmark_id):
+        # (count, last visited, score) as of the last flush, or None
+        total = self.totals.get(bookmark_id)
+        return tuple(total) if total else None
+
+    def top(self, limit=10):
+        # [(bookmark id, count)], most visited first
+        self.refresh()
+        with self.lock:
+            return self.most_visited.top(limit)
+
+    def recent(self, limit=10):
+        # [(bookmark id, last visited)], most recent first
+        self.refresh()
+        with self.lock:
+            return self.recently_visited.top(limit)
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,24 @@
+"""
+WSGI Entry Point
+
+Production entry point for the bookmark API:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Saves are flushed by a background writer instead of on the request thread,
+and each worker's writes are replayed by the others (see shared_state.py).
+Per-client rate limits are on unless BOOKMARKS_RATE_LIMITS=0. Libraries are
+backed up to backups/ every BOOKMARKS_BACKUP_INTERVAL seconds (default 3600,
+0 turns scheduled backups off; see backup.py). Undo and as_of reach back
+BOOKMARKS_HISTORY_CHECKPOINTS checkpoints of history (default 8, about 2 MB
+of edits; see history.py).
+`python app.py` still runs the Flask development server.
+"""
+
+import os
+
+from app import create_app
+
+app = create_app(rate_limits=os.environ.get("BOOKMARKS_RATE_LIMITS", "1") != "0",
+                 backup_interval=int(os.environ.get("BOOKMARKS_BACKUP_INTERVAL", "3600")),
+                 history_checkpoints=int(os.environ.get("BOOKMARKS_HISTORY_CHECKPOINTS", "8")))